@@ -0,0 +1,50 @@
+# Масиви у формулах: діапазон у виразі (=A1:A1000*B1:B1000) обчислюється як ArrayValue,
+# операції над ним виконуються поелементно одним проходом, а результат формули розливається
+# (spill) у сусідні клітинки.
+
+
+class ArrayValue(list):
+    """Значення масиву по рядках (row-major) з розмірами; функціям передається як звичайний список."""
+    __slots__ = ("rows", "cols")
+
+    def __init__(self, values, rows: int, cols: int):
+        super().__init__(values)
+        self.rows = rows
+        self.cols = cols
+
+    def at(self, row: int, col: int):
+        return self[row * self.cols + col]
+
+
+def shape(value) -> tuple[int, int]:
+    return (value.rows, value.cols) if isinstance(value, ArrayValue) else (1, 1)
+
+
+def expand(value, rows: int, cols: int) -> list:
+    """Значення, розширене до rows x cols, як в Excel: скаляр і масив з одним рядком чи стовпцем
+    повторюються, позиції поза меншим масивом - #N/A."""
+    if not isinstance(value, ArrayValue):
+        return [value] * (rows * cols)
+    if value.rows == rows and value.cols == cols:
+        return value
+    result = []
+    for i in range(rows):
+        src_i = 0 if value.rows == 1 else i
+        for j in range(cols):
+            src_j = 0 if value.cols == 1 else j
+            result.append(value[src_i * value.cols + src_j] if src_i < value.rows and src_j < value.cols
+                          else "#N/A")
+    return result
+
+
+def broadcast(left, right) -> tuple[int, int, list, list]:
+    """Спільний розмір двох операндів і їх значення, розширені до нього."""
+    left_rows, left_cols = shape(left)
+    right_rows, right_cols = shape(right)
+    rows, cols = max(left_rows, right_rows), max(left_cols, right_cols)
+    return rows, cols, expand(left, rows, cols), expand(right, rows, cols)
+
+
+def top_left(value):
+    """Скалярне значення: для масиву - його лівий верхній елемент."""
+    return value[0] if isinstance(value, ArrayValue) else value
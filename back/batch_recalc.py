@@ -0,0 +1,191 @@
+import os
+import re
+import sys
+import json
+import math
+import time
+import zipfile
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from typing import Callable
+from xml.sax.saxutils import escape
+
+from back.sheet_loader import iter_sheet_cells
+from back.sheet_model import SheetModel
+from back.string_table import StringTable
+from back.workbook_calc import WorkbookCalc
+
+# Пакетний перерахунок книг без GUI. Модуль не імпортує Qt: виконується в дочірніх процесах пулу.
+
+_EXCEL_ERRORS = {"#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A", "#SPILL!"}
+_FORMULA_CELL_RE = re.compile(r'<c r="([A-Z]+[0-9]+)"([^>]*)><f>(.*?)</f><v\s*/></c>', re.S)
+
+
+def _cached_value_xml(value) -> tuple[str, str]:
+    """Повертає (атрибут типу, вміст <v>) для кешованого значення формули."""
+    if isinstance(value, bool):
+        return ' t="b"', "1" if value else "0"
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and not math.isfinite(value):
+            return ' t="e"', "#NUM!"
+        return "", repr(value)
+    text = str(value)
+    if text in _EXCEL_ERRORS:
+        return ' t="e"', escape(text)
+    return ' t="str"', escape(text)
+
+
+def _fill_cached_values(sheet_xml: str, values: dict[str, object]) -> str:
+    def replace(match):
+        ref, attrs, formula = match.groups()
+        if ref not in values:
+            return match.group(0)
+        type_attr, content = _cached_value_xml(values[ref])
+        attrs = re.sub(r'\s+t="[^"]*"', "", attrs)
+        return f'<c r="{ref}"{attrs}{type_attr}><f>{formula}</f><v>{content}</v></c>'
+
+    return _FORMULA_CELL_RE.sub(replace, sheet_xml)
+
+
+def write_cached_values(source: str, target: str, values_by_sheet: list[dict[str, object]]) -> None:
+    """Копіює книгу, збережену openpyxl, дописуючи обчислені значення формул у <v>.
+
+    openpyxl записує аркуші як xl/worksheets/sheet{N}.xml у порядку workbook.worksheets.
+    """
+    parts = {f"xl/worksheets/sheet{idx}.xml": values
+             for idx, values in enumerate(values_by_sheet, start=1) if values}
+    with zipfile.ZipFile(source) as src, zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            data = src.read(info.filename)
+            if info.filename in parts:
+                data = _fill_cached_values(data.decode("utf-8"), parts[info.filename]).encode("utf-8")
+            dst.writestr(info, data)
+
+
+def recalculate_workbook(path: str, output_path: str | None = None) -> dict:
+    """Відкриває книгу, перераховує всі формули і зберігає її з кешованими значеннями."""
+    from openpyxl import load_workbook
+    from utils.cell_names import get_column_letter
+
+    output_path = output_path or path
+    report = {"path": path, "output": output_path}
+    started = time.perf_counter()
+    try:
+        workbook = load_workbook(path)
+        loaded = time.perf_counter()
+
+        # Усі аркуші реєструються до обчислення, щоб працювали посилання 'Аркуш!A1'.
+        calc = WorkbookCalc()
+        # Налаштування ітеративних обчислень книги (File > Options > Formulas в Excel).
+        properties = workbook.calculation
+        if properties is not None and properties.iterate:
+            calc.iterative = True
+            calc.max_iterations = properties.iterateCount or calc.max_iterations
+            calc.max_change = properties.iterateDelta or calc.max_change
+        strings = StringTable()
+        for sheet in workbook.worksheets:
+            calc.add_sheet(sheet.title, SheetModel.from_cells(sheet.title, iter_sheet_cells(sheet), strings),
+                           scan=False)
+        calc.names.update({name: defined.attr_text for name, defined in workbook.defined_names.items()})
+        calc.rebuild()
+        calc.recalculate_all(update_text=False)
+
+        values_by_sheet = []
+        formulas = errors = 0
+        for sheet in workbook.worksheets:
+            # Значення клітинок розливу не є формулами: у файл вони не пишуться.
+            results = {pos: v for pos, v in calc.values[sheet.title].items() if (sheet.title, *pos) in calc.graph}
+            formulas += len(results)
+            errors += sum(1 for v in results.values() if isinstance(v, str) and v.startswith("#"))
+            values_by_sheet.append({get_column_letter(c + 1) + str(r + 1): v for (r, c), v in results.items()})
+        calculated = time.perf_counter()
+
+        directory = os.path.dirname(os.path.abspath(output_path))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=directory) as tmp_dir:
+            plain_path = os.path.join(tmp_dir, "plain.xlsx")
+            cached_path = os.path.join(tmp_dir, "cached.xlsx")
+            workbook.save(plain_path)
+            write_cached_values(plain_path, cached_path, values_by_sheet)
+            os.replace(cached_path, output_path)
+        saved = time.perf_counter()
+    except Exception as e:
+        report.update(ok=False, error=str(e), total_s=time.perf_counter() - started)
+        return report
+
+    report.update(ok=True, sheets=len(values_by_sheet), formulas=formulas, errors=errors,
+                  load_s=loaded - started, calc_s=calculated - loaded, save_s=saved - calculated,
+                  total_s=saved - started)
+    return report
+
+
+def run_batch(paths: list[str], output_dir: str | None = None, max_workers: int | None = None,
+              on_result: Callable[[dict], None] | None = None) -> dict:
+    """Перераховує книги паралельно (по одній на процес); повертає зведений звіт."""
+    jobs = [(path, os.path.join(output_dir, os.path.basename(path)) if output_dir else None) for path in paths]
+    workers = min(max_workers or os.cpu_count() or 1, len(jobs)) if jobs else 1
+    started = time.perf_counter()
+    results = []
+
+    def collect(result: dict) -> None:
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    if workers <= 1:
+        for job in jobs:
+            collect(recalculate_workbook(*job))
+    else:
+        # spawn: так само, як у sheet_loader, дочірні процеси стартують з чистого стану.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as executor:
+            futures = [executor.submit(recalculate_workbook, *job) for job in jobs]
+            for future in as_completed(futures):
+                collect(future.result())
+
+    order = {path: idx for idx, path in enumerate(paths)}
+    results.sort(key=lambda r: order[r["path"]])
+    succeeded = [r for r in results if r["ok"]]
+    return {
+        "files": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "formulas": sum(r["formulas"] for r in succeeded),
+        "errors": sum(r["errors"] for r in succeeded),
+        "workers": workers,
+        "wall_s": time.perf_counter() - started,
+        "cpu_s": sum(r["total_s"] for r in results),
+        "results": results,
+    }
+
+
+def _print_result(result: dict) -> None:
+    if result["ok"]:
+        print(f"OK    {result['path']}: формул {result['formulas']}, помилок {result['errors']}, "
+              f"{result['total_s'] * 1000:.0f} мс (читання {result['load_s'] * 1000:.0f}, "
+              f"обчислення {result['calc_s'] * 1000:.0f}, запис {result['save_s'] * 1000:.0f})", flush=True)
+    else:
+        print(f"ERROR {result['path']}: {result['error']}", flush=True)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="main.py recalc",
+                                     description="Перерахунок формул у книгах xlsx без графічного інтерфейсу.")
+    parser.add_argument("paths", nargs="+", help="файли .xlsx")
+    parser.add_argument("-o", "--output-dir", help="каталог для результатів (типово - перезаписати вхідні файли)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="кількість процесів (типово - кількість ядер)")
+    parser.add_argument("--report", help="зберегти звіт у JSON")
+    args = parser.parse_args(argv)
+
+    summary = run_batch(args.paths, args.output_dir, args.jobs, on_result=_print_result)
+    print(f"Файлів: {summary['files']}, успішно: {summary['succeeded']}, з помилками: {summary['failed']}; "
+          f"формул: {summary['formulas']}; час: {summary['wall_s']:.2f} с ({summary['workers']} процесів)")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
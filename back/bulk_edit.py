@@ -0,0 +1,96 @@
+import csv
+import io
+
+from back.parser import (Parser, ParsingError, ASTNode, CellRefNode, RangeRefNode, BinaryOpNode, UnaryOpNode,
+                         FunctionNode, ErrorNode, cell_indices)
+from utils.cell_names import get_column_letter
+
+# Масові правки (вставка з буфера, протягування вниз): текст буфера - рядки, розділені табуляцією,
+# як його пишуть Excel і Google Sheets; відносні посилання у формулах зсуваються на відстань
+# між джерелом і місцем вставки, як в Excel.
+
+
+def parse_clipboard(text: str) -> list[list[str]]:
+    """Текст буфера -> рядки клітинок; клітинки з переносами рядків можуть бути в лапках."""
+    if text.endswith("\n"):
+        text = text[:-2] if text.endswith("\r\n") else text[:-1]
+    if not text:
+        return []
+    return [row or [""] for row in csv.reader(io.StringIO(text), delimiter="\t")]
+
+
+def format_clipboard(rows: list[list[str]]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, delimiter="\t", lineterminator="\n").writerows(rows)
+    return buffer.getvalue()
+
+
+def _shift_cell(indices: tuple[int, int], rows: int, cols: int) -> str | None:
+    row, col = indices[0] + rows, indices[1] + cols
+    if row < 0 or col < 0 or col >= 18278:
+        return None
+    return f"{get_column_letter(col + 1)}{row + 1}"
+
+
+def shift_ast(node: ASTNode, rows: int, cols: int) -> ASTNode:
+    """Формула зі зсунутими посиланнями; посилання за межі аркуша стають #REF!."""
+    if isinstance(node, CellRefNode):
+        if node.indices is None:
+            return node
+        cell = _shift_cell(node.indices, rows, cols)
+        return CellRefNode(cell, node.sheet) if cell else ErrorNode("#REF!")
+
+    if isinstance(node, RangeRefNode):
+        start, end = cell_indices(node.start_cell), cell_indices(node.end_cell)
+        if start is None or end is None:
+            return node
+        start, end = _shift_cell(start, rows, cols), _shift_cell(end, rows, cols)
+        return RangeRefNode(start, end, node.sheet) if start and end else ErrorNode("#REF!")
+
+    if isinstance(node, UnaryOpNode):
+        return UnaryOpNode(node.op, shift_ast(node.operand, rows, cols))
+
+    if isinstance(node, BinaryOpNode):
+        return BinaryOpNode(shift_ast(node.left, rows, cols), node.op, shift_ast(node.right, rows, cols))
+
+    if isinstance(node, FunctionNode):
+        return FunctionNode(node.func_name, [shift_ast(arg, rows, cols) for arg in node.args])
+
+    return node
+
+
+def _parse_formula(text: str) -> ASTNode | None:
+    if not text.startswith("="):
+        return None
+    try:
+        return Parser().parse(text)
+    except ParsingError:
+        return None
+
+
+def shift_formula(text: str, rows: int, cols: int) -> str:
+    """Вміст клітинки, перенесений на rows рядків і cols стовпців; значення і некоректні формули - як є."""
+    ast = _parse_formula(text)
+    if ast is None or (rows == 0 and cols == 0):
+        return text
+    return "=" + shift_ast(ast, rows, cols).to_string()
+
+
+def fill_down(source: list[str], count: int, asts: dict[str, ASTNode] | None = None) -> list[list[str]]:
+    """count рядків під рядком source, як при протягуванні вниз. Кожна формула розбирається один раз;
+    asts отримує розібрані зсунуті формули, щоб калькулятор не розбирав їх знову."""
+    columns = []
+    for text in source:
+        ast = _parse_formula(text)
+        if ast is None:
+            columns.append([text] * count)
+            continue
+        column = []
+        for offset in range(1, count + 1):
+            shifted = shift_ast(ast, offset, 0)
+            formula = "=" + shifted.to_string()
+            if asts is not None:
+                asts[formula] = shifted
+            column.append(formula)
+        columns.append(column)
+    return [list(row) for row in zip(*columns)]
@@ -0,0 +1,174 @@
+import csv
+import json
+import time
+
+from back.calculator import FormulaCalculator
+from back.parser import RangeRefNode
+from utils.cell_names import get_column_letter
+
+# Методи калькулятора, які профілювальник підміняє на екземплярі.
+_PATCHED = ("evaluate", "_evaluate_cell", "_evaluate_ast", "_get_ast")
+
+REPORT_FIELDS = ["sheet", "cell", "formula", "count", "total_ms", "mean_ms", "max_ms",
+                 "ast_cache_hits", "value_cache_hits", "range_cells", "max_depth"]
+
+
+class FormulaStats:
+    __slots__ = ("sheet", "row", "col", "formula", "count", "total", "max", "ast_hits", "value_hits",
+                 "range_cells", "depth")
+
+    def __init__(self, sheet: str, row: int | None, col: int | None, formula: str):
+        self.sheet = sheet
+        self.row = row
+        self.col = col
+        self.formula = formula
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.ast_hits = 0
+        self.value_hits = 0
+        self.range_cells = 0
+        self.depth = 0
+
+
+class CalcProfiler:
+    """Профілювальник обчислень формул.
+
+    attach() підміняє методи конкретного екземпляра FormulaCalculator обгортками, detach() повертає
+    методи класу, тож вимкнений профілювальник нічого не коштує. Один профілювальник - один потік.
+    """
+
+    def __init__(self):
+        self.stats: dict[tuple, FormulaStats] = {}
+        self.calculator: FormulaCalculator | None = None
+        self._frame: FormulaStats | None = None
+        self._depth = 0
+        self._vectorize = True
+
+    @property
+    def enabled(self) -> bool:
+        return self.calculator is not None
+
+    def clear(self) -> None:
+        self.stats.clear()
+
+    def _stats_for(self, formula_string: str, table_widget, cell: tuple | None) -> FormulaStats:
+        key = cell if cell is not None else (id(table_widget), formula_string)
+        stats = self.stats.get(key)
+        if stats is None:
+            sheet, row, col = cell if cell is not None else ("", None, None)
+            stats = self.stats[key] = FormulaStats(sheet, row, col, formula_string)
+        stats.formula = formula_string
+        return stats
+
+    def attach(self, calculator: FormulaCalculator) -> None:
+        if self.calculator is calculator:
+            return
+        self.detach()
+        self.calculator = calculator
+        self._vectorize = calculator.vectorize
+        calculator.vectorize = False
+        evaluate = calculator.evaluate
+        evaluate_cell = calculator._evaluate_cell
+        evaluate_ast = calculator._evaluate_ast
+        get_ast = calculator._get_ast
+
+        def profiled_evaluate(formula_string, table_widget, values=None, cell=None):
+            if self._frame is not None:
+                return evaluate(formula_string, table_widget, values, cell)
+            stats = self._frame = self._stats_for(formula_string, table_widget, cell)
+            self._depth = 0
+            started = time.perf_counter()
+            try:
+                return evaluate(formula_string, table_widget, values, cell)
+            finally:
+                elapsed = time.perf_counter() - started
+                self._frame = None
+                stats.count += 1
+                stats.total += elapsed
+                if elapsed > stats.max:
+                    stats.max = elapsed
+
+        def profiled_evaluate_cell(r, c, table_widget, visited, values, cell=None):
+            frame = self._frame
+            if frame is None:
+                return evaluate_cell(r, c, table_widget, visited, values, cell)
+            if values is not None and (r, c) in values:
+                frame.value_hits += 1
+            self._depth += 1
+            if self._depth > frame.depth:
+                frame.depth = self._depth
+            try:
+                return evaluate_cell(r, c, table_widget, visited, values, cell)
+            finally:
+                self._depth -= 1
+
+        def profiled_evaluate_ast(node, table_widget, visited=None, values=None):
+            frame = self._frame
+            if frame is not None and type(node) is RangeRefNode and node.bounds is not None:
+                r1, c1, r2, c2 = node.bounds
+                frame.range_cells += (r2 - r1 + 1) * (c2 - c1 + 1)
+            return evaluate_ast(node, table_widget, visited, values)
+
+        def profiled_get_ast(formula_string):
+            if self._frame is not None and formula_string in calculator._ast_cache:
+                self._frame.ast_hits += 1
+            return get_ast(formula_string)
+
+        calculator.evaluate = profiled_evaluate
+        calculator._evaluate_cell = profiled_evaluate_cell
+        calculator._evaluate_ast = profiled_evaluate_ast
+        calculator._get_ast = profiled_get_ast
+
+    def detach(self) -> None:
+        if self.calculator is None:
+            return
+        for name in _PATCHED:
+            self.calculator.__dict__.pop(name, None)
+        self.calculator.vectorize = self._vectorize
+        self.calculator = None
+        self._frame = None
+
+    def report(self, group_by: str = "cell") -> list[dict]:
+        """Рядки звіту, від найгарячіших. group_by: "cell" або "formula"."""
+        groups: dict[object, list[FormulaStats]] = {}
+        for key, stats in self.stats.items():
+            groups.setdefault(stats.formula if group_by == "formula" else key, []).append(stats)
+
+        rows = []
+        for items in groups.values():
+            first = items[0]
+            count = sum(s.count for s in items)
+            total = sum(s.total for s in items)
+            if group_by == "formula" and len(items) > 1:
+                sheet, cell = "", f"{len(items)} клітинок"
+            else:
+                sheet = first.sheet
+                cell = get_column_letter(first.col + 1) + str(first.row + 1) if first.row is not None else ""
+            rows.append({
+                "sheet": sheet,
+                "cell": cell,
+                "formula": first.formula,
+                "count": count,
+                "total_ms": total * 1000,
+                "mean_ms": total * 1000 / count if count else 0.0,
+                "max_ms": max(s.max for s in items) * 1000,
+                "ast_cache_hits": sum(s.ast_hits for s in items),
+                "value_cache_hits": sum(s.value_hits for s in items),
+                "range_cells": sum(s.range_cells for s in items),
+                "max_depth": max(s.depth for s in items),
+            })
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        return rows
+
+    def export(self, path: str, group_by: str = "cell") -> None:
+        """Зберігає звіт у JSON або CSV (за розширенням файлу)."""
+        rows = self.report(group_by)
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="", encoding="utf-8-sig") as f:
+                writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(rows, f, ensure_ascii=False, indent=2)
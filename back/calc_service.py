@@ -0,0 +1,279 @@
+import os
+import sys
+import json
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from back.dependency_graph import CellKey
+from back.sheet_loader import SheetData, load_sheets, read_defined_names
+from back.sheet_model import SheetModel
+from back.string_table import StringTable
+from back.workbook_calc import WorkbookCalc
+from back.memory_report import table_memory, calculator_memory, deep_size, process_memory, MemoryTracker
+from utils.config import CALC_SERVICE_HOST, CALC_SERVICE_PORT, CALC_CACHE_WORKBOOKS
+
+# Локальний сервіс обчислень без GUI: тримає розібрані й обчислені книги в LRU-кеші
+# і відповідає на запити "встановити входи - повернути виходи" з інкрементним перерахунком.
+
+
+class ServiceError(Exception):
+    pass
+
+
+class CalcWorkbook(WorkbookCalc):
+    """Обчислена книга в пам'яті: моделі аркушів, кешовані значення формул і граф залежностей."""
+
+    def __init__(self, path: str, sheets: list[SheetData], names: dict[str, str] | None = None):
+        super().__init__()
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        self.lock = threading.Lock()
+        self.models: dict[str, SheetModel] = {}
+        self.strings = StringTable()
+        for data in sheets:
+            self.calculator.seed_ast_cache(data.formulas)
+            model = SheetModel.from_sheet_data(data, self.strings)
+            self.models[data.name] = model
+            self.add_sheet(data.name, model, scan=False)
+        self.names.update(names or {})
+        # Граф будується після реєстрації всіх аркушів, щоб посилання 'Аркуш!A1' вже розпізнавалися.
+        self.rebuild()
+        self.recalculate_all()
+
+    @classmethod
+    def load(cls, path: str) -> "CalcWorkbook":
+        return cls(path, load_sheets(path, max_workers=1), read_defined_names(path))
+
+    def resolve(self, ref: str) -> CellKey:
+        """'Аркуш!A1', "'Мій аркуш'!A1" або 'A1' (перший аркуш) -> (аркуш, рядок, стовпець)."""
+        sheet, _, cell = ref.rpartition("!")
+        sheet = sheet.strip("'") if sheet else next(iter(self.models), "")
+        entry = self.sheets.get(sheet)
+        if entry is None:
+            raise ServiceError(f"Аркуш не знайдено: {sheet}")
+        indices = self.calculator.cell_name_to_indices(cell.strip().upper())
+        if indices is None:
+            raise ServiceError(f"Некоректна адреса клітинки: {ref}")
+        return (entry.name, *indices)
+
+    def raw_value(self, ref: str):
+        sheet, r, c = self.resolve(ref)
+        item = self.models[sheet].item(r, c)
+        if item is None:
+            return None
+        return item.formula or item.text()
+
+    def set_cells(self, edits: dict[str, object]) -> int:
+        """Застосовує правки і перераховує лише залежні формули; повертає кількість перерахованих.
+        Усі адреси перевіряються до першої зміни: хибна адреса не лишає книгу напівзміненою."""
+        resolved = [(self.resolve(ref), value) for ref, value in edits.items()]
+        changed = []
+        for (sheet, r, c), value in resolved:
+            self.models[sheet].set_value(r, c, value)
+            changed.append(self.update_cell(sheet, r, c))
+        return self.recalculate_formulas(self.graph.affected_by(changed))
+
+    def get_cells(self, refs: list[str]) -> dict[str, object]:
+        result = {}
+        for ref in refs:
+            sheet, r, c = self.resolve(ref)
+            if (r, c) in self.values[sheet]:
+                result[ref] = self.values[sheet][(r, c)]
+                continue
+            item = self.models[sheet].item(r, c)
+            text = item.text() if item is not None else ""
+            try:
+                result[ref] = float(text) if text else None
+            except ValueError:
+                result[ref] = text
+        return result
+
+    def memory_report(self) -> dict:
+        with self.lock:
+            return {
+                "sheets": {name: table_memory(model) | {"model_bytes": deep_size(model.cells)}
+                           for name, model in self.models.items()},
+                "strings": len(self.strings),
+                "values_bytes": deep_size(self.values),
+                "graph_bytes": deep_size(self.graph),
+                "calculator": calculator_memory(self.calculator),
+            }
+
+    def calculate(self, inputs: dict[str, object], outputs: list[str], transient: bool = False) -> dict:
+        with self.lock:
+            previous = {ref: self.raw_value(ref) for ref in inputs} if transient else None
+            recalculated = self.set_cells(inputs) if inputs else 0
+            values = self.get_cells(outputs)
+            if previous is not None:
+                self.set_cells(previous)
+        return {"values": values, "recalculated": recalculated}
+
+
+class WorkbookCache:
+    """LRU-кеш обчислених книг; запис скидається, якщо файл на диску змінився."""
+
+    def __init__(self, max_workbooks: int = CALC_CACHE_WORKBOOKS, root: str | None = None):
+        self.max_workbooks = max_workbooks
+        self.root = os.path.realpath(root) if root else None
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict[str, CalcWorkbook] = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: dict[str, threading.Lock] = {}
+
+    def _resolve_path(self, path: str) -> str:
+        if self.root:
+            full_path = os.path.realpath(os.path.join(self.root, path))
+            if os.path.commonpath([self.root, full_path]) != self.root:
+                raise ServiceError(f"Шлях поза дозволеним каталогом: {path}")
+            return full_path
+        return os.path.realpath(path)
+
+    def _cached(self, path: str) -> CalcWorkbook | None:
+        with self._lock:
+            workbook = self._items.get(path)
+            if workbook is None:
+                return None
+            try:
+                fresh = os.path.getmtime(path) == workbook.mtime
+            except OSError:
+                fresh = False
+            if not fresh:
+                del self._items[path]
+                return None
+            self._items.move_to_end(path)
+            self.hits += 1
+            return workbook
+
+    def get(self, path: str) -> CalcWorkbook:
+        path = self._resolve_path(path)
+        workbook = self._cached(path)
+        if workbook is not None:
+            return workbook
+        if not os.path.isfile(path):
+            raise ServiceError(f"Файл не знайдено: {path}")
+
+        with self._lock:
+            load_lock = self._loading.setdefault(path, threading.Lock())
+        # Одну книгу завантажує лише один потік, інші книги при цьому не блокуються.
+        with load_lock:
+            workbook = self._cached(path)
+            if workbook is not None:
+                return workbook
+            workbook = CalcWorkbook.load(path)
+            with self._lock:
+                self.misses += 1
+                self._items[path] = workbook
+                while len(self._items) > self.max_workbooks:
+                    self._items.popitem(last=False)
+                self._loading.pop(path, None)
+        return workbook
+
+    def evict(self, path: str) -> bool:
+        path = self._resolve_path(path)
+        with self._lock:
+            return self._items.pop(path, None) is not None
+
+    def memory_report(self) -> dict:
+        with self._lock:
+            workbooks = list(self._items.values())
+        return {"process": process_memory(), "workbooks": {wb.path: wb.memory_report() for wb in workbooks}}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "workbooks": [{"path": wb.path, "sheets": len(wb.models), "formulas": len(wb.graph)}
+                                  for wb in self._items.values()]}
+
+
+class CalcRequestHandler(BaseHTTPRequestHandler):
+    # keep-alive: клієнт може надсилати тисячі запитів через одне з'єднання.
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, data: dict) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            data = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise ServiceError("Некоректний JSON")
+        if not isinstance(data, dict):
+            raise ServiceError("Очікувався JSON-об'єкт")
+        return data
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            return self._send_json(200, self.server.cache.stats())
+        if url.path == "/memory":
+            # /memory?tracemalloc=1 - додатково знімок tracemalloc (перший виклик вмикає трасування).
+            report = self.server.cache.memory_report()
+            if parse_qs(url.query).get("tracemalloc") == ["1"]:
+                report["tracemalloc"] = self.server.memory_tracker.snapshot()
+            return self._send_json(200, report)
+        self._send_json(404, {"error": "Невідомий шлях"})
+
+    def do_POST(self):
+        try:
+            request = self._read_json()
+            if self.path == "/calc":
+                workbook = self.server.cache.get(str(request.get("workbook", "")))
+                inputs = request.get("set") or {}
+                outputs = request.get("get") or []
+                if not isinstance(inputs, dict) or not isinstance(outputs, list):
+                    raise ServiceError("'set' має бути об'єктом, 'get' - списком")
+                result = workbook.calculate(inputs, outputs, bool(request.get("transient")))
+                return self._send_json(200, result)
+            if self.path == "/evict":
+                return self._send_json(200, {"evicted": self.server.cache.evict(str(request.get("workbook", "")))})
+            self._send_json(404, {"error": "Невідомий шлях"})
+        except ServiceError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+
+def create_server(host: str = CALC_SERVICE_HOST, port: int = CALC_SERVICE_PORT,
+                  cache: WorkbookCache | None = None) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), CalcRequestHandler)
+    server.daemon_threads = True
+    server.cache = cache or WorkbookCache()
+    server.memory_tracker = MemoryTracker()
+    return server
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="main.py serve", description="Локальний сервіс обчислення книг xlsx.")
+    parser.add_argument("--host", default=CALC_SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=CALC_SERVICE_PORT)
+    parser.add_argument("--cache-size", type=int, default=CALC_CACHE_WORKBOOKS, help="кількість книг у кеші")
+    parser.add_argument("--root", help="дозволити лише книги з цього каталогу")
+    args = parser.parse_args(argv)
+
+    server = create_server(args.host, args.port, WorkbookCache(args.cache_size, args.root))
+    print(f"Сервіс обчислень: http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,54 @@
 import re
-from openpyxl.utils import column_index_from_string, get_column_letter
-from PySide6.QtCore import Qt
-from back.parser import Parser, ErrorNode, ParsingError, CircularReferenceError, ReferenceError, ASTNode, NumberNode, CellRefNode, RangeRefNode, BinaryOpNode, FunctionNode, UnaryOpNode
+import operator
+from utils.cell_names import column_index_from_string, get_column_letter
+from back.parser import Parser, ErrorNode, ParsingError, CircularReferenceError, ReferenceError, ASTNode, NumberNode, CellRefNode, RangeRefNode, BinaryOpNode, FunctionNode, UnaryOpNode, StringNode, BooleanNode, NameNode
+from back.sheet_registry import SheetRegistry
+from back.name_registry import NameRegistry
+from back.lookup_index import LookupIndexCache, lookup_key, parse_criteria, wildcard_pattern
+from back.functions import FUNCTIONS
+from back.arrays import ArrayValue, broadcast, top_left
+
+# Роль даних, у якій клітинка зберігає формулу (значення Qt.ItemDataRole.UserRole).
+# Калькулятор не імпортує Qt, щоб працювати і без GUI.
+FORMULA_ROLE = 256
+# Позначка клітинки, заповненої результатом формули-масиву (Qt.ItemDataRole.UserRole + 1).
+SPILL_ROLE = 257
+_MISSING = object()
+# Коди помилок, які повертає evaluate; інші рядки - текстові результати формул.
+ERROR_CODES = frozenset({"#REF!", "#NAME?", "#DIV/0!", "#NUM!", "#ERROR!", "#CIRCULAR!", "#N/A", "#VALUE!",
+                         "#SPILL!"})
+_LOOKUP_FUNCTIONS = frozenset({"VLOOKUP", "MATCH", "XLOOKUP", "COUNTIF", "SUMIF"})
+# Оператори для числових масивів; ділення й степінь перевіряються окремо (#DIV/0!, #NUM!).
+_ARRAY_OPERATORS = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv,
+                    '^': operator.pow}
+
+
+class _BlockError:
+    """Помилка в одному рядку блоку протягнутих формул."""
+    __slots__ = ("code",)
+
+    def __init__(self, code: str):
+        self.code = code
+
+
+class _BlockFallback(Exception):
+    """Блок не обчислюється разом - формули рахуються по клітинках."""
+
 
 class FormulaCalculator:
     def __init__(self):
         self._cell_name_cache = {}
         self._ast_cache: dict[str, object] = {}
+        # Аркуші книги для посилань 'Аркуш!A1'; без реєстрації такі посилання дають #REF!.
+        self.sheets = SheetRegistry()
+        # Імена книги ('Ставка' -> 'Дані!B1'); невідоме ім'я у формулі дає #NAME?.
+        self.names = NameRegistry()
+        # Індекси діапазонів для функцій пошуку; зміни клітинок повідомляються через invalidate_cell.
+        self._lookup_indexes = LookupIndexCache()
+        # Функції формул (крім функцій пошуку); спільний реєстр, доповнюється через register_function.
+        self.functions = FUNCTIONS
+        # Обчислення протягнутих формул блоком; профілювальник вимикає його, бо міряє кожну клітинку.
+        self.vectorize = True
 
     def clear_caches(self) -> None:
         try:
@@ -17,6 +59,17 @@ class FormulaCalculator:
             self._ast_cache.clear()
         except Exception:
             pass
+        self._lookup_indexes.clear()
+
+    def invalidate_cell(self, table_widget: any, row: int, col: int) -> None:
+        """Позначає клітинку зміненою в індексах пошуку, що її містять."""
+        self._lookup_indexes.invalidate(table_widget, row, col)
+
+    def invalidate_range(self, table_widget: any, r1: int, c1: int, r2: int, c2: int) -> None:
+        self._lookup_indexes.invalidate_range(table_widget, r1, c1, r2, c2)
+
+    def seed_ast_cache(self, formulas: dict) -> None:
+        self._ast_cache.update(formulas)
 
     def _get_ast(self, formula_string: str):
         if not isinstance(formula_string, str):
@@ -40,144 +93,416 @@ class FormulaCalculator:
             pass
         return ast
 
-    @staticmethod
-    def _excel_max(*args) -> float | int:
-        if not args: return 0
-        try: return max(args)
-        except TypeError: return 0 
-
-    @staticmethod
-    def _excel_min(*args) -> float | int:
-        if not args: return 0
-        try: return min(args)
-        except TypeError: return 0
+    def _sheet_target(self, sheet: str) -> tuple[any, dict | None]:
+        entry = self.sheets.get(sheet)
+        if entry is None:
+            raise ReferenceError("#REF!")
+        return entry.table, entry.values
 
-    def _evaluate_ast(self, node: ASTNode, table_widget: any, visited: set[str] | None = None):
+    def _evaluate_ast(self, node: ASTNode, table_widget: any, visited: set[tuple] | None = None,
+                      values: dict | None = None):
         if visited is None:
             visited = set()
 
         if isinstance(node, NumberNode):
             return node.value
+
+        if isinstance(node, (StringNode, BooleanNode)):
+            return node.value
         
         if isinstance(node, ErrorNode):
             raise ReferenceError(node.error_code)
 
         if isinstance(node, CellRefNode):
-            cell = node.cell_name.upper()
-            if cell in visited:
-                raise CircularReferenceError(f"Circular reference detected at {cell}")
-            visited.add(cell)
-
-            indices = self.cell_name_to_indices(cell)
+            cell = node.cell_name
+            indices = node.indices
             if not indices:
-                visited.discard(cell)
                 raise ReferenceError("#NAME?")
+            if node.sheet is not None:
+                table_widget, values = self._sheet_target(node.sheet)
+                cell = f"{node.sheet}!{cell}"
             r, c = indices
             # If referenced cell is outside the current table bounds -> REF error
             if r >= table_widget.rowCount() or c >= table_widget.columnCount():
-                visited.discard(cell)
                 raise ReferenceError("#REF!")
-
-            item = table_widget.item(r, c)
-            if not item or not item.text():
-                visited.discard(cell)
-                return 0.0
-
-            formula = item.data(Qt.ItemDataRole.UserRole) if hasattr(item, 'data') else None
-            if formula and isinstance(formula, str) and formula.startswith("="):
-                ast = self._get_ast(formula)
-                value = self._evaluate_ast(ast, table_widget, visited)
-                visited.discard(cell)
-                return value
-
-            try:
-                val = float(item.text())
-            except Exception:
-                val = 0.0
-            visited.discard(cell)
-            return val
+            return self._evaluate_cell(r, c, table_widget, visited, values, cell)
 
         if isinstance(node, RangeRefNode):
-            start = node.start_cell
-            end = node.end_cell
-            start_idx = self.cell_name_to_indices(start)
-            end_idx = self.cell_name_to_indices(end)
-            if not start_idx or not end_idx:
-                raise ReferenceError("#NAME?")
-            r1, c1 = start_idx
-            r2, c2 = end_idx
-            min_r, max_r = min(r1, r2), max(r1, r2)
-            min_c, max_c = min(c1, c2), max(c1, c2)
-            values = []
-            for rr in range(min_r, max_r + 1):
-                for cc in range(min_c, max_c + 1):
-                    cell_name = get_column_letter(cc + 1) + str(rr + 1)
-                    try:
-                        val = self._evaluate_ast(CellRefNode(cell_name), table_widget, visited)
-                    except ReferenceError as e:
-                        msg = str(e)
-                        if msg.startswith("#REF"):
-                            raise
-                        continue
-                    values.append(val)
-            return values
+            return self._range_array(node, table_widget, visited, values)
+
+        if isinstance(node, NameNode):
+            return self._evaluate_ast(self._resolve_name(node), table_widget, visited, values)
 
         # Unary op
         if isinstance(node, UnaryOpNode):
-            val = self._evaluate_ast(node.operand, table_widget, visited)
-            if node.op == '-':
-                return -val
-            return val
+            val = self._evaluate_ast(node.operand, table_widget, visited, values)
+            if node.op != '-':
+                return val
+            if isinstance(val, ArrayValue):
+                return self._array_binary('*', val, -1.0)
+            return -val
 
         # Binary op
         if isinstance(node, BinaryOpNode):
-            left = self._evaluate_ast(node.left, table_widget, visited)
-            right = self._evaluate_ast(node.right, table_widget, visited)
-            op = node.op
-            try:
-                if op == '+':
-                    return left + right
-                if op == '-':
-                    return left - right
-                if op == '*':
-                    return left * right
-                if op == '/':
-                    if right == 0:
-                        raise ReferenceError("#DIV/0!")
-                    return left / right
-                if op == '^':
-                    if left == 0 and right == 0:
-                        raise ReferenceError("#NUM!")
-                    return left ** right
-            except ReferenceError:
-                raise
-            except Exception:
-                raise ReferenceError("#ERROR!")
+            left = self._evaluate_ast(node.left, table_widget, visited, values)
+            right = self._evaluate_ast(node.right, table_widget, visited, values)
+            if isinstance(left, ArrayValue) or isinstance(right, ArrayValue):
+                return self._array_binary(node.op, left, right)
+            return self._apply_binary(node.op, left, right)
 
         if isinstance(node, FunctionNode):
             func = node.func_name.upper()
-            args_values = []
+            if func in _LOOKUP_FUNCTIONS:
+                return self._evaluate_lookup(func, node.args, table_widget, visited, values)
+            spec = self.functions.get(func)
+            if spec is None or not spec.accepts(len(node.args)):
+                raise ReferenceError("#ERROR!")
+            skip_errors = spec.errors == "skip"
+            args = []
             for arg in node.args:
-                val = self._evaluate_ast(arg, table_widget, visited)
-                if isinstance(val, list):
-                    args_values.extend(val)
-                else:
-                    args_values.append(val)
+                if isinstance(arg, NameNode):
+                    arg = self._resolve_name(arg)
+                if not skip_errors and isinstance(arg, RangeRefNode):
+                    args.append(self._range_values(arg, table_widget, visited, values, skip_errors=False))
+                    continue
+                value = self._evaluate_ast(arg, table_widget, visited, values)
+                if isinstance(value, ArrayValue):
+                    value = self._array_arg(value, skip_errors)
+                args.append(value)
+            return spec.call(args)
 
-            nums = [v for v in args_values if isinstance(v, (int, float))]
+        raise ReferenceError("#ERROR!")
+
+    @staticmethod
+    def _apply_binary(op: str, left, right):
+        try:
+            if op == '+':
+                return left + right
+            if op == '-':
+                return left - right
+            if op == '*':
+                return left * right
+            if op == '/':
+                if right == 0:
+                    raise ReferenceError("#DIV/0!")
+                return left / right
+            if op == '^':
+                if left == 0 and right == 0:
+                    raise ReferenceError("#NUM!")
+                return left ** right
+        except ReferenceError:
+            raise
+        except Exception:
+            raise ReferenceError("#ERROR!")
+        raise ReferenceError("#ERROR!")
+
+    def _array_binary(self, op: str, left, right) -> ArrayValue:
+        """Поелементна операція над масивами (скаляр і масив з одним рядком чи стовпцем розширюються).
+
+        Числові масиви без помилок обчислюються одним проходом map; інакше - поелементно,
+        а помилки елементів стають кодами в результаті.
+        """
+        rows, cols, lefts, rights = broadcast(left, right)
+        func = _ARRAY_OPERATORS.get(op)
+        if func is None:
+            raise ReferenceError("#ERROR!")
+        if not any(isinstance(v, str) for v in lefts) and not any(isinstance(v, str) for v in rights) \
+                and (op != '/' or 0 not in rights) and (op != '^' or 0 not in lefts):
             try:
-                if func == 'SUM':
-                    return sum(nums)
-                if func == 'AVERAGE':
-                    return sum(nums) / len(nums) if nums else 0
-                if func == 'MAX':
-                    return max(nums) if nums else 0
-                if func == 'MIN':
-                    return min(nums) if nums else 0
+                return ArrayValue(map(func, lefts, rights), rows, cols)
             except Exception:
+                pass  # переповнення тощо - поелементно, з кодами помилок
+        result = []
+        for lv, rv in zip(lefts, rights):
+            if isinstance(lv, str) and lv in ERROR_CODES:
+                result.append(lv)
+            elif isinstance(rv, str) and rv in ERROR_CODES:
+                result.append(rv)
+            else:
+                try:
+                    result.append(self._apply_binary(op, lv, rv))
+                except ReferenceError as e:
+                    result.append(str(e))
+        return ArrayValue(result, rows, cols)
+
+    @staticmethod
+    def _array_arg(array: ArrayValue, skip_errors: bool) -> list:
+        """Масив як аргумент функції: помилки обробляються так само, як у діапазонах."""
+        result = []
+        for value in array:
+            if isinstance(value, str) and value in ERROR_CODES:
+                if value.startswith("#REF") or not skip_errors:
+                    raise ReferenceError(value)
+                continue
+            result.append(value)
+        return result
+
+    def _resolve_name(self, node: NameNode) -> ASTNode:
+        ast = self.names.resolve(node.name)
+        if ast is None:
+            raise ReferenceError("#NAME?")
+        return ast
+
+    def _range_bounds(self, node: RangeRefNode, table_widget: any, values: dict | None) -> tuple:
+        """Діапазон -> (таблиця, значення, r1, c1, r2, c2) з упорядкованими межами, без перевірки розміру."""
+        if node.bounds is None:
+            raise ReferenceError("#NAME?")
+        if node.sheet is not None:
+            table_widget, values = self._sheet_target(node.sheet)
+        return (table_widget, values, *node.bounds)
+
+    def _range_values(self, node: RangeRefNode, table_widget: any, visited: set[tuple], values: dict | None,
+                      skip_errors: bool = True) -> list:
+        """Значення клітинок діапазону; помилки, крім #REF!, пропускаються або (skip_errors=False) повертаються."""
+        table_widget, values, min_r, min_c, max_r, max_c = self._range_bounds(node, table_widget, values)
+        row_count, col_count = table_widget.rowCount(), table_widget.columnCount()
+        range_values = []
+        for rr in range(min_r, max_r + 1):
+            for cc in range(min_c, max_c + 1):
+                if rr >= row_count or cc >= col_count:
+                    raise ReferenceError("#REF!")
+                try:
+                    val = self._evaluate_cell(rr, cc, table_widget, visited, values)
+                except ReferenceError as e:
+                    msg = str(e)
+                    if msg.startswith("#REF") or not skip_errors:
+                        raise
+                    continue
+                range_values.append(val)
+        return range_values
+
+    def _range_array(self, node: RangeRefNode, table_widget: any, visited: set[tuple],
+                     values: dict | None) -> ArrayValue:
+        """Діапазон у виразі: масив усіх клітинок; помилки, крім #REF!, залишаються кодами елементів."""
+        table_widget, values, min_r, min_c, max_r, max_c = self._range_bounds(node, table_widget, values)
+        if max_r >= table_widget.rowCount() or max_c >= table_widget.columnCount():
+            raise ReferenceError("#REF!")
+        result = []
+        # Числа й порожні клітинки читаються напряму; профілювальник (vectorize=False) рахує кожну клітинку.
+        direct = self.vectorize
+        for rr in range(min_r, max_r + 1):
+            for cc in range(min_c, max_c + 1):
+                if direct:
+                    value = values.get((rr, cc), _MISSING) if values is not None else _MISSING
+                    if value is not _MISSING:
+                        if not isinstance(value, str):
+                            result.append(value)
+                            continue
+                    else:
+                        item = table_widget.item(rr, cc)
+                        if item is None:
+                            result.append(0.0)
+                            continue
+                        if not item.data(FORMULA_ROLE):
+                            try:
+                                result.append(float(item.text()) if item.text() else 0.0)
+                            except ValueError:
+                                result.append(0.0)
+                            continue
+                try:
+                    result.append(self._evaluate_cell(rr, cc, table_widget, visited, values))
+                except ReferenceError as e:
+                    if str(e).startswith("#REF"):
+                        raise
+                    result.append(str(e))
+        return ArrayValue(result, max_r - min_r + 1, max_c - min_c + 1)
+
+    def _evaluate_cell(self, r: int, c: int, table_widget: any, visited: set[tuple], values: dict | None,
+                       cell: str | None = None):
+        if values is not None:
+            value = values.get((r, c), _MISSING)
+            if value is not _MISSING:
+                # Уже обчислене значення формули (інкрементний перерахунок).
+                if isinstance(value, str):
+                    if value == "#CIRCULAR!":
+                        cell = cell or get_column_letter(c + 1) + str(r + 1)
+                        raise CircularReferenceError(f"Circular reference detected at {cell}")
+                    if value in ERROR_CODES:
+                        raise ReferenceError(value)
+                return value
+
+        item = table_widget.item(r, c)
+        if not item or not item.text():
+            return 0.0
+
+        formula = item.data(FORMULA_ROLE) if hasattr(item, 'data') else None
+        if formula and isinstance(formula, str) and formula.startswith("="):
+            # Ключ відвідування містить таблицю: A1 різних аркушів - різні клітинки.
+            key = (id(table_widget), r, c)
+            if key in visited:
+                cell = cell or get_column_letter(c + 1) + str(r + 1)
+                raise CircularReferenceError(f"Circular reference detected at {cell}")
+            visited.add(key)
+            try:
+                # Клітинка з формулою-масивом має значення лівого верхнього елемента.
+                return top_left(self._evaluate_ast(self._get_ast(formula), table_widget, visited, values))
+            finally:
+                visited.discard(key)
+
+        try:
+            return float(item.text())
+        except Exception:
+            return 0.0
+
+    def _range_arg(self, node: ASTNode, table_widget: any, values: dict | None) -> tuple:
+        """Клітинка, діапазон чи ім'я - аргумент функції пошуку -> (таблиця, значення, r1, c1, r2, c2)."""
+        if isinstance(node, NameNode):
+            node = self._resolve_name(node)
+        if isinstance(node, CellRefNode):
+            bounds = node.indices * 2 if node.indices else None
+        elif isinstance(node, RangeRefNode):
+            bounds = node.bounds
+        else:
+            raise ReferenceError("#VALUE!")
+        if bounds is None:
+            raise ReferenceError("#NAME?")
+        if node.sheet is not None:
+            table_widget, values = self._sheet_target(node.sheet)
+        r1, c1, r2, c2 = bounds
+        if r2 >= table_widget.rowCount() or c2 >= table_widget.columnCount():
+            raise ReferenceError("#REF!")
+        return table_widget, values, r1, c1, r2, c2
+
+    def _cell_lookup_value(self, r: int, c: int, table_widget: any, visited: set[tuple], values: dict | None):
+        """Значення клітинки для пошуку: число, текст або None для порожньої (на відміну від 0.0 в арифметиці)."""
+        item = table_widget.item(r, c)
+        if item is None:
+            return None
+        formula = item.data(FORMULA_ROLE) if hasattr(item, 'data') else None
+        if isinstance(formula, str) and formula.startswith("="):
+            return self._evaluate_cell(r, c, table_widget, visited, values)
+        text = item.text()
+        if not text:
+            return None
+        try:
+            return float(text)
+        except ValueError:
+            return text
+
+    def _lookup_arg(self, node: ASTNode, table_widget: any, visited: set[tuple], values: dict | None):
+        if isinstance(node, NameNode):
+            node = self._resolve_name(node)
+        if isinstance(node, CellRefNode):
+            table, cell_values, r, c, _, _ = self._range_arg(node, table_widget, values)
+            return self._cell_lookup_value(r, c, table, visited, cell_values)
+        value = self._evaluate_ast(node, table_widget, visited, values)
+        if isinstance(value, list):
+            raise ReferenceError("#VALUE!")
+        return value
+
+    def _number_arg(self, node: ASTNode, table_widget: any, visited: set[tuple], values: dict | None) -> float:
+        value = self._lookup_arg(node, table_widget, visited, values)
+        if value is None:
+            return 0.0
+        if isinstance(value, (int, float)):
+            return float(value)
+        try:
+            return float(value)
+        except ValueError:
+            raise ReferenceError("#VALUE!")
+
+    def _range_index(self, table_widget: any, values: dict | None, r1: int, c1: int, r2: int, c2: int,
+                     visited: set[tuple]):
+        def read(r, c):
+            try:
+                return self._cell_lookup_value(r, c, table_widget, visited, values)
+            except ReferenceError:
+                return None  # клітинки з помилками не збігаються з жодним значенням
+        return self._lookup_indexes.get(table_widget, r1, c1, r2, c2, read)
+
+    @staticmethod
+    def _find_position(index, lookup, mode: int, last: bool = False, wildcards: bool = True) -> int | None:
+        """mode 0 - точний збіг (текст із * ? - за шаблоном), 1 - найбільше <= lookup, -1 - найменше >= lookup."""
+        key = lookup_key(lookup)
+        if key is None:
+            return None
+        if mode == 0:
+            pattern = wildcard_pattern(key) if wildcards and isinstance(key, str) else None
+            positions = index.matching("=", key, pattern) if pattern is not None else index.exact(key)
+            if not positions:
+                return None
+            return max(positions) if last else min(positions)
+        return index.at_most(key) if mode > 0 else index.at_least(key)
+
+    def _evaluate_lookup(self, func: str, args: list, table_widget: any, visited: set[tuple], values: dict | None):
+        if func in ("COUNTIF", "SUMIF"):
+            if len(args) not in ((2,) if func == "COUNTIF" else (2, 3)):
                 raise ReferenceError("#ERROR!")
+            table, range_values, r1, c1, r2, c2 = self._range_arg(args[0], table_widget, values)
+            op, key, pattern = parse_criteria(self._lookup_arg(args[1], table_widget, visited, values))
+            index = self._range_index(table, range_values, r1, c1, r2, c2, visited)
+            if func == "COUNTIF":
+                return float(index.count(op, key, pattern))
+            sum_table, sum_values, sr1, sc1 = (table, range_values, r1, c1) if len(args) == 2 else \
+                self._range_arg(args[2], table_widget, values)[:4]
+            total = 0.0
+            for pos in index.matching(op, key, pattern):
+                r, c = sr1 + pos // index.width, sc1 + pos % index.width
+                if r >= sum_table.rowCount() or c >= sum_table.columnCount():
+                    continue
+                value = self._cell_lookup_value(r, c, sum_table, visited, sum_values)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    total += value
+            return total
+
+        if func == "MATCH":
+            if len(args) not in (2, 3):
+                raise ReferenceError("#ERROR!")
+            lookup = self._lookup_arg(args[0], table_widget, visited, values)
+            table, range_values, r1, c1, r2, c2 = self._range_arg(args[1], table_widget, values)
+            mode = self._number_arg(args[2], table_widget, visited, values) if len(args) == 3 else 1
+            if r1 != r2 and c1 != c2:
+                raise ReferenceError("#N/A")
+            index = self._range_index(table, range_values, r1, c1, r2, c2, visited)
+            pos = self._find_position(index, lookup, (mode > 0) - (mode < 0))
+            if pos is None:
+                raise ReferenceError("#N/A")
+            return float(pos + 1)
+
+        if func == "VLOOKUP":
+            if len(args) not in (3, 4):
+                raise ReferenceError("#ERROR!")
+            lookup = self._lookup_arg(args[0], table_widget, visited, values)
+            table, range_values, r1, c1, r2, c2 = self._range_arg(args[1], table_widget, values)
+            col = int(self._number_arg(args[2], table_widget, visited, values))
+            approximate = bool(self._lookup_arg(args[3], table_widget, visited, values)) if len(args) == 4 else True
+            if col < 1:
+                raise ReferenceError("#VALUE!")
+            if c1 + col - 1 > c2:
+                raise ReferenceError("#REF!")
+            # Індексується лише перший стовпець таблиці: його спільно використовують усі VLOOKUP до неї.
+            index = self._range_index(table, range_values, r1, c1, r2, c1, visited)
+            pos = self._find_position(index, lookup, 1 if approximate else 0)
+            if pos is None:
+                raise ReferenceError("#N/A")
+            result = self._cell_lookup_value(r1 + pos, c1 + col - 1, table, visited, range_values)
+            return 0.0 if result is None else result
+
+        # XLOOKUP(значення, масив_пошуку, масив_результатів, [якщо_не_знайдено], [режим_збігу], [режим_пошуку])
+        if not 3 <= len(args) <= 6:
+            raise ReferenceError("#ERROR!")
+        lookup = self._lookup_arg(args[0], table_widget, visited, values)
+        table, range_values, r1, c1, r2, c2 = self._range_arg(args[1], table_widget, values)
+        ret_table, ret_values, rr1, rc1, rr2, rc2 = self._range_arg(args[2], table_widget, values)
+        match_mode = int(self._number_arg(args[4], table_widget, visited, values)) if len(args) >= 5 else 0
+        search_mode = int(self._number_arg(args[5], table_widget, visited, values)) if len(args) == 6 else 1
+        if r1 != r2 and c1 != c2 or match_mode not in (-1, 0, 1, 2):
+            raise ReferenceError("#VALUE!")
+        index = self._range_index(table, range_values, r1, c1, r2, c2, visited)
+        # Режим збігу: 0 - точний, -1 - точний або менший, 1 - точний або більший, 2 - шаблон * ?.
+        pos = self._find_position(index, lookup, 0, last=search_mode < 0, wildcards=match_mode == 2)
+        if pos is None and match_mode in (-1, 1):
+            pos = self._find_position(index, lookup, -match_mode)
+        if pos is None:
+            if len(args) >= 4:
+                return self._lookup_arg(args[3], table_widget, visited, values)
+            raise ReferenceError("#N/A")
+        row, col = (rr1 + pos, rc1) if c1 == c2 else (rr1, rc1 + pos)
+        if row > rr2 or col > rc2:
+            raise ReferenceError("#VALUE!")
+        result = self._cell_lookup_value(row, col, ret_table, visited, ret_values)
+        return 0.0 if result is None else result
 
-        raise ReferenceError("#ERROR!")
     def cell_name_to_indices(self, cell_name: str) -> tuple[int, int] | None:
         if cell_name in self._cell_name_cache:
             return self._cell_name_cache[cell_name]
@@ -227,7 +552,13 @@ class FormulaCalculator:
             return []
 
 
-    def parse_and_calculate(self, formula_string: str, table_widget: any) -> str:
+    def evaluate(self, formula_string: str, table_widget: any, values: dict | None = None,
+                 cell: tuple | None = None):
+        """Обчислює формулу; повертає число або код помилки рядком.
+
+        values - {(рядок, стовпець): значення} уже обчислених формул, які не треба перераховувати.
+        cell - (аркуш, рядок, стовпець) клітинки для профілювальника; на результат не впливає.
+        """
         if not formula_string.startswith("="):
             return formula_string
         try:
@@ -236,13 +567,182 @@ class FormulaCalculator:
                 return ast.error_code if hasattr(ast, 'error_code') else "#ERROR!"
 
             try:
-                value = self._evaluate_ast(ast, table_widget)
+                return self._evaluate_ast(ast, table_widget, values=values)
             except CircularReferenceError:
                 return "#CIRCULAR!"
             except ReferenceError as re_err:
                 return str(re_err)
-            if isinstance(value, list):
-                return str(value)
-            return str(value)
         except Exception:
-            return "#ERROR!"
\ No newline at end of file
+            return "#ERROR!"
+
+    def evaluate_block(self, formula_string: str, table_widget: any, values: dict | None, count: int) -> list | None:
+        """Обчислює формулу, протягнуту вниз на count рядків, одним проходом по AST.
+
+        formula_string - формула першого рядка блоку; у k-му рядку посилання зсунуті на k рядків.
+        Формули блоку не повинні посилатися одна на одну. Функції з векторною реалізацією
+        викликаються один раз на блок. Повертає значення по рядках або None, якщо блок
+        треба рахувати по клітинках (функції пошуку, цикли тощо).
+        """
+        ast = self._get_ast(formula_string)
+        try:
+            column = self._block_ast(ast, table_widget, values, count)
+        except (_BlockFallback, CircularReferenceError):
+            return None
+        return [v.code if isinstance(v, _BlockError) else v for v in column]
+
+    def _block_column(self, row: int, col: int, count: int, table_widget: any, values: dict | None) -> list:
+        """Значення клітинок стовпця col з рядків row..row+count-1 (як _evaluate_cell, без рекурсії по AST)."""
+        result = []
+        row_count = table_widget.rowCount()
+        for r in range(row, row + count):
+            if r >= row_count:
+                result.append(_BlockError("#REF!"))
+                continue
+            if values is not None:
+                value = values.get((r, col), _MISSING)
+                if value is not _MISSING:
+                    if isinstance(value, str) and value in ERROR_CODES:
+                        if value == "#CIRCULAR!":
+                            raise CircularReferenceError(value)
+                        value = _BlockError(value)
+                    result.append(value)
+                    continue
+            item = table_widget.item(r, col)
+            text = item.text() if item else ""
+            if not text:
+                result.append(0.0)
+                continue
+            formula = item.data(FORMULA_ROLE) if hasattr(item, 'data') else None
+            if isinstance(formula, str) and formula.startswith("="):
+                try:
+                    result.append(self._evaluate_cell(r, col, table_widget, set(), values))
+                except ReferenceError as e:
+                    result.append(_BlockError(str(e)))
+                continue
+            try:
+                result.append(float(text))
+            except ValueError:
+                result.append(0.0)
+        return result
+
+    def _block_ast(self, node: ASTNode, table_widget: any, values: dict | None, count: int) -> list:
+        """Значення вузла для кожного рядка блоку; помилки рядків - _BlockError."""
+        if isinstance(node, (NumberNode, StringNode, BooleanNode)):
+            return [node.value] * count
+
+        if isinstance(node, CellRefNode):
+            indices = node.indices
+            if not indices:
+                return [_BlockError("#NAME?")] * count
+            if node.sheet is not None:
+                try:
+                    table_widget, values = self._sheet_target(node.sheet)
+                except ReferenceError as e:
+                    return [_BlockError(str(e))] * count
+            r, c = indices
+            if c >= table_widget.columnCount():
+                return [_BlockError("#REF!")] * count
+            return self._block_column(r, c, count, table_widget, values)
+
+        if isinstance(node, UnaryOpNode):
+            operand = self._block_ast(node.operand, table_widget, values, count)
+            if node.op != '-':
+                return operand
+            result = []
+            for v in operand:
+                try:
+                    result.append(v if isinstance(v, _BlockError) else -v)
+                except TypeError:
+                    result.append(_BlockError("#ERROR!"))
+            return result
+
+        if isinstance(node, BinaryOpNode):
+            left = self._block_ast(node.left, table_widget, values, count)
+            right = self._block_ast(node.right, table_widget, values, count)
+            result = []
+            for lv, rv in zip(left, right):
+                if isinstance(lv, _BlockError):
+                    result.append(lv)
+                elif isinstance(rv, _BlockError):
+                    result.append(rv)
+                else:
+                    try:
+                        result.append(self._apply_binary(node.op, lv, rv))
+                    except ReferenceError as e:
+                        result.append(_BlockError(str(e)))
+            return result
+
+        if isinstance(node, FunctionNode):
+            spec = self.functions.get(node.func_name)
+            if spec is None or node.func_name.upper() in _LOOKUP_FUNCTIONS:
+                raise _BlockFallback()
+            if not spec.accepts(len(node.args)):
+                return [_BlockError("#ERROR!")] * count
+            columns = [self._block_range(arg, table_widget, values, count, spec.errors == "skip")
+                       if isinstance(arg, RangeRefNode) else self._block_ast(arg, table_widget, values, count)
+                       for arg in node.args]
+            result: list = [None] * count
+            rows = []
+            for k in range(count):
+                error = next((arg for arg in (column[k] for column in columns) if isinstance(arg, _BlockError)), None)
+                if error is not None:
+                    result[k] = error
+                else:
+                    rows.append(k)
+            if not rows:
+                return result
+            if len(rows) < count:
+                columns = [[column[k] for k in rows] for column in columns]
+            computed = None
+            if spec.vector is not None and columns:
+                try:
+                    computed = spec.vector(columns)
+                except Exception:
+                    computed = None  # векторна реалізація не впоралася - рахуємо рядки окремо
+            if computed is None:
+                computed = []
+                for idx in range(len(rows)):
+                    try:
+                        computed.append(spec.call([column[idx] for column in columns]))
+                    except ReferenceError as e:
+                        computed.append(_BlockError(str(e)))
+            for k, value in zip(rows, computed):
+                result[k] = value
+            return result
+
+        # Діапазони поза аргументами функцій, помилки розбору тощо рахуються по клітинках.
+        raise _BlockFallback()
+
+    def _block_range(self, node: RangeRefNode, table_widget: any, values: dict | None, count: int,
+                     skip_errors: bool) -> list:
+        """Значення діапазону-аргументу для кожного рядка блоку (як у _range_values).
+
+        Стовпці читаються один раз на весь блок: ковзні діапазони не перечитують спільні клітинки.
+        """
+        try:
+            table_widget, values, r1, c1, r2, c2 = self._range_bounds(node, table_widget, values)
+        except ReferenceError as e:
+            return [_BlockError(str(e))] * count
+        if c2 >= table_widget.columnCount():
+            return [_BlockError("#REF!")] * count
+        height = r2 - r1 + 1
+        columns = [self._block_column(r1, cc, height + count - 1, table_widget, values) for cc in range(c1, c2 + 1)]
+        result = []
+        for k in range(count):
+            range_values = []
+            for rr in range(k, k + height):
+                for column in columns:
+                    value = column[rr]
+                    if isinstance(value, _BlockError):
+                        if value.code.startswith("#REF") or not skip_errors:
+                            range_values = value
+                            break
+                        continue
+                    range_values.append(value)
+                if isinstance(range_values, _BlockError):
+                    break
+            result.append(range_values)
+        return result
+
+    def parse_and_calculate(self, formula_string: str, table_widget: any, cell: tuple | None = None) -> str:
+        return str(top_left(self.evaluate(formula_string, table_widget, cell=cell)))
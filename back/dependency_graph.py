@@ -0,0 +1,344 @@
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+from back.parser import ASTNode, CellRefNode, RangeRefNode, BinaryOpNode, UnaryOpNode, FunctionNode, NameNode
+
+# Ключ клітинки: (аркуш, рядок, стовпець), індекси з нуля.
+CellKey = tuple[str, int, int]
+
+
+def collect_references(node: ASTNode, cells: list, ranges: list, names: list | None = None) -> None:
+    """Збирає з AST посилання на клітинки (аркуш, рядок, стовпець), діапазони (аркуш, r1, c1, r2, c2)
+    і, якщо передано names, імена книги.
+
+    Аркуш - None для посилань на аркуш самої формули.
+    """
+    if isinstance(node, CellRefNode):
+        if node.indices:
+            cells.append((node.sheet, *node.indices))
+    elif isinstance(node, RangeRefNode):
+        if node.bounds:
+            ranges.append((node.sheet, *node.bounds))
+    elif isinstance(node, NameNode):
+        if names is not None:
+            names.append(node.name)
+    elif isinstance(node, BinaryOpNode):
+        collect_references(node.left, cells, ranges, names)
+        collect_references(node.right, cells, ranges, names)
+    elif isinstance(node, UnaryOpNode):
+        collect_references(node.operand, cells, ranges, names)
+    elif isinstance(node, FunctionNode):
+        for arg in node.args:
+            collect_references(arg, cells, ranges, names)
+
+
+class DependencyGraph:
+    """Граф залежностей формул для інкрементного перерахунку.
+
+    Прямі посилання зберігаються як ребра клітинка -> формули, що її читають.
+    Діапазони не розгортаються: індексуються за стовпцями аркуша.
+    Граф охоплює всю книгу: resolve_sheet зводить назву аркуша з посилання 'Аркуш!A1'
+    (лексер переводить її у верхній регістр) до назви, що використовується в ключах.
+    resolve_name повертає розібране визначення імені книги: формула з іменем залежить від
+    посилань визначення, а зміна визначення переприв'язує лише формули з name_dependents.
+
+    Формула-масив (якір) розливає результат у прямокутник рядків x стовпців, що починається з неї.
+    Формули, які читають клітинки цього прямокутника, залежать від якоря. Заблокований розлив
+    (#SPILL!) зберігає бажаний розмір: звільнення прямокутника перераховує якір.
+    """
+
+    def __init__(self, resolve_sheet=None, resolve_name=None):
+        self._resolve_sheet = resolve_sheet or (lambda name: name)
+        self._resolve_name = resolve_name or (lambda name: None)
+        self._cells: dict[CellKey, list[CellKey]] = {}
+        self._ranges: dict[CellKey, list[tuple[str, int, int, int, int]]] = {}
+        self._dependents: dict[CellKey, set[CellKey]] = {}
+        self._range_index: dict[tuple[str, int], dict[CellKey, list[tuple[int, int]]]] = {}
+        # Імена, які використовує формула (прямо чи через інші імена), і формули за іменем (casefold).
+        self._names: dict[CellKey, set[str]] = {}
+        self._name_index: dict[str, set[CellKey]] = {}
+        # Розливи: якір -> (рядки, стовпці, заблоковано?) і стовпець -> {якір: (r1, r2)}.
+        self._spills: dict[CellKey, tuple[int, int, bool]] = {}
+        self._spill_index: dict[tuple[str, int], dict[CellKey, tuple[int, int]]] = {}
+
+    def __contains__(self, key: CellKey) -> bool:
+        return key in self._cells
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def formulas(self) -> list[CellKey]:
+        return list(self._cells)
+
+    def set_formula(self, key: CellKey, ast: ASTNode) -> None:
+        self.remove_formula(key)
+        sheet = key[0]
+        cells, ranges, names = [], [], []
+        collect_references(ast, cells, ranges, names)
+        if names:
+            used = set()
+            for name in names:  # визначення можуть посилатися на інші імена; цикли відкидає NameRegistry
+                folded = name.casefold()
+                if folded in used:
+                    continue
+                used.add(folded)
+                self._name_index.setdefault(folded, set()).add(key)
+                definition = self._resolve_name(name)
+                if definition is not None:
+                    collect_references(definition, cells, ranges, names)
+            self._names[key] = used
+
+        resolve = self._resolve_sheet
+        precedents = [(sheet if ref_sheet is None else resolve(ref_sheet), r, c) for ref_sheet, r, c in cells]
+        self._cells[key] = precedents
+        for precedent in precedents:
+            self._dependents.setdefault(precedent, set()).add(key)
+
+        sheet_ranges = [(sheet if ref_sheet is None else resolve(ref_sheet), r1, c1, r2, c2)
+                        for ref_sheet, r1, c1, r2, c2 in ranges]
+        if sheet_ranges:
+            self._ranges[key] = sheet_ranges
+        for range_sheet, r1, c1, r2, c2 in sheet_ranges:
+            for c in range(c1, c2 + 1):
+                self._range_index.setdefault((range_sheet, c), {}).setdefault(key, []).append((r1, r2))
+
+    def remove_formula(self, key: CellKey) -> None:
+        for name in self._names.pop(key, ()):
+            users = self._name_index[name]
+            users.discard(key)
+            if not users:
+                del self._name_index[name]
+        for precedent in self._cells.pop(key, ()):
+            dependents = self._dependents.get(precedent)
+            if dependents is not None:
+                dependents.discard(key)
+                if not dependents:
+                    del self._dependents[precedent]
+        for sheet, _, c1, _, c2 in self._ranges.pop(key, ()):
+            for c in range(c1, c2 + 1):
+                by_formula = self._range_index.get((sheet, c))
+                if by_formula is not None:
+                    by_formula.pop(key, None)
+                    if not by_formula:
+                        del self._range_index[(sheet, c)]
+
+    def set_spill(self, anchor: CellKey, rows: int, cols: int, blocked: bool = False) -> None:
+        self.clear_spill(anchor)
+        sheet, row, col = anchor
+        self._spills[anchor] = (rows, cols, blocked)
+        for c in range(col, col + cols):
+            self._spill_index.setdefault((sheet, c), {})[anchor] = (row, row + rows - 1)
+
+    def clear_spill(self, anchor: CellKey) -> tuple[int, int, bool] | None:
+        extent = self._spills.pop(anchor, None)
+        if extent is not None:
+            sheet, _, col = anchor
+            for c in range(col, col + extent[1]):
+                by_anchor = self._spill_index[(sheet, c)]
+                del by_anchor[anchor]
+                if not by_anchor:
+                    del self._spill_index[(sheet, c)]
+        return extent
+
+    def spill_extent(self, anchor: CellKey) -> tuple[int, int, bool] | None:
+        """(рядки, стовпці, заблоковано?) розливу формули anchor або None."""
+        return self._spills.get(anchor)
+
+    def spills(self) -> dict[CellKey, tuple[int, int, bool]]:
+        return dict(self._spills)
+
+    def spill_anchors_at(self, key: CellKey, blocked: bool = True) -> list[CellKey]:
+        """Якорі, чий розлив (і заблокований, якщо blocked) покриває клітинку key, крім неї самої."""
+        sheet, row, col = key
+        return [anchor for anchor, (r1, r2) in self._spill_index.get((sheet, col), {}).items()
+                if r1 <= row <= r2 and anchor != key and (blocked or not self._spills[anchor][2])]
+
+    def spill_overlaps(self, anchor: CellKey, rows: int, cols: int) -> bool:
+        """Чи перетинає прямокутник rows x cols від anchor активний розлив іншого якоря."""
+        sheet, row, col = anchor
+        for c in range(col, col + cols):
+            for other, (r1, r2) in self._spill_index.get((sheet, c), {}).items():
+                if other != anchor and r1 < row + rows and r2 >= row and not self._spills[other][2]:
+                    return True
+        return False
+
+    def spill_anchor(self, key: CellKey) -> CellKey | None:
+        """Якір, значення якого розлите в клітинку key."""
+        anchors = self.spill_anchors_at(key, blocked=False)
+        return anchors[0] if anchors else None
+
+    def dependents_of(self, key: CellKey) -> set[CellKey]:
+        """Формули, які безпосередньо читають клітинку key (для якоря - і клітинки його розливу)."""
+        result = set(self._dependents.get(key, ()))
+        sheet, row, col = key
+        for formula, spans in self._range_index.get((sheet, col), {}).items():
+            for r1, r2 in spans:
+                if r1 <= row <= r2:
+                    result.add(formula)
+                    break
+        extent = self._spills.get(key)
+        if extent is not None and not extent[2]:
+            self._region_dependents(key, extent[0], extent[1], result)
+        return result
+
+    def _region_dependents(self, anchor: CellKey, rows: int, cols: int, result: set[CellKey]) -> None:
+        sheet, row, col = anchor
+        dependents = self._dependents
+        for c in range(col, col + cols):
+            for r in range(row, row + rows):
+                if (r, c) != (row, col):
+                    result.update(dependents.get((sheet, r, c), ()))
+            for formula, spans in self._range_index.get((sheet, c), {}).items():
+                if any(r1 <= row + rows - 1 and r2 >= row for r1, r2 in spans):
+                    result.add(formula)
+
+    def name_dependents(self, name: str) -> set[CellKey]:
+        """Формули, що використовують ім'я (зокрема через визначення інших імен)."""
+        return set(self._name_index.get(name.casefold(), ()))
+
+    def references(self, key: CellKey) -> tuple[list[CellKey], list[tuple[str, int, int, int, int]]]:
+        """Прямі посилання і діапазони формули з назвами аркушів, як у ключах."""
+        return self._cells.get(key, []), self._ranges.get(key, [])
+
+    def _precedents_within(self, key: CellKey, pending: set[CellKey],
+                           pending_rows: dict[tuple[str, int], list[int]]) -> set[CellKey]:
+        result = {p for p in self._cells.get(key, ()) if p in pending}
+        for sheet, r1, c1, r2, c2 in self._ranges.get(key, ()):
+            # Формули з pending у діапазоні шукаються бінарним пошуком у відсортованих рядках стовпця.
+            for c in range(c1, c2 + 1):
+                rows = pending_rows.get((sheet, c))
+                if rows:
+                    result.update((sheet, r, c) for r in rows[bisect_left(rows, r1):bisect_right(rows, r2)])
+        if self._spills:
+            # Клітинки розливу обчислюються разом з якорем.
+            for sheet, r, c in self._cells.get(key, ()):
+                anchor = self.spill_anchor((sheet, r, c))
+                if anchor in pending:
+                    result.add(anchor)
+            for sheet, r1, c1, r2, c2 in self._ranges.get(key, ()):
+                for c in range(c1, c2 + 1):
+                    for anchor, (sr1, sr2) in self._spill_index.get((sheet, c), {}).items():
+                        if sr1 <= r2 and sr2 >= r1 and anchor in pending and not self._spills[anchor][2]:
+                            result.add(anchor)
+        return result
+
+    def affected_by(self, changed, spills: bool = True) -> set[CellKey]:
+        """Усі формули, які прямо чи транзитивно залежать від змінених клітинок (і самі змінені формули).
+
+        spills - разом з якорями, чий розлив покриває змінені клітинки (правка могла його заблокувати
+        чи звільнити).
+        """
+        if spills and self._spills:
+            changed = list(changed)
+            changed.extend(anchor for key in list(changed) for anchor in self.spill_anchors_at(key))
+        affected = {key for key in changed if key in self._cells}
+        queue = deque(changed)
+        seen = set(changed)
+        while queue:
+            for dependent in self.dependents_of(queue.popleft()):
+                affected.add(dependent)
+                if dependent not in seen:
+                    seen.add(dependent)
+                    queue.append(dependent)
+        return affected
+
+    @staticmethod
+    def _rows_by_column(keys) -> dict[tuple[str, int], list[int]]:
+        rows_by_column: dict[tuple[str, int], list[int]] = {}
+        for sheet, r, c in keys:
+            rows_by_column.setdefault((sheet, c), []).append(r)
+        for rows in rows_by_column.values():
+            rows.sort()
+        return rows_by_column
+
+    def _topological(self, formulas) -> tuple[list[CellKey], set[CellKey]]:
+        """Топологічний порядок формул і множина решти: клітинки циклів і ті, що від них залежать."""
+        pending = set(formulas)
+        pending_rows = self._rows_by_column(pending)
+        waiting: dict[CellKey, int] = {}
+        unlocks: dict[CellKey, list[CellKey]] = {}
+        for key in pending:
+            precedents = self._precedents_within(key, pending, pending_rows)
+            waiting[key] = len(precedents)
+            for precedent in precedents:
+                unlocks.setdefault(precedent, []).append(key)
+
+        order = []
+        # Незалежні формули йдуть за стовпцями: протягнутий вниз блок потрапляє в порядок суцільно.
+        ready = deque(sorted((key for key, count in waiting.items() if count == 0), key=lambda k: (k[0], k[2], k[1])))
+        while ready:
+            key = ready.popleft()
+            order.append(key)
+            for dependent in unlocks.get(key, ()):
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    ready.append(dependent)
+        rest = pending.difference(order) if len(order) < len(pending) else set()
+        return order, rest
+
+    def evaluation_order(self, formulas) -> list[CellKey]:
+        """Топологічний порядок формул; клітинки циклів - у кінці (калькулятор поверне #CIRCULAR!)."""
+        order, rest = self._topological(formulas)
+        order.extend(rest)
+        return order
+
+    def evaluation_plan(self, formulas) -> list[tuple[list[CellKey], bool]]:
+        """Кроки обчислення (формули, цикл?) для ітеративного режиму.
+
+        Ациклічні формули - у топологічному порядку, цикли - компонентами сильної зв'язності,
+        кожна після компонент, від яких вона залежить.
+        """
+        order, rest = self._topological(formulas)
+        plan = [(order, False)] if order else []
+        for component, cyclic in self._components(rest):
+            if not cyclic and plan and not plan[-1][1]:
+                plan[-1][0].extend(component)
+            else:
+                plan.append((component, cyclic))
+        return plan
+
+    def _components(self, keys: set[CellKey]) -> list[tuple[list[CellKey], bool]]:
+        """Алгоритм Тар'яна без рекурсії; компоненти - від тих, що не залежать від інших."""
+        if not keys:
+            return []
+        rows = self._rows_by_column(keys)
+        edges = {key: sorted(self._precedents_within(key, keys, rows)) for key in keys}
+        index: dict[CellKey, int] = {}
+        low: dict[CellKey, int] = {}
+        stack: list[CellKey] = []
+        on_stack: set[CellKey] = set()
+        result = []
+        for root in sorted(keys):
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(edges[root]))]
+            while work:
+                node, precedents = work[-1]
+                for precedent in precedents:
+                    if precedent not in index:
+                        index[precedent] = low[precedent] = len(index)
+                        stack.append(precedent)
+                        on_stack.add(precedent)
+                        work.append((precedent, iter(edges[precedent])))
+                        break
+                    if precedent in on_stack:
+                        low[node] = min(low[node], index[precedent])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            key = stack.pop()
+                            on_stack.discard(key)
+                            component.append(key)
+                            if key == node:
+                                break
+                        component.reverse()
+                        result.append((component, len(component) > 1 or node in edges[node]))
+        return result
@@ -0,0 +1,102 @@
+import os
+import pickle
+import hashlib
+import tempfile
+
+from utils.config import DRIVE_CACHE_DIR, DRIVE_CACHE_MAX_BYTES
+
+_SNAPSHOT_FORMAT = 1
+
+
+class DriveCache:
+    """Локальний кеш файлів Google Drive з адресацією за вмістом і LRU-витісненням."""
+
+    def __init__(self, cache_dir: str = DRIVE_CACHE_DIR, max_bytes: int = DRIVE_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key_for(file_meta: dict) -> str | None:
+        version = file_meta.get('md5Checksum') or file_meta.get('modifiedTime')
+        if not file_meta.get('id') or not version:
+            return None
+        return hashlib.sha256(f"{file_meta['id']}:{version}".encode()).hexdigest()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def _touch(self, path: str) -> str | None:
+        try:
+            os.utime(path)
+            return path
+        except OSError:
+            return None
+
+    def get_file(self, key: str) -> str | None:
+        return self._touch(self._path(key, ".xlsx"))
+
+    def new_download_file(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix=".part", delete=False)
+
+    def store_file(self, key: str, download_path: str) -> str:
+        path = self._path(key, ".xlsx")
+        os.replace(download_path, path)
+        self._evict(keep=key)
+        return path
+
+    def get_sheets(self, key: str) -> list | None:
+        path = self._touch(self._path(key, ".sheets"))
+        if not path:
+            return None
+        try:
+            with open(path, "rb") as f:
+                version, sheets = pickle.load(f)
+        except Exception:
+            return None
+        return sheets if version == _SNAPSHOT_FORMAT else None
+
+    def store_sheets(self, key: str, sheets: list) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key, ".sheets")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((_SNAPSHOT_FORMAT, sheets), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._evict(keep=key)
+
+    def _evict(self, keep: str | None = None) -> None:
+        entries: dict[str, list] = {}
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith((".part", ".tmp")):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            key = name.split(".", 1)[0]
+            if key == keep:
+                continue
+            entry = entries.setdefault(key, [0.0, 0, []])
+            entry[0] = max(entry[0], stat.st_mtime)
+            entry[1] += stat.st_size
+            entry[2].append(path)
+
+        total = sum(entry[1] for entry in entries.values())
+        if keep:
+            total += sum(os.path.getsize(p) for p in (self._path(keep, ".xlsx"), self._path(keep, ".sheets"))
+                         if os.path.exists(p))
+        for _, size, paths in sorted(entries.values(), key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
@@ -0,0 +1,76 @@
+import os
+import json
+import threading
+from typing import Callable
+
+from utils.config import DRIVE_LISTING_CACHE_FILE
+
+
+class DriveListingCache:
+    """Кеш метаданих таблиць Google Drive з токеном стрічки змін для інкрементального оновлення."""
+
+    def __init__(self, path: str = DRIVE_LISTING_CACHE_FILE):
+        self.path = path
+        self.files: dict[str, dict] = {}
+        self.start_page_token: str | None = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.files = {f['id']: f for f in data.get("files", [])}
+        self.start_page_token = data.get("start_page_token")
+
+    def save(self) -> None:
+        with self._lock:
+            data = {"files": list(self.files.values()), "start_page_token": self.start_page_token}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.files = {}
+            self.start_page_token = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            files = list(self.files.values())
+        return sorted(files, key=lambda f: f.get('modifiedTime', ''), reverse=True)
+
+    def upsert(self, files: list[dict]) -> None:
+        with self._lock:
+            for f in files:
+                self.files[f['id']] = f
+
+    def retain(self, file_ids: set[str]) -> list[str]:
+        with self._lock:
+            removed = [file_id for file_id in self.files if file_id not in file_ids]
+            for file_id in removed:
+                del self.files[file_id]
+        return removed
+
+    def apply_changes(self, changes: list[dict], is_spreadsheet: Callable[[dict], bool]) -> tuple[list[dict], list[str]]:
+        updated, removed = [], []
+        with self._lock:
+            for change in changes:
+                file_id = change.get('fileId')
+                file_meta = change.get('file')
+                if change.get('removed') or not file_meta or not is_spreadsheet(file_meta):
+                    if self.files.pop(file_id, None) is not None:
+                        removed.append(file_id)
+                    continue
+                file_meta = {k: v for k, v in file_meta.items() if k != 'trashed'}
+                self.files[file_id] = file_meta
+                updated.append(file_meta)
+        return updated, removed
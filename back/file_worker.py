@@ -1,17 +1,99 @@
-import openpyxl
 import io
-from openpyxl.workbook import Workbook
+import os
+import re
+import csv
+import codecs
+import json
+import hashlib
+from typing import Callable, Iterable, TYPE_CHECKING
 from PySide6.QtWidgets import QFileDialog, QMessageBox
 
-from utils.config import DEFAULT_SHEET_NAME
+from back.sheet_loader import SheetData, load_sheets
+from back.sparse_grid import SparseGrid
+from back.string_table import StringTable
+from back.xlsx_writer import UnsupportedValue, strip_values, write_with_shared_strings
+
+from utils.config import DEFAULT_SHEET_NAME, CSV_CHUNK_ROWS, CSV_SNIFF_BYTES, CSV_ENCODING
+from utils.tracing import span
+
+if TYPE_CHECKING:
+    from openpyxl.workbook import Workbook
+
+
+def _new_workbook() -> "Workbook":
+    # openpyxl імпортується лише при першому використанні, щоб не сповільнювати запуск.
+    from openpyxl.workbook import Workbook
+    return Workbook()
+
+def _snapshot_cells(data) -> Iterable[tuple[int, int, object]]:
+    """Непорожні клітинки (рядок, стовпець, значення) знімка аркуша по рядках. Знімок - розріджений
+    {(рядок, стовпець): значення} (SheetWorker.snapshot_table) або щільні рядки [[значення, ...], ...]."""
+    if isinstance(data, dict):
+        for (r, c), value in sorted(data.items()):
+            if value:
+                yield r, c, value
+        return
+    for r, row in enumerate(data):
+        for c, value in enumerate(row):
+            if value:
+                yield r, c, value
+
+
+def _snapshot_size(data) -> int:
+    return len(data) if isinstance(data, dict) else sum(map(len, data))
+
+
+_INT_RE = re.compile(r"[+-]?\d+\Z")
+_FLOAT_RE = re.compile(r"[+-]?(\d+\.\d*|\.\d+|\d+)([eE][+-]?\d+)?\Z")
+_INVALID_TITLE_CHARS = re.compile(r"[\\/*?:\[\]]")
+
+
+def _convert_chunk(rows: list[list[str]], strings: StringTable | None = None) -> None:
+    """Перетворює числові рядки в числа для цілого блоку рядків за один прохід;
+    решта тексту інтернується в strings (повторювані підписи - один об'єкт)."""
+    int_match = _INT_RE.match
+    float_match = _FLOAT_RE.match
+    intern = strings.intern if strings is not None else None
+    for row in rows:
+        for i, value in enumerate(row):
+            if not value:
+                row[i] = None
+            elif int_match(value):
+                row[i] = int(value)
+            elif float_match(value):
+                row[i] = float(value)
+            elif intern is not None:
+                row[i] = intern(value)
+
+
+def _iter_decoded_lines(binary_file, encoding: str, on_bytes: Callable[[int], None]):
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for raw in binary_file:
+        on_bytes(len(raw))
+        yield decoder.decode(raw)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _add_defined_names(workbook: "Workbook", names: dict[str, str] | None) -> None:
+    from openpyxl.workbook.defined_name import DefinedName
+    for name, formula in (names or {}).items():
+        workbook.defined_names[name] = DefinedName(name, attr_text=formula)
+
+
+def _sheet_title_from_path(path: str) -> str:
+    title = _INVALID_TITLE_CHARS.sub("_", os.path.splitext(os.path.basename(path))[0])
+    return title[:31] or DEFAULT_SHEET_NAME
+
 
 class FileWorker:
     def __init__(self, parent_window):
         self.parent = parent_window
 
-    def create_new_workbook(self) -> Workbook | None:
+    def create_new_workbook(self) -> "Workbook | None":
         try:
-            workbook = Workbook()
+            workbook = _new_workbook()
             if len(workbook.sheetnames) > 0 and workbook.sheetnames[0] == 'Sheet':
                  if len(workbook.sheetnames) == 1:
                       workbook.active.title = DEFAULT_SHEET_NAME
@@ -26,54 +108,281 @@ class FileWorker:
             QMessageBox.critical(self.parent, "Помилка", f"Не вдалося створити нову книгу: {e}")
             return None
 
-    def open_local_workbook(self) -> tuple[Workbook | None, str | None]:
+    def ask_open_path(self) -> str | None:
         options = QFileDialog.Options()
         filePath, _ = QFileDialog.getOpenFileName(
             self.parent, "Відкрити Excel файл", "",
             "Excel Files (*.xlsx);;All Files (*)", options=options
         )
-        if filePath:
-            try:
-                workbook = openpyxl.load_workbook(filePath, data_only=False)
-                return workbook, filePath
-            except Exception as e:
-                QMessageBox.critical(self.parent, "Помилка", f"Не вдалося відкрити файл: {e}")
-        return None, None
-
-    def save_local_workbook(self, workbook: Workbook, current_path: str | None) -> tuple[bool, str | None]:
-        savePath = current_path
-        if savePath is None:
-            options = QFileDialog.Options()
-            savePath, _ = QFileDialog.getSaveFileName(
-                self.parent, "Зберегти новий файл", "Untitled.xlsx", 
-                "Excel Files (*.xlsx);;All Files (*)", options=options
-            )
-        
-        if savePath:
+        return filePath or None
+
+    def ask_save_path(self, current_path: str | None) -> str | None:
+        if current_path is not None:
+            return current_path
+        options = QFileDialog.Options()
+        savePath, _ = QFileDialog.getSaveFileName(
+            self.parent, "Зберегти новий файл", "Untitled.xlsx", 
+            "Excel Files (*.xlsx);;All Files (*)", options=options
+        )
+        return savePath or None
+
+    def load_workbook(self, source: str | io.BytesIO,
+                      progress_callback: Callable[[int, int], None] | None = None) -> "Workbook":
+        """Завантажує книгу з файлу або буфера. Безпечно викликати з фонового потоку."""
+        if progress_callback:
+            progress_callback(0, 0)
+        import openpyxl
+        with span("file.load", "io", path=source if isinstance(source, str) else None) as trace:
+            workbook = openpyxl.load_workbook(source, data_only=False)
+            trace.set(sheets=len(workbook.sheetnames))
+        if progress_callback:
+            progress_callback(1, 1)
+        return workbook
+
+    def load_workbook_parallel(self, path: str,
+                               progress_callback: Callable[[int, int], None] | None = None) -> "tuple[Workbook, list[SheetData]]":
+        """Розбирає аркуші у пулі процесів; повертає книгу-каркас з форматуванням файлу (load_template)
+        і дані аркушів."""
+        with span("file.load", "io", path=path, bytes=os.path.getsize(path)) as trace:
+            sheets = load_sheets(path, progress_callback=progress_callback)
+            workbook = self.load_template(path)
+            trace.set(sheets=len(sheets), cells=sum(len(data.cells) for data in sheets),
+                      names=len(workbook.defined_names))
+        return workbook, sheets
+
+    def load_template(self, path: str) -> "Workbook":
+        """Книга з файлу path без значень клітинок: стилі, формати чисел, ширини й висоти, об'єднані клітинки,
+        закріплення, властивості аркушів та імена книги. Дані аркушів читає load_sheets; ця книга -
+        current_workbook, у неї при збереженні записуються дані (workbook_template)."""
+        import openpyxl
+        stripped = io.BytesIO()
+        strip_values(path, stripped)
+        stripped.seek(0)
+        return openpyxl.load_workbook(stripped)
+
+    def workbook_from_sheets(self, sheets: list[SheetData], names: dict[str, str] | None = None) -> "Workbook":
+        """Книга-каркас з аркушами без даних та іменами книги (дані - у SheetData)."""
+        workbook = _new_workbook()
+        workbook.remove(workbook.active)
+        for data in sheets:
+            workbook.create_sheet(title=data.name)
+        if not workbook.sheetnames:
+            workbook.create_sheet(title=DEFAULT_SHEET_NAME)
+        _add_defined_names(workbook, names)
+        return workbook
+
+    def workbook_template(self, workbook: "Workbook", sheet_names: list[str],
+                          names: dict[str, str] | None = None) -> io.BytesIO:
+        """Каркас для write_snapshot: відкрита книга з її форматуванням (стилі, формати чисел, ширини
+        стовпців, об'єднані клітинки, закріплення, властивості аркушів), аркушами sheet_names у цьому
+        порядку та іменами книги names. Значення клітинок каркаса не використовуються.
+
+        Викликається в GUI-потоці: книга змінюється лише там, тож серіалізується вона тут, а не у фоні.
+        """
+        for name in sheet_names:
+            if name not in workbook.sheetnames:
+                workbook.create_sheet(title=name)
+        for sheet in [sheet for sheet in workbook.worksheets if sheet.title not in sheet_names]:
+            workbook.remove(sheet)
+        for idx, name in enumerate(sheet_names):
+            workbook.move_sheet(name, idx - workbook.sheetnames.index(name))
+        for name in list(workbook.defined_names):
+            del workbook.defined_names[name]
+        _add_defined_names(workbook, names)
+        template = io.BytesIO()
+        workbook.save(template)
+        template.seek(0)
+        return template
+
+    def build_workbook_from_snapshot(self, snapshot: list[tuple[str, dict | list[list]]],
+                                     progress_callback: Callable[[int, int], None] | None = None,
+                                     names: dict[str, str] | None = None,
+                                     workbook: "Workbook | None" = None) -> "Workbook":
+        """Книга з даними знімка. workbook - книга-каркас (workbook_template), у яку записуються
+        дані зі збереженням форматування; її старі значення стираються."""
+        from openpyxl.cell.cell import MergedCell
+        if workbook is None:
+            workbook = _new_workbook()
+            workbook.remove(workbook.active)
+            _add_defined_names(workbook, names)
+        total_cells = sum(_snapshot_size(data) for _, data in snapshot) or 1
+        done_cells = 0
+        for sheet_name, data in snapshot:
+            if sheet_name in workbook.sheetnames:
+                sheet = workbook[sheet_name]
+                for row in sheet.iter_rows():
+                    for cell in row:
+                        if cell.value is not None:
+                            cell.value = None
+            else:
+                sheet = workbook.create_sheet(title=sheet_name)
+            for r, c, value in _snapshot_cells(data):
+                cell = sheet.cell(row=r + 1, column=c + 1)
+                if isinstance(cell, MergedCell):
+                    # Значення, введене в приховану частину об'єднаної клітинки, важливіше за об'єднання.
+                    for merged in [rng for rng in sheet.merged_cells.ranges if cell.coordinate in rng]:
+                        sheet.unmerge_cells(merged.coord)
+                    cell = sheet.cell(row=r + 1, column=c + 1)
+                cell.value = value
+                done_cells += 1
+                if progress_callback and done_cells % 1000 == 0:
+                    progress_callback(done_cells, total_cells)
+        if not workbook.sheetnames:
+            workbook.create_sheet(title=DEFAULT_SHEET_NAME)
+        return workbook
+
+    @staticmethod
+    def snapshot_hash(snapshot: list[tuple[str, dict | list[list]]], names: dict[str, str] | None = None) -> str:
+        """Хеш вмісту знімка; не залежить від часових міток, які openpyxl пише в xlsx,
+        і від того, щільний знімок чи розріджений."""
+        digest = hashlib.sha256()
+        for sheet_name, data in snapshot:
+            digest.update(json.dumps([sheet_name, list(_snapshot_cells(data))], default=str,
+                                     ensure_ascii=False).encode())
+        if names:
+            digest.update(json.dumps(sorted(names.items()), ensure_ascii=False).encode())
+        return digest.hexdigest()
+
+    def write_snapshot(self, snapshot: list[tuple[str, dict | list[list]]], target: str | io.BytesIO,
+                       progress_callback: Callable[[int, int], None] | None = None,
+                       names: dict[str, str] | None = None, template: io.BytesIO | None = None) -> None:
+        """Серіалізує знімок аркушів і імена книги у xlsx. Безпечно викликати з фонового потоку.
+
+        template - каркас відкритої книги (workbook_template, вже з іменами книги): її форматування
+        зберігається, а дані беруться зі знімка; без нього - нова книга з іменами names. Дані аркушів записуються зі спільною таблицею рядків
+        (back.xlsx_writer); якщо в знімку є значення, яких той запис не підтримує, - через openpyxl.
+        """
+        total_cells = sum(_snapshot_size(data) for _, data in snapshot)
+        with span("file.save", "io", cells=total_cells) as trace:
+            if template is None:
+                template = io.BytesIO()
+                self.build_workbook_from_snapshot([(name, {}) for name, _ in snapshot], names=names).save(template)
+            done_cells = 0
+
+            def on_cell() -> None:
+                nonlocal done_cells
+                done_cells += 1
+                if progress_callback and done_cells % 1000 == 0:
+                    progress_callback(done_cells, total_cells)
+
+            def write(file) -> None:
+                try:
+                    write_with_shared_strings(template, file, [_snapshot_cells(data) for _, data in snapshot],
+                                              on_cell)
+                except UnsupportedValue:
+                    trace.set(shared_strings=False)
+                    template.seek(0)
+                    workbook = self.load_workbook(template)
+                    self.build_workbook_from_snapshot(snapshot, progress_callback, workbook=workbook).save(file)
+
+            if not isinstance(target, str):
+                write(target)
+                trace.set(bytes=target.tell())
+                target.seek(0)
+                return
+            tmp_path = target + ".tmp"
             try:
-                workbook.save(savePath)
-                QMessageBox.information(self.parent, "Успіх", f"Файл успішно збережено у:\n{savePath}")
-                return True, savePath
-            except Exception as e:
-                QMessageBox.critical(self.parent, "Помилка", f"Не вдалося зберегти файл: {e}")
-        return False, current_path
-
-    def save_workbook_to_buffer(self, workbook: Workbook) -> io.BytesIO | None:
-        """Зберігає книгу в BytesIO для передачі, наприклад, на Google Drive."""
+                write(tmp_path)
+                os.replace(tmp_path, target)
+                trace.set(path=target, bytes=os.path.getsize(target))
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def ask_import_path(self) -> str | None:
+        options = QFileDialog.Options()
+        filePath, _ = QFileDialog.getOpenFileName(
+            self.parent, "Імпорт CSV/TSV", "",
+            "Delimited Text (*.csv *.tsv *.txt);;All Files (*)", options=options
+        )
+        return filePath or None
+
+    def ask_export_path(self, suggested_name: str) -> str | None:
+        options = QFileDialog.Options()
+        savePath, _ = QFileDialog.getSaveFileName(
+            self.parent, "Експорт CSV/TSV", suggested_name,
+            "CSV (*.csv);;TSV (*.tsv);;All Files (*)", options=options
+        )
+        return savePath or None
+
+    @staticmethod
+    def detect_delimiter(path: str, sample: str = "") -> str:
+        if path.lower().endswith(".tsv"):
+            return "\t"
         try:
-            buffer = io.BytesIO()
-            workbook.save(buffer)
-            buffer.seek(0)
-            return buffer
-        except Exception as e:
-            QMessageBox.critical(self.parent, "Помилка", f"Не вдалося зберегти книгу в буфер: {e}")
-            return None
+            return csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+        except csv.Error:
+            return ","
+
+    def load_delimited(self, path: str, delimiter: str | None = None,
+                       progress_callback: Callable[[int, int], None] | None = None,
+                       chunk_rows: int = CSV_CHUNK_ROWS) -> SheetData:
+        """Потоково імпортує CSV/TSV блоками по chunk_rows рядків у розріджений аркуш (SheetData):
+        у пам'яті лишаються тільки непорожні клітинки, без проміжної книги openpyxl."""
+        total = os.path.getsize(path)
+        cells = SparseGrid()
+        max_row = max_col = 0
+        with open(path, "rb") as binary_file:
+            if delimiter is None:
+                sample = binary_file.read(CSV_SNIFF_BYTES).decode(CSV_ENCODING, errors="ignore")
+                binary_file.seek(0)
+                delimiter = self.detect_delimiter(path, sample)
+
+            read_bytes = 0
+            def on_bytes(count: int) -> None:
+                nonlocal read_bytes
+                read_bytes += count
+
+            reader = csv.reader(_iter_decoded_lines(binary_file, CSV_ENCODING, on_bytes), delimiter=delimiter)
+            strings = StringTable()
+
+            def flush(chunk: list[list]) -> None:
+                nonlocal max_row, max_col
+                _convert_chunk(chunk, strings)
+                for r, row in enumerate(chunk, start=max_row):
+                    for c, value in enumerate(row):
+                        if value is not None:
+                            cells[(r, c)] = value
+                    if len(row) > max_col:
+                        max_col = len(row)
+                max_row += len(chunk)
+
+            chunk = []
+            for row in reader:
+                chunk.append(row)
+                if len(chunk) >= chunk_rows:
+                    flush(chunk)
+                    chunk = []
+                    if progress_callback:
+                        progress_callback(read_bytes, total)
+            if chunk:
+                flush(chunk)
+        if progress_callback:
+            progress_callback(total, total)
+        return SheetData(_sheet_title_from_path(path), max_row, max_col, cells, {})
 
-    def load_workbook_from_buffer(self, buffer: io.BytesIO) -> Workbook | None:
-         """Завантажує книгу з BytesIO."""
-         try:
-              workbook = openpyxl.load_workbook(buffer, data_only=False)
-              return workbook
-         except Exception as e:
-              QMessageBox.critical(self.parent, "Помилка", f"Не вдалося завантажити книгу з буфера: {e}")
-              return None
\ No newline at end of file
+    def save_delimited(self, rows: Iterable[Iterable], path: str, delimiter: str | None = None,
+                       total_rows: int | None = None,
+                       progress_callback: Callable[[int, int], None] | None = None,
+                       chunk_rows: int = CSV_CHUNK_ROWS) -> int:
+        """Потоково записує рядки у CSV/TSV, не збираючи весь файл у пам'яті."""
+        if delimiter is None:
+            delimiter = "\t" if path.lower().endswith(".tsv") else ","
+        written = 0
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, delimiter=delimiter)
+            chunk = []
+            for row in rows:
+                chunk.append(["" if v is None else v for v in row])
+                if len(chunk) >= chunk_rows:
+                    writer.writerows(chunk)
+                    written += len(chunk)
+                    chunk = []
+                    if progress_callback:
+                        progress_callback(written, total_rows or written)
+            if chunk:
+                writer.writerows(chunk)
+                written += len(chunk)
+        if progress_callback:
+            progress_callback(written, total_rows or written)
+        return written
@@ -0,0 +1,134 @@
+from back.parser import ReferenceError
+
+# Реєстр функцій формул. Функція отримує список значень аргументів: число, текст, булеве значення
+# або список значень для діапазону. Нові функції реєструються без змін у калькуляторі:
+#
+#     from back.functions import register_function
+#
+#     @register_function("DOUBLE", min_args=1, max_args=1)
+#     def double(args):
+#         return args[0] * 2
+#
+# errors визначає, що робити з клітинками-помилками всередині діапазонів: "skip" - пропустити
+# (#REF! однаково повертається), "propagate" - повернути першу помилку як результат функції.
+# Помилки скалярних аргументів завжди стають результатом.
+#
+# vector - необов'язкова реалізація для блоку протягнутих формул: отримує стовпці аргументів
+# (columns[i][k] - значення i-го аргументу в k-му рядку блоку) і повертає список результатів.
+
+ERROR_MODES = ("skip", "propagate")
+
+
+class FunctionSpec:
+    __slots__ = ("name", "impl", "min_args", "max_args", "errors", "vector")
+
+    def __init__(self, name: str, impl, min_args: int = 0, max_args: int | None = None,
+                 errors: str = "skip", vector=None):
+        self.name = name
+        self.impl = impl
+        self.min_args = min_args
+        self.max_args = max_args
+        self.errors = errors
+        self.vector = vector
+
+    def accepts(self, count: int) -> bool:
+        return count >= self.min_args and (self.max_args is None or count <= self.max_args)
+
+    def call(self, args: list):
+        """Викликає реалізацію; збої, крім кодів помилок формул, дають #ERROR!."""
+        try:
+            return self.impl(args)
+        except ReferenceError:
+            raise
+        except Exception:
+            raise ReferenceError("#ERROR!")
+
+
+class FunctionRegistry:
+    """Функції за назвою у верхньому регістрі; пошук - один доступ до словника."""
+
+    def __init__(self):
+        self._specs: dict[str, FunctionSpec] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name.upper() in self._specs
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def register(self, name: str, impl=None, *, min_args: int = 0, max_args: int | None = None,
+                 errors: str = "skip", vector=None):
+        """Реєструє або замінює функцію; без impl повертає декоратор."""
+        if errors not in ERROR_MODES:
+            raise ValueError(f"Невідомий режим помилок: {errors}")
+        if impl is None:
+            def decorator(func):
+                self.register(name, func, min_args=min_args, max_args=max_args, errors=errors, vector=vector)
+                return func
+            return decorator
+        self._specs[name.upper()] = FunctionSpec(name.upper(), impl, min_args, max_args, errors, vector)
+        return impl
+
+    def unregister(self, name: str) -> None:
+        self._specs.pop(name.upper(), None)
+
+    def get(self, name: str) -> FunctionSpec | None:
+        return self._specs.get(name.upper())
+
+    def names(self) -> list[str]:
+        return sorted(self._specs)
+
+
+def numbers(args: list) -> list:
+    """Числа з аргументів, діапазони розгортаються; текст і порожні значення пропускаються."""
+    result = []
+    for arg in args:
+        if isinstance(arg, list):
+            result.extend(v for v in arg if isinstance(v, (int, float)))
+        elif isinstance(arg, (int, float)):
+            result.append(arg)
+    return result
+
+
+def _sum(args: list):
+    return sum(numbers(args))
+
+
+def _average(args: list):
+    nums = numbers(args)
+    return sum(nums) / len(nums) if nums else 0
+
+
+def _max(args: list):
+    nums = numbers(args)
+    return max(nums) if nums else 0
+
+
+def _min(args: list):
+    nums = numbers(args)
+    return min(nums) if nums else 0
+
+
+def _sum_vector(columns: list[list]) -> list:
+    # Підсумки накопичуються по стовпцях аргументів без проміжних списків чисел для кожного рядка.
+    totals = [0] * len(columns[0])
+    for column in columns:
+        for k, arg in enumerate(column):
+            total = totals[k]
+            if isinstance(arg, list):
+                for v in arg:
+                    if isinstance(v, (int, float)):
+                        total += v
+            elif isinstance(arg, (int, float)):
+                total += arg
+            totals[k] = total
+    return totals
+
+
+FUNCTIONS = FunctionRegistry()
+register_function = FUNCTIONS.register
+
+register_function("SUM", _sum, min_args=1, max_args=255, vector=_sum_vector)
+register_function("AVERAGE", _average, min_args=1, max_args=255)
+register_function("MAX", _max, min_args=1, max_args=255)
+register_function("MIN", _min, min_args=1, max_args=255)
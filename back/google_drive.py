@@ -1,19 +1,43 @@
 import os
 import io
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
+import time
+from typing import Callable, TYPE_CHECKING
 from PySide6.QtWidgets import QMessageBox, QInputDialog
 
-from utils.config import SCOPES, TOKEN_FILE, CREDENTIALS_FILE
+from back.task_runner import TaskCancelled
+from utils.config import (SCOPES, TOKEN_FILE, CREDENTIALS_FILE, DRIVE_API_ENDPOINT, DRIVE_CHUNK_SIZE,
+                          DRIVE_RESUME_ATTEMPTS, DRIVE_RESUME_BACKOFF, DRIVE_PAGE_SIZE)
+from utils.tracing import span
+
+XLSX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+GOOGLE_SHEET_MIME_TYPE = 'application/vnd.google-apps.spreadsheet'
+FILE_FIELDS = "id, name, mimeType, md5Checksum, modifiedTime, headRevisionId"
+CONTENT_HASH_PROPERTY = "kotunContentHash"
+_RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Бібліотеки Google імпортуються лише при першому зверненні до Drive: це суттєво пришвидшує запуск.
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
 
 class GoogleDriveManager:
-    def __init__(self, parent_window):
+    def __init__(self, parent_window, api_endpoint: str | None = DRIVE_API_ENDPOINT):
         self.service = None
         self.parent = parent_window
+        self.api_endpoint = api_endpoint
+        self.chunk_size = DRIVE_CHUNK_SIZE
+        self.resume_attempts = DRIVE_RESUME_ATTEMPTS
+        self.resume_backoff = DRIVE_RESUME_BACKOFF
+
+    def build_service(self, credentials: "Credentials | None" = None, http=None):
+        from googleapiclient.discovery import build
+        kwargs = {"static_discovery": True}
+        if credentials is not None:
+            kwargs["credentials"] = credentials
+        if http is not None:
+            kwargs["http"] = http
+        if self.api_endpoint:
+            kwargs["client_options"] = {"api_endpoint": self.api_endpoint}
+        return build('drive', 'v3', **kwargs)
 
     def authenticate(self) -> bool:
         if self.service:
@@ -22,7 +46,7 @@ class GoogleDriveManager:
             
         try:
             creds = self._get_credentials()
-            self.service = build('drive', 'v3', credentials=creds)
+            self.service = self.build_service(credentials=creds)
             QMessageBox.information(self.parent, "Успіх", "Авторизація Google пройшла успішно.")
             return True
         except FileNotFoundError as e:
@@ -43,7 +67,30 @@ class GoogleDriveManager:
             print(f"Не вдалося видалити {TOKEN_FILE}: {e}")
             QMessageBox.warning(self.parent, "Вихід", f"Не вдалося видалити файл сесії: {e}")
 
-    def _get_credentials(self) -> Credentials:
+    def restore_session(self) -> bool:
+        """Відновлює сесію зі збереженого токена без інтерактивного входу. Безпечно для фонового потоку."""
+        if not os.path.exists(TOKEN_FILE):
+            return False
+        try:
+            from google.auth.transport.requests import Request
+            from google.oauth2.credentials import Credentials
+            creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+            if not creds.valid:
+                if not (creds.expired and creds.refresh_token):
+                    return False
+                creds.refresh(Request())
+                with open(TOKEN_FILE, 'w') as token:
+                    token.write(creds.to_json())
+            self.service = self.build_service(credentials=creds)
+            return True
+        except Exception:
+            self.service = None
+            return False
+
+    def _get_credentials(self) -> "Credentials":
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
         creds = None
         if os.path.exists(TOKEN_FILE):
             creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
@@ -60,63 +107,211 @@ class GoogleDriveManager:
                 token.write(creds.to_json())
         return creds
 
-    def list_spreadsheets(self) -> tuple:
+    @staticmethod
+    def _spreadsheet_query(name_filter: str | None = None) -> str:
+        query = (f"(mimeType='{XLSX_MIME_TYPE}' or mimeType='{GOOGLE_SHEET_MIME_TYPE}') and trashed = false")
+        if name_filter:
+            escaped = name_filter.replace("\\", "\\\\").replace("'", "\\'")
+            query += f" and name contains '{escaped}'"
+        return query
+
+    @staticmethod
+    def is_spreadsheet(file_meta: dict) -> bool:
+        return file_meta.get('mimeType') in (XLSX_MIME_TYPE, GOOGLE_SHEET_MIME_TYPE) and not file_meta.get('trashed')
+
+    def iter_spreadsheet_pages(self, name_filter: str | None = None, page_size: int = DRIVE_PAGE_SIZE):
+        """Генератор сторінок списку таблиць; проходить усі сторінки через nextPageToken."""
+        page_token = None
+        while True:
+            results = self.service.files().list(
+                q=self._spreadsheet_query(name_filter), pageSize=page_size, pageToken=page_token,
+                orderBy="modifiedTime desc", fields=f"nextPageToken, files({FILE_FIELDS})").execute()
+            yield results.get('files', [])
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return
+
+    def get_changes_start_token(self) -> str:
+        return self.service.changes().getStartPageToken().execute()['startPageToken']
+
+    def iter_changes(self, page_token: str):
+        """Генератор (зміни, новий стартовий токен) зі стрічки змін Drive."""
+        while page_token:
+            results = self.service.changes().list(
+                pageToken=page_token, pageSize=DRIVE_PAGE_SIZE, spaces='drive',
+                fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}, trashed))"
+            ).execute()
+            yield results.get('changes', []), results.get('newStartPageToken')
+            page_token = results.get('nextPageToken')
+
+    def list_spreadsheets(self, name_filter: str | None = None) -> tuple:
+        from googleapiclient.errors import HttpError
         if not self.service:
             return None, "Спочатку потрібно авторизуватися."
         
         try:
-            query = ("(mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' "
-                     "or mimeType='application/vnd.google-apps.spreadsheet')")
-            results = self.service.files().list(
-                q=query, pageSize=30, fields="files(id, name, mimeType)").execute()
-            files = results.get('files', [])
+            files = []
+            for page in self.iter_spreadsheet_pages(name_filter):
+                files.extend(page)
             return files, None
         except HttpError as e:
             return None, f"Помилка Google API: {e}"
         except Exception as e:
             return None, f"Невідома помилка: {e}"
 
+    def refresh_listing(self, cache, on_page: Callable[[list[dict], list[str]], None],
+                        name_filter: str | None = None) -> None:
+        """Оновлює кеш списку файлів: інкрементально через стрічку змін або повним переліком.
 
-    def download_file(self, file_id: str, mime_type: str) -> tuple:
+        on_page(оновлені_файли, видалені_id) викликається після кожної сторінки.
+        """
+        with span("drive.listing", "drive", incremental=bool(cache.start_page_token and not name_filter)) as trace:
+            counts = [0, 0]
+
+            def counted_page(updated: list[dict], removed: list[str]) -> None:
+                counts[0] += len(updated)
+                counts[1] += len(removed)
+                on_page(updated, removed)
+
+            self._refresh_listing(cache, counted_page, name_filter)
+            trace.set(updated=counts[0], removed=counts[1])
+
+    def _refresh_listing(self, cache, on_page, name_filter: str | None) -> None:
+        if name_filter:
+            for page in self.iter_spreadsheet_pages(name_filter):
+                cache.upsert(page)
+                on_page(page, [])
+            cache.save()
+            return
+
+        if cache.start_page_token:
+            for changes, new_token in self.iter_changes(cache.start_page_token):
+                updated, removed = cache.apply_changes(changes, self.is_spreadsheet)
+                on_page(updated, removed)
+                if new_token:
+                    cache.start_page_token = new_token
+            cache.save()
+            return
+
+        start_token = self.get_changes_start_token()
+        seen = set()
+        for page in self.iter_spreadsheet_pages():
+            cache.upsert(page)
+            seen.update(f['id'] for f in page)
+            on_page(page, [])
+        removed = cache.retain(seen)
+        if removed:
+            on_page([], removed)
+        cache.start_page_token = start_token
+        cache.save()
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        from httplib2 import HttpLib2Error
+        from googleapiclient.errors import HttpError
+        if isinstance(error, HttpError):
+            return error.resp.status in _RETRYABLE_STATUSES
+        return isinstance(error, (OSError, HttpLib2Error))
+
+    def _next_chunk_with_resume(self, next_chunk: Callable[[], tuple]) -> tuple:
+        """Повторює крок передачі після обриву; googleapiclient продовжує з останнього чанка."""
+        attempt = 0
+        while True:
+            try:
+                return next_chunk()
+            except Exception as e:
+                attempt += 1
+                if attempt > self.resume_attempts or not self._is_transient(e):
+                    raise
+                time.sleep(self.resume_backoff * (2 ** (attempt - 1)))
+
+    def download_file(self, file_id: str, mime_type: str,
+                      progress_callback: Callable[[int, int], None] | None = None,
+                      fh: io.IOBase | None = None, chunk_size: int | None = None) -> tuple:
+        from googleapiclient.errors import HttpError
+        from googleapiclient.http import MediaIoBaseDownload
         if not self.service:
              return None, "Спочатку потрібно авторизуватися."
              
         try:
             request = None
-            if mime_type == 'application/vnd.google-apps.spreadsheet':
+            if mime_type == GOOGLE_SHEET_MIME_TYPE:
                 request = self.service.files().export_media(
                     fileId=file_id,
-                    mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+                    mimeType=XLSX_MIME_TYPE)
             else:
                 request = self.service.files().get_media(fileId=file_id)
             
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
+            if fh is None:
+                fh = io.BytesIO()
+            downloader = MediaIoBaseDownload(fh, request, chunksize=chunk_size or self.chunk_size)
             done = False
-            while done is False:
-                status, done = downloader.next_chunk()
+            with span("drive.download", "drive", file_id=file_id) as trace:
+                while done is False:
+                    status, done = self._next_chunk_with_resume(downloader.next_chunk)
+                    if progress_callback and status:
+                        progress_callback(status.resumable_progress, status.total_size or 0)
+                trace.set(bytes=fh.tell())
             fh.seek(0)
             return fh, None
+        except TaskCancelled:
+            raise
         except HttpError as e:
             return None, f"Помилка Google API при завантаженні: {e}"
         except Exception as e:
             return None, f"Невідома помилка при завантаженні: {e}"
 
-    def upload_file(self, file_name: str, file_data_io: io.BytesIO) -> tuple:
+    def get_file_metadata(self, file_id: str) -> tuple:
+        from googleapiclient.errors import HttpError
+        if not self.service:
+            return None, "Спочатку потрібно авторизуватися."
+        try:
+            meta = self.service.files().get(fileId=file_id, fields=f"{FILE_FIELDS}, appProperties").execute()
+            return meta, None
+        except HttpError as e:
+            return None, f"Помилка Google API: {e}"
+        except Exception as e:
+            return None, f"Невідома помилка: {e}"
+
+    def upload_file(self, file_name: str, file_data_io: io.IOBase,
+                    progress_callback: Callable[[int, int], None] | None = None,
+                    chunk_size: int | None = None, file_id: str | None = None,
+                    app_properties: dict | None = None) -> tuple:
+         """Створює новий файл або, якщо задано file_id, оновлює існуючий. Повертає (метадані, помилка)."""
+         from googleapiclient.errors import HttpError
+         from googleapiclient.http import MediaIoBaseUpload
          if not self.service:
-             return None, None, "Спочатку потрібно авторизуватися."
+             return None, "Спочатку потрібно авторизуватися."
          
          try:
             file_metadata = {'name': file_name}
+            if app_properties:
+                file_metadata['appProperties'] = app_properties
             media = MediaIoBaseUpload(
                 file_data_io,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                mimetype=XLSX_MIME_TYPE,
+                chunksize=chunk_size or self.chunk_size,
                 resumable=True
             )
-            file = self.service.files().create(
-                body=file_metadata, media_body=media, fields='id, webViewLink').execute()
-            return file.get('id'), file.get('webViewLink'), None
+            fields = f"{FILE_FIELDS}, webViewLink"
+            if file_id:
+                request = self.service.files().update(
+                    fileId=file_id, body=file_metadata, media_body=media, fields=fields)
+            else:
+                request = self.service.files().create(
+                    body=file_metadata, media_body=media, fields=fields)
+            file = None
+            with span("drive.upload", "drive", file_id=file_id, bytes=media.size()):
+                while file is None:
+                    status, file = self._next_chunk_with_resume(request.next_chunk)
+                    if progress_callback and status:
+                        progress_callback(status.resumable_progress, status.total_size or 0)
+            if progress_callback:
+                progress_callback(media.size(), media.size())
+            return file, None
+         except TaskCancelled:
+            raise
          except HttpError as e:
-            return None, None, f"Помилка Google API при збереженні: {e}"
+            return None, f"Помилка Google API при збереженні: {e}"
          except Exception as e:
-            return None, None, f"Невідома помилка при збереженні: {e}"
\ No newline at end of file
+            return None, f"Невідома помилка при збереженні: {e}"
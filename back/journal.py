@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import queue
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: відкритий файл журналу не можна перейменувати, тож живий журнал захищає сама ОС.
+    fcntl = None
+
+from utils.config import JOURNAL_DIR, JOURNAL_COMPACT_THRESHOLD, UNTITLED_JOURNAL_PREFIX
+
+
+def journal_path_for(workbook_path: str | None) -> str:
+    """Журнал файлу поруч з ним; у кожного сеансу без файлу - власний журнал у JOURNAL_DIR."""
+    if workbook_path:
+        return workbook_path + ".journal"
+    return os.path.join(JOURNAL_DIR, f"{UNTITLED_JOURNAL_PREFIX}{os.getpid()}-{time.time_ns()}.journal")
+
+
+def _hold(file) -> None:
+    """Блокує відкритий журнал на час сеансу, щоб інший екземпляр програми не взяв його на відновлення."""
+    if fcntl is not None:
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            pass
+
+
+def _in_use(journal_path: str) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        with open(journal_path, "rb") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return True
+    return False
+
+
+def _base_mtime(workbook_path: str | None) -> float | None:
+    if workbook_path and os.path.exists(workbook_path):
+        return os.path.getmtime(workbook_path)
+    return None
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+def compact_entries(entries: list[dict]) -> list[dict]:
+    """Залишає лише останнє значення кожної клітинки між структурними операціями."""
+    result = []
+    segment: dict[tuple, dict] = {}
+    for entry in entries:
+        op = entry.get("op")
+        if op == "set":
+            key = (entry["sheet"], entry["row"], entry["col"])
+            segment.pop(key, None)
+            segment[key] = entry
+            continue
+        result.extend(segment.values())
+        segment = {}
+        result.append(entry)
+    result.extend(segment.values())
+    return result
+
+
+def read_journal(journal_path: str) -> tuple[dict | None, list[dict]]:
+    """Повертає (заголовок, записи). Обрізаний останній рядок після збою ігнорується."""
+    header = None
+    entries = []
+    try:
+        with open(journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if entry.get("op") == "base":
+                    header = entry
+                else:
+                    entries.append(entry)
+    except OSError:
+        return None, []
+    return header, entries
+
+
+def load_recoverable_entries(workbook_path: str) -> list[dict]:
+    """Записи журналу файлу, які можна відтворити поверх його останнього повного збереження."""
+    header, entries = read_journal(journal_path_for(workbook_path))
+    if header is None or not entries:
+        return []
+    base_mtime = _base_mtime(workbook_path)
+    saved_mtime = header.get("mtime")
+    if base_mtime is None or saved_mtime is None or abs(base_mtime - saved_mtime) > 1:
+        return []
+    return entries
+
+
+def claim_untitled_journal(journal_dir: str = JOURNAL_DIR) -> tuple[str, list[dict]] | None:
+    """Найновіший журнал незбереженої нової книги з сеансу, що завершився збоєм: (шлях, записи).
+
+    Журнал перейменовується на шлях цього сеансу, тож інший екземпляр його вже не візьме. Відтворити
+    можна лише журнал порожньої нової книги (blank): основу імпорту CSV чи файлу з Drive не відновити,
+    тому такі журнали видаляються. Викликається при запуску, поки власного журналу ще немає.
+    """
+    try:
+        names = [name for name in os.listdir(journal_dir)
+                 if name.startswith(UNTITLED_JOURNAL_PREFIX) and name.endswith(".journal")]
+    except OSError:
+        return None
+    paths = sorted((os.path.join(journal_dir, name) for name in names), key=_mtime, reverse=True)
+    for path in paths:
+        if _in_use(path):
+            continue
+        header, entries = read_journal(path)
+        if header is None or not header.get("blank") or not entries:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        claimed = os.path.join(journal_dir, os.path.basename(journal_path_for(None)))
+        try:
+            os.replace(path, claimed)
+        except OSError:
+            continue
+        return claimed, entries
+    return None
+
+
+class EditJournal:
+    """Журнал правок лише на дозапис; запис у файл виконує фоновий потік."""
+
+    def __init__(self, workbook_path: str | None, compact_threshold: int = JOURNAL_COMPACT_THRESHOLD,
+                 keep_existing: bool = False, blank: bool = False, path: str | None = None):
+        """blank - основа книги без файлу порожня (нова книга), її журнал можна відтворити при запуску;
+        path - продовжити наявний журнал (claim_untitled_journal)."""
+        self.workbook_path = workbook_path
+        self.path = path or journal_path_for(workbook_path)
+        self.blank = blank and workbook_path is None
+        self.compact_threshold = compact_threshold
+        self._queue: queue.Queue = queue.Queue()
+        self._mark_id = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if keep_existing and os.path.exists(self.path):
+            self._file = open(self.path, "a", encoding="utf-8")
+            _hold(self._file)
+            self._written = len(read_journal(self.path)[1])
+        else:
+            self._file = open(self.path, "w", encoding="utf-8")
+            _hold(self._file)
+            self._write_header()
+            self._written = 0
+        self._thread = threading.Thread(target=self._writer_loop, name="EditJournal", daemon=True)
+        self._thread.start()
+
+    def record(self, op: str, **fields) -> None:
+        fields["op"] = op
+        self._queue.put(fields)
+
+    def mark(self) -> int:
+        """Позначає момент знімка для збереження; повертає ідентифікатор мітки."""
+        self._mark_id += 1
+        self._queue.put({"op": "mark", "id": self._mark_id})
+        return self._mark_id
+
+    def reset(self, mark_id: int | None = None, workbook_path: str | None = None) -> None:
+        """Викликається після повного збереження: записи до мітки вже є у файлі книги."""
+        self._queue.put(("reset", (mark_id, workbook_path)))
+
+    def close(self, discard: bool = False) -> None:
+        self._queue.put(("close", None))
+        self._thread.join()
+        if discard and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _write_header(self) -> None:
+        header = {"op": "base", "path": self.workbook_path, "mtime": _base_mtime(self.workbook_path),
+                  "blank": self.blank}
+        self._file.write(json.dumps(header) + "\n")
+        self._file.flush()
+
+    def _writer_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for entry in batch:
+                if isinstance(entry, tuple):
+                    command = entry[0]
+                    if command == "reset":
+                        self._rewrite_after_mark(*entry[1])
+                    elif command == "close":
+                        self._file.flush()
+                        self._file.close()
+                        return
+                    continue
+                self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self._written += 1
+
+            self._file.flush()
+            try:
+                os.fsync(self._file.fileno())
+            except OSError:
+                pass
+            if self._written >= self.compact_threshold:
+                self._compact()
+
+    def _rewrite_after_mark(self, mark_id: int | None, workbook_path: str | None) -> None:
+        self._file.close()
+        _, entries = read_journal(self.path)
+        kept = []
+        if mark_id is not None:
+            for idx, entry in enumerate(entries):
+                if entry.get("op") == "mark" and entry.get("id") == mark_id:
+                    kept = entries[idx + 1:]
+                    break
+        if workbook_path is not None and workbook_path != self.workbook_path:
+            os.remove(self.path)
+            self.workbook_path = workbook_path
+            self.path = journal_path_for(workbook_path)
+            self.blank = False
+        self._file = open(self.path, "w", encoding="utf-8")
+        _hold(self._file)
+        self._write_header()
+        for entry in kept:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._written = len(kept)
+
+    def _compact(self) -> None:
+        self._file.close()
+        header, entries = read_journal(self.path)
+        compacted = compact_entries(entries)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            if header is not None:
+                f.write(json.dumps(header) + "\n")
+            for entry in compacted:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        _hold(self._file)
+        # Поріг зростає, якщо стиснення мало що дало (напр. багато структурних операцій).
+        self._written = len(compacted)
+        if self._written >= self.compact_threshold:
+            self.compact_threshold = self._written * 2
@@ -0,0 +1,205 @@
+import re
+from bisect import bisect_left, bisect_right, insort
+
+# Індекси діапазонів для VLOOKUP/MATCH/XLOOKUP/COUNTIF/SUMIF. Індекс будується ліниво при першому
+# зверненні, спільний для всіх формул з тим самим діапазоном і оновлюється лише в змінених позиціях.
+# Позиція - зсув клітинки в діапазоні в порядку рядків: (r - r1) * ширина + (c - c1).
+
+_CRITERIA_RE = re.compile(r"(<=|>=|<>|<|>|=)?(.*)", re.S)
+
+
+def lookup_key(value):
+    """Ключ для порівняння: число - float, текст - без урахування регістру; інше не індексується."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return value.casefold()
+    return None
+
+
+def wildcard_pattern(text: str) -> re.Pattern | None:
+    """Шаблон Excel (* ? і ~ для екранування) -> regex; None, якщо шаблону немає."""
+    if "*" not in text and "?" not in text:
+        return None
+    parts = []
+    idx = 0
+    while idx < len(text):
+        ch = text[idx]
+        if ch == "~" and idx + 1 < len(text):
+            parts.append(re.escape(text[idx + 1]))
+            idx += 2
+            continue
+        parts.append(".*" if ch == "*" else "." if ch == "?" else re.escape(ch))
+        idx += 1
+    return re.compile("".join(parts), re.S)
+
+
+def parse_criteria(criteria) -> tuple[str, object, re.Pattern | None]:
+    """Умова COUNTIF/SUMIF (5, ">=10", "<>яблука", "ab*") -> (оператор, ключ, шаблон)."""
+    if not isinstance(criteria, str):
+        return "=", lookup_key(criteria), None
+    op, operand = _CRITERIA_RE.fullmatch(criteria).groups()
+    op = op or "="
+    try:
+        return op, float(operand), None
+    except ValueError:
+        pass
+    pattern = wildcard_pattern(operand.casefold()) if op in ("=", "<>") else None
+    return op, operand.casefold(), pattern
+
+
+class RangeIndex:
+    """Хеш-індекс (ключ -> позиції) і відсортовані списки чисел і тексту одного діапазону."""
+
+    def __init__(self, table, r1: int, c1: int, r2: int, c2: int):
+        self.table = table  # посилання тримає id(table) незмінним, поки індекс у кеші
+        self.r1, self.c1, self.r2, self.c2 = r1, c1, r2, c2
+        self.width = c2 - c1 + 1
+        self.size = (r2 - r1 + 1) * self.width
+        self.keys: list = []
+        self.positions: dict[object, list[int]] = {}
+        self.stale: set[int] = set()
+        self._numbers: list[tuple[float, int]] | None = None
+        self._texts: list[tuple[str, int]] | None = None
+
+    def cell(self, pos: int) -> tuple[int, int]:
+        return self.r1 + pos // self.width, self.c1 + pos % self.width
+
+    def build(self, read) -> None:
+        """read(рядок, стовпець) -> значення клітинки або None для порожньої."""
+        self.keys = []
+        self.positions = {}
+        for pos in range(self.size):
+            key = lookup_key(read(*self.cell(pos)))
+            self.keys.append(key)
+            if key is not None:
+                self.positions.setdefault(key, []).append(pos)
+        self.stale.clear()
+        self._numbers = self._texts = None
+
+    def refresh(self, read) -> None:
+        """Оновлює лише позиції, позначені як змінені."""
+        stale, self.stale = self.stale, set()
+        for pos in stale:
+            old_key = self.keys[pos]
+            new_key = lookup_key(read(*self.cell(pos)))
+            if new_key == old_key and type(new_key) is type(old_key):
+                continue
+            self.keys[pos] = new_key
+            if old_key is not None:
+                old_positions = self.positions[old_key]
+                old_positions.remove(pos)
+                if not old_positions:
+                    del self.positions[old_key]
+                if self._is_sorted(old_key):
+                    self._sorted_for(old_key).remove((old_key, pos))
+            if new_key is not None:
+                insort(self.positions.setdefault(new_key, []), pos)
+                if self._is_sorted(new_key):
+                    insort(self._sorted_for(new_key), (new_key, pos))
+
+    def _is_sorted(self, key) -> bool:
+        return (self._texts if isinstance(key, str) else self._numbers) is not None
+
+    def _sorted_for(self, key) -> list:
+        if isinstance(key, str):
+            if self._texts is None:
+                self._texts = sorted((k, pos) for pos, k in enumerate(self.keys) if isinstance(k, str))
+            return self._texts
+        if self._numbers is None:
+            self._numbers = sorted((k, pos) for pos, k in enumerate(self.keys) if isinstance(k, float))
+        return self._numbers
+
+    def exact(self, key) -> list[int]:
+        return self.positions.get(key, []) if key is not None else []
+
+    def at_most(self, key) -> int | None:
+        """Позиція найбільшого значення <= key (наближений пошук для відсортованих даних)."""
+        entries = self._sorted_for(key)
+        idx = bisect_right(entries, (key, self.size)) - 1
+        return entries[idx][1] if idx >= 0 else None
+
+    def at_least(self, key) -> int | None:
+        """Позиція найменшого значення >= key."""
+        entries = self._sorted_for(key)
+        idx = bisect_left(entries, (key, -1))
+        return entries[idx][1] if idx < len(entries) else None
+
+    def matching(self, op: str, key, pattern: re.Pattern | None = None) -> list[int]:
+        """Позиції, що задовольняють умову COUNTIF/SUMIF."""
+        if op in ("=", "<>"):
+            if pattern is not None:
+                matched = [pos for k, positions in self.positions.items()
+                           if isinstance(k, str) and pattern.fullmatch(k) for pos in positions]
+            elif key == "":
+                matched = [pos for positions in self.positions.values() for pos in positions]
+                op = "<>" if op == "=" else "="
+            else:
+                matched = self.exact(key)
+            if op == "=":
+                return matched
+            excluded = set(matched)
+            return [pos for pos in range(self.size) if pos not in excluded]
+
+        entries, lo, hi = self._compared(op, key)
+        return [pos for _, pos in entries[lo:hi]]
+
+    def _compared(self, op: str, key) -> tuple[list, int, int]:
+        """Відсортований список і межі зрізу значень того ж типу, що задовольняють <, <=, > або >=."""
+        entries = self._sorted_for(key)
+        if op == "<":
+            return entries, 0, bisect_left(entries, (key, -1))
+        if op == "<=":
+            return entries, 0, bisect_right(entries, (key, self.size))
+        if op == ">":
+            return entries, bisect_right(entries, (key, self.size)), len(entries)
+        return entries, bisect_left(entries, (key, -1)), len(entries)
+
+    def count(self, op: str, key, pattern: re.Pattern | None = None) -> int:
+        if op == "=" and pattern is None and key != "":
+            return len(self.exact(key))
+        if op not in ("=", "<>"):
+            _, lo, hi = self._compared(op, key)
+            return hi - lo
+        return len(self.matching(op, key, pattern))
+
+
+class LookupIndexCache:
+    """Спільні індекси діапазонів за (таблиця, r1, c1, r2, c2) з інвалідацією окремих клітинок."""
+
+    def __init__(self):
+        self._indexes: dict[tuple, RangeIndex] = {}
+        self._by_column: dict[tuple[int, int], list[RangeIndex]] = {}
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    def get(self, table, r1: int, c1: int, r2: int, c2: int, read) -> RangeIndex:
+        key = (id(table), r1, c1, r2, c2)
+        index = self._indexes.get(key)
+        if index is None:
+            index = RangeIndex(table, r1, c1, r2, c2)
+            index.build(read)
+            self._indexes[key] = index
+            for c in range(c1, c2 + 1):
+                self._by_column.setdefault((id(table), c), []).append(index)
+        elif index.stale:
+            index.refresh(read)
+        return index
+
+    def invalidate(self, table, row: int, col: int) -> None:
+        for index in self._by_column.get((id(table), col), ()):
+            if index.r1 <= row <= index.r2:
+                index.stale.add((row - index.r1) * index.width + col - index.c1)
+
+    def invalidate_range(self, table, r1: int, c1: int, r2: int, c2: int) -> None:
+        for c in range(c1, c2 + 1):
+            for index in self._by_column.get((id(table), c), ()):
+                for row in range(max(r1, index.r1), min(r2, index.r2) + 1):
+                    index.stale.add((row - index.r1) * index.width + c - index.c1)
+
+    def clear(self) -> None:
+        self._indexes.clear()
+        self._by_column.clear()
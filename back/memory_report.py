@@ -0,0 +1,190 @@
+import os
+import sys
+import threading
+import tracemalloc
+
+from back.calculator import FORMULA_ROLE
+from back.sheet_model import occupied_cells
+
+# Облік пам'яті за аркушами і підсистемами. Модуль не імпортує Qt: таблиці обробляються за тим
+# самим інтерфейсом (rowCount/columnCount/item), що й у калькуляторі.
+
+# Оцінка C++-частини QTableWidgetItem: сам об'єкт, вектор ролей і QVariant на кожну роль.
+QT_ITEM_OVERHEAD = 96
+QT_ROLE_OVERHEAD = 40
+# Скільки клітинок openpyxl вимірювати точно; решта оцінюється пропорційно.
+WORKBOOK_SAMPLE_CELLS = 2000
+
+
+def deep_size(obj, seen: set | None = None) -> int:
+    """Розмір об'єкта разом з вкладеними контейнерами й атрибутами (sys.getsizeof рекурсивно)."""
+    if seen is None:
+        seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, type):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif not isinstance(current, (str, bytes, int, float, bool)) and current is not None:
+            if hasattr(current, "__dict__"):
+                stack.append(vars(current))
+            for name in getattr(type(current), "__slots__", ()):
+                if hasattr(current, name):
+                    stack.append(getattr(current, name))
+    return total
+
+
+def table_memory(table) -> dict:
+    """Клітинки, рядки, формули й оцінка пам'яті сітки таблиці (QTableWidget або SheetModel)."""
+    cells = strings = formulas = text_bytes = 0
+    for r, c in occupied_cells(table):
+        item = table.item(r, c)
+        cells += 1
+        text = item.text()
+        formula = item.data(FORMULA_ROLE)
+        if isinstance(formula, str) and formula:
+            formulas += 1
+            text_bytes += 2 * len(formula)
+        elif text:
+            try:
+                float(text)
+            except ValueError:
+                strings += 1
+        text_bytes += 2 * len(text)
+    rows, cols = table.extent() if hasattr(table, "extent") else (table.rowCount(), table.columnCount())
+    return {
+        "rows": rows,
+        "cols": cols,
+        "cells": cells,
+        "strings": strings,
+        "formulas": formulas,
+        "estimated_bytes": cells * (QT_ITEM_OVERHEAD + QT_ROLE_OVERHEAD) + formulas * QT_ROLE_OVERHEAD + text_bytes,
+    }
+
+
+def workbook_memory(workbook) -> dict:
+    """Оцінка пам'яті моделі openpyxl, утримуваної в current_workbook."""
+    if workbook is None:
+        return {"sheets": 0, "cells": 0, "estimated_bytes": 0}
+    sheets = {}
+    total = 0
+    for sheet in workbook.worksheets:
+        cells = getattr(sheet, "_cells", {})
+        count = len(cells)
+        sample = []
+        for idx, cell in enumerate(cells.values()):
+            if idx >= WORKBOOK_SAMPLE_CELLS:
+                break
+            sample.append(cell)
+        # parent (аркуш) спільний для всіх клітинок: у розмір клітинки не входить.
+        seen = {id(sheet)}
+        sampled = sum(deep_size(cell, seen) for cell in sample)
+        estimated = sys.getsizeof(cells) + (sampled * count // len(sample) if sample else 0)
+        sheets[sheet.title] = {"cells": count, "estimated_bytes": estimated}
+        total += estimated
+    return {"sheets": len(sheets), "cells": sum(s["cells"] for s in sheets.values()),
+            "estimated_bytes": total, "by_sheet": sheets}
+
+
+def calculator_memory(calculator) -> dict:
+    return {
+        "ast_cache_entries": len(calculator._ast_cache),
+        "ast_cache_bytes": deep_size(calculator._ast_cache),
+        "cell_name_cache_entries": len(calculator._cell_name_cache),
+        "cell_name_cache_bytes": deep_size(calculator._cell_name_cache),
+        "lookup_indexes": len(calculator._lookup_indexes),
+    }
+
+
+def process_memory() -> dict:
+    """Поточний і піковий RSS процесу (байти), якщо платформа їх надає."""
+    result = {}
+    try:
+        with open("/proc/self/statm") as f:
+            result["rss_bytes"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result["peak_rss_bytes"] = peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+    return result
+
+
+def check_budgets(report: dict, budgets: dict[str, int]) -> list[str]:
+    """Повертає порушення бюджетів. Ключ бюджету - шлях у звіті через крапку, напр. "calculator.ast_cache_bytes"."""
+    violations = []
+    for path, limit in budgets.items():
+        value = report
+        for part in path.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        if isinstance(value, (int, float)) and value > limit:
+            violations.append(f"{path}: {value} > {limit}")
+    return violations
+
+
+class MemoryTracker:
+    """Знімки tracemalloc на вимогу: найбільші місця виділення і приріст з попереднього знімка.
+    Один трекер спільний для потоків сервісу, тому знімки, start і stop виконуються під замком."""
+
+    def __init__(self, frames: int = 1):
+        self.frames = frames
+        self._lock = threading.Lock()
+        self._previous: tracemalloc.Snapshot | None = None
+        self._started_here = False
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> None:
+        with self._lock:
+            self._start()
+
+    def _start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_here = True
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._started_here:
+                tracemalloc.stop()
+                self._started_here = False
+            self._previous = None
+
+    def snapshot(self, limit: int = 20) -> dict:
+        """Робить знімок; повертає топ виділень і (з другого знімка) топ приросту."""
+        with self._lock:
+            return self._snapshot(limit)
+
+    def _snapshot(self, limit: int) -> dict:
+        self._start()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        result = {
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "top": [{"location": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+                    for stat in snapshot.statistics("lineno")[:limit]],
+        }
+        if self._previous is not None:
+            result["growth"] = [{"location": str(stat.traceback), "size_diff_bytes": stat.size_diff,
+                                 "count_diff": stat.count_diff}
+                                for stat in snapshot.compare_to(self._previous, "lineno")[:limit]
+                                if stat.size_diff]
+        self._previous = snapshot
+        return result
@@ -0,0 +1,121 @@
+import re
+
+from back.parser import (Parser, ParsingError, ASTNode, NameNode, CellRefNode, RangeRefNode, BinaryOpNode,
+                         UnaryOpNode, FunctionNode, cell_indices, sheet_prefix)
+
+# Ім'я: літера або _, далі літери, цифри, _ і крапки; не може виглядати як адреса клітинки.
+_NAME_RE = re.compile(r"[^\W\d][\w.]*")
+# $ абсолютних посилань (у визначеннях імен xlsx завжди 'Аркуш!$A$1:$A$10'); лексер їх не підтримує.
+_ABSOLUTE_RE = re.compile(r"\$(?=[A-Za-z]+\$?\d|\d)")
+_CELL_RE = re.compile(r"([A-Z]+)([0-9]+)")
+
+
+def _absolute(cell_name: str) -> str:
+    return _CELL_RE.sub(r"$\1$\2", cell_name)
+
+
+def _names_in(node: ASTNode, result: list[str]) -> None:
+    if isinstance(node, NameNode):
+        result.append(node.name)
+    elif isinstance(node, BinaryOpNode):
+        _names_in(node.left, result)
+        _names_in(node.right, result)
+    elif isinstance(node, UnaryOpNode):
+        _names_in(node.operand, result)
+    elif isinstance(node, FunctionNode):
+        for arg in node.args:
+            _names_in(arg, result)
+
+
+class DefinedName:
+    __slots__ = ("name", "formula", "ast")
+
+    def __init__(self, name: str, formula: str, ast: ASTNode):
+        self.name = name
+        self.formula = formula
+        self.ast = ast
+
+
+class NameRegistry:
+    """Імена книги ('Ставка', 'Продажі' -> 'Дані!A1:A100') з пошуком без урахування регістру.
+
+    Визначення розбирається один раз під час define: посилання в ньому вже містять індекси,
+    тож формули з іменем не розбирають адресу при кожному обчисленні.
+    """
+
+    def __init__(self):
+        self._names: dict[str, DefinedName] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name.casefold() in self._names
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def define(self, name: str, formula: str) -> DefinedName:
+        """Додає або змінює ім'я; formula - посилання чи вираз з '=' або без ('Дані!$A$1:$A$10').
+
+        ValueError - некоректне ім'я, помилка розбору чи циклічне визначення.
+        """
+        if not _NAME_RE.fullmatch(name) or cell_indices(name) is not None or name.upper() in ("TRUE", "FALSE"):
+            raise ValueError(f"Некоректне ім'я: {name}")
+        formula = _ABSOLUTE_RE.sub("", formula.lstrip("="))
+        try:
+            ast = Parser().parse("=" + formula)
+        except ParsingError as e:
+            raise ValueError(f"Некоректне визначення імені {name}: {e}")
+        pending, seen = [], set()
+        _names_in(ast, pending)
+        while pending:
+            used = pending.pop().casefold()
+            if used == name.casefold():
+                raise ValueError(f"Ім'я {name} посилається саме на себе")
+            if used not in seen and used in self._names:
+                seen.add(used)
+                _names_in(self._names[used].ast, pending)
+        defined = self._names[name.casefold()] = DefinedName(name, formula, ast)
+        return defined
+
+    def update(self, definitions: dict[str, str]) -> list[str]:
+        """Визначає імена з файлу; повертає ті, що не вдалося визначити. Вбудовані імена Excel
+        (_xlnm.Print_Area тощо) пропускаються.
+        """
+        skipped = []
+        for name, formula in definitions.items():
+            if name.startswith("_xlnm."):
+                continue
+            try:
+                self.define(name, formula)
+            except ValueError:
+                skipped.append(name)
+        return skipped
+
+    def remove(self, name: str) -> None:
+        self._names.pop(name.casefold(), None)
+
+    def clear(self) -> None:
+        self._names.clear()
+
+    def get(self, name: str) -> DefinedName | None:
+        return self._names.get(name.casefold())
+
+    def resolve(self, name: str) -> ASTNode | None:
+        """Розібране визначення імені або None, якщо ім'я не визначене."""
+        defined = self._names.get(name.casefold())
+        return defined.ast if defined is not None else None
+
+    def names(self) -> list[str]:
+        return [defined.name for defined in self._names.values()]
+
+    def definitions(self) -> dict[str, str]:
+        """{ім'я: визначення} для збереження у файл; посилання - абсолютні, як їх пише Excel."""
+        result = {}
+        for defined in self._names.values():
+            ast = defined.ast
+            if isinstance(ast, CellRefNode):
+                result[defined.name] = sheet_prefix(ast.sheet) + _absolute(ast.cell_name)
+            elif isinstance(ast, RangeRefNode):
+                result[defined.name] = f"{sheet_prefix(ast.sheet)}{_absolute(ast.start_cell)}:{_absolute(ast.end_cell)}"
+            else:
+                result[defined.name] = defined.formula
+        return result
@@ -1,5 +1,5 @@
 import re
-from PySide6.QtCore import Qt
+from utils.cell_names import column_index_from_string
 
 class ASTNode:
     def to_string(self) -> str:
@@ -13,11 +13,45 @@ class NumberNode(ASTNode):
             return str(int(self.value))
         return str(self.value)
 
+_PLAIN_SHEET_NAME = re.compile(r"[^\W\d][\w.]*")
+
+def sheet_prefix(sheet: str | None) -> str:
+    """'Аркуш!' для посилання на інший аркуш; назви з пробілами тощо беруться в лапки."""
+    if sheet is None:
+        return ""
+    if _PLAIN_SHEET_NAME.fullmatch(sheet):
+        return f"{sheet}!"
+    return "'" + sheet.replace("'", "''") + "'!"
+
+_CELL_NAME = re.compile(r"([A-Z]+)([0-9]+)")
+
+def cell_indices(cell_name: str) -> tuple[int, int] | None:
+    """'B3' -> (2, 1): рядок і стовпець з нуля; None для некоректної адреси."""
+    match = _CELL_NAME.fullmatch(cell_name.upper())
+    if not match:
+        return None
+    return int(match.group(2)) - 1, column_index_from_string(match.group(1)) - 1
+
 class CellRefNode(ASTNode):
-    def __init__(self, cell_name):
+    # Індекси обчислюються під час розбору, а не при кожному обчисленні формули.
+    def __init__(self, cell_name, sheet=None):
         self.cell_name = cell_name.upper()
+        self.sheet = sheet
+        self.indices = cell_indices(self.cell_name)
     def to_string(self) -> str:
-        return self.cell_name
+        return sheet_prefix(self.sheet) + self.cell_name
+
+class StringNode(ASTNode):
+    def __init__(self, value: str):
+        self.value = value
+    def to_string(self) -> str:
+        return '"' + self.value.replace('"', '""') + '"'
+
+class BooleanNode(ASTNode):
+    def __init__(self, value: bool):
+        self.value = value
+    def to_string(self) -> str:
+        return "TRUE" if self.value else "FALSE"
 
 class ErrorNode(ASTNode):
     def __init__(self, error_code: str):
@@ -26,11 +60,23 @@ class ErrorNode(ASTNode):
         return self.error_code
 
 class RangeRefNode(ASTNode):
-    def __init__(self, start_cell, end_cell):
+    def __init__(self, start_cell, end_cell, sheet=None):
         self.start_cell = start_cell.upper()
         self.end_cell = end_cell.upper()
+        self.sheet = sheet
+        # (r1, c1, r2, c2) з упорядкованими межами або None для некоректної адреси.
+        start, end = cell_indices(self.start_cell), cell_indices(self.end_cell)
+        self.bounds = (min(start[0], end[0]), min(start[1], end[1]), max(start[0], end[0]),
+                       max(start[1], end[1])) if start and end else None
+    def to_string(self) -> str:
+        return f"{sheet_prefix(self.sheet)}{self.start_cell}:{self.end_cell}"
+
+class NameNode(ASTNode):
+    """Ім'я книги (іменований діапазон чи константа); визначення шукається під час обчислення."""
+    def __init__(self, name: str):
+        self.name = name
     def to_string(self) -> str:
-        return f"{self.start_cell}:{self.end_cell}"
+        return self.name
 
 class BinaryOpNode(ASTNode):
     def __init__(self, left, op, right):
@@ -86,10 +132,14 @@ class Token:
 class Lexer:
     TOKEN_SPECS = [
         ('NUMBER',   r'\d+(\.\d*)?'),
+        ('STRING',   r'"(?:[^"]|"")*"'),
         ('REF_ERROR',r'#REF!'),
         ('NAME_ERROR',r'#NAME\?'),
+        ('SHEET',    r"(?:'(?:[^']|'')+'|[^\W\d][\w.]*)!"),
+        ('BOOL',     r'(?:TRUE|FALSE)(?![\w(])'),
         ('FUNCTION', r'[A-Z_]+(?=\()'), 
-        ('CELL',     r'[A-Z]+[0-9]+'),
+        ('CELL',     r'[A-Z]+[0-9]+(?![\w.])'),
+        ('NAME',     r'[^\W\d][\w.]*'),
         ('PLUS',     r'\+'),
         ('MINUS',    r'-'),
         ('MUL',      r'\*'),
@@ -103,13 +153,15 @@ class Lexer:
         ('SKIP',     r'[ \t]+'),
         ('MISMATCH', r'.'),
     ]
-    TOKEN_REGEX = '|'.join(f'(?P<{name}>{regex})' for name, regex in TOKEN_SPECS)
+    # Регістр не змінюється, щоб зберегти текст у лапках; вузли AST самі переводять адреси й функції
+    # у верхній регістр, а назви аркушів порівнюються без урахування регістру.
+    TOKEN_REGEX = re.compile('|'.join(f'(?P<{name}>{regex})' for name, regex in TOKEN_SPECS), re.IGNORECASE)
 
     def tokenize(self, text):
         tokens = []
-        formula_body = text.lstrip("=").upper()
+        formula_body = text.lstrip("=")
         
-        for mo in re.finditer(self.TOKEN_REGEX, formula_body):
+        for mo in self.TOKEN_REGEX.finditer(formula_body):
             kind = mo.lastgroup
             value = mo.group()
             
@@ -119,7 +171,15 @@ class Lexer:
                 if value == '#' and len(formula_body) > mo.start() + 1:
                     continue 
                 raise ParsingError(f"Невідомий символ: {value}")
-                
+            if kind == 'SHEET':
+                value = value[:-1]
+                if value.startswith("'"):
+                    value = value[1:-1].replace("''", "'")
+            elif kind == 'STRING':
+                value = value[1:-1].replace('""', '"')
+            elif kind == 'BOOL':
+                value = value.upper()
+
             tokens.append(Token(kind, value))
         return tokens
 
@@ -200,11 +260,27 @@ class Parser:
         if token.type == 'NUMBER':
             self._eat('NUMBER')
             return NumberNode(token.value)
+
+        if token.type == 'STRING':
+            self._eat('STRING')
+            return StringNode(token.value)
+
+        if token.type == 'BOOL':
+            self._eat('BOOL')
+            return BooleanNode(token.value == "TRUE")
         
         if token.type == 'MINUS': 
             self._eat('MINUS')
             return UnaryOpNode(op='-', operand=self._parse_factor())
 
+        sheet = None
+        if token.type == 'SHEET':
+            sheet = token.value
+            self._eat('SHEET')
+            token = self.current_token
+            if token is None or token.type != 'CELL':
+                raise ParsingError(f"Очікувалася клітинка після '{sheet}!'")
+
         if token.type == 'CELL':
             cell_token = token
             self._eat('CELL')
@@ -212,9 +288,13 @@ class Parser:
                 self._eat('COLON')
                 end_token = self.current_token
                 self._eat('CELL')
-                return RangeRefNode(cell_token.value, end_token.value)
-            return CellRefNode(cell_token.value)
+                return RangeRefNode(cell_token.value, end_token.value, sheet)
+            return CellRefNode(cell_token.value, sheet)
         
+        if token.type == 'NAME':
+            self._eat('NAME')
+            return NameNode(token.value)
+
         if token.type == 'FUNCTION':
             func_name = token.value
             self._eat('FUNCTION')
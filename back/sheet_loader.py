@@ -0,0 +1,141 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from typing import Callable
+
+from back.parser import Parser, ErrorNode
+from back.sparse_grid import SparseGrid
+from back.string_table import StringTable
+from utils.config import PARALLEL_LOAD_MIN_SHEETS
+
+# Модуль не імпортує Qt: він виконується в дочірніх процесах пулу.
+
+
+class SheetData:
+    """Розібраний аркуш: значення клітинок (SparseGrid) і заздалегідь розібрані формули."""
+
+    def __init__(self, name: str, max_row: int, max_col: int, cells: SparseGrid, formulas: dict):
+        self.name = name
+        self.max_row = max_row
+        self.max_col = max_col
+        self.cells = cells
+        self.formulas = formulas
+
+
+def _preparse_formula(formula: str):
+    try:
+        return Parser().parse(formula)
+    except Exception:
+        return ErrorNode("#ERROR!")
+
+
+def _iter_dense(sheet):
+    for r, row in enumerate(sheet.iter_rows(values_only=True)):
+        for c, value in enumerate(row):
+            if value is not None:
+                yield r, c, value
+
+
+def iter_sheet_cells(sheet):
+    """(рядок, стовпець, значення) непорожніх клітинок аркуша openpyxl, від 0.
+
+    iter_rows заповнює None кожну порожню позицію до найдальшої клітинки (A1 і Z500000 - це 13 млн
+    значень), тому аркуш у режимі read_only читається розбирачем XML напряму, а звичайний - з його
+    словника клітинок. Це внутрішні API openpyxl; якщо їх немає, лишається щільний iter_rows.
+    """
+    if hasattr(sheet, "_get_source"):
+        try:
+            from openpyxl.worksheet._reader import WorkSheetParser
+        except ImportError:
+            yield from _iter_dense(sheet)
+            return
+        workbook = sheet.parent
+        with sheet._get_source() as src:
+            parser = WorkSheetParser(src, sheet._shared_strings, data_only=workbook.data_only,
+                                     epoch=workbook.epoch, date_formats=workbook._date_formats,
+                                     timedelta_formats=workbook._timedelta_formats)
+            for row_idx, row in parser.parse():
+                for cell in row:
+                    if cell["value"] is not None:
+                        yield row_idx - 1, cell["column"] - 1, cell["value"]
+    elif isinstance(getattr(sheet, "_cells", None), dict):
+        for (row_idx, col_idx), cell in sorted(sheet._cells.items()):
+            if cell.value is not None:
+                yield row_idx - 1, col_idx - 1, cell.value
+    else:
+        yield from _iter_dense(sheet)
+
+
+def parse_sheet(path: str, sheet_name: str) -> SheetData:
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=False)
+    try:
+        sheet = workbook[sheet_name]
+        cells = SparseGrid()
+        formulas = {}
+        # Однакові рядки (перекладені спільні формули, вбудовані рядки) - один об'єкт: менше пам'яті
+        # і менше даних при передачі з процесу пулу (pickle зберігає кожен об'єкт один раз).
+        strings = StringTable()
+        max_row = max_col = 0
+        for r, c, value in iter_sheet_cells(sheet):
+            if isinstance(value, str):
+                value = strings.intern(value)
+            cells[(r, c)] = value
+            if r >= max_row: max_row = r + 1
+            if c >= max_col: max_col = c + 1
+            if isinstance(value, str) and value.startswith("=") and value not in formulas:
+                formulas[value] = _preparse_formula(value)
+        return SheetData(sheet_name, max_row, max_col, cells, formulas)
+    finally:
+        workbook.close()
+
+
+def read_sheet_names(path: str) -> list[str]:
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def read_defined_names(path: str) -> dict[str, str]:
+    """Імена рівня книги {ім'я: визначення}; імена окремих аркушів не підтримуються."""
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return {name: defined.attr_text for name, defined in workbook.defined_names.items()}
+    finally:
+        workbook.close()
+
+
+def load_sheets(path: str, max_workers: int | None = None,
+                progress_callback: Callable[[int, int], None] | None = None) -> list[SheetData]:
+    """Розбирає аркуші книги паралельно, кожен у власному процесі."""
+    sheet_names = read_sheet_names(path)
+    total = len(sheet_names)
+    workers = min(max_workers or os.cpu_count() or 1, total)
+    if progress_callback:
+        progress_callback(0, total)
+
+    if workers <= 1 or total < PARALLEL_LOAD_MIN_SHEETS:
+        sheets = []
+        for idx, name in enumerate(sheet_names, start=1):
+            sheets.append(parse_sheet(path, name))
+            if progress_callback:
+                progress_callback(idx, total)
+        return sheets
+
+    results: dict[str, SheetData] = {}
+    # spawn: дочірні процеси не повинні успадковувати стан Qt батьківського процесу.
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+    try:
+        futures = [executor.submit(parse_sheet, path, name) for name in sheet_names]
+        for done, future in enumerate(as_completed(futures), start=1):
+            data = future.result()
+            results[data.name] = data
+            if progress_callback:
+                progress_callback(done, total)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return [results[name] for name in sheet_names]
@@ -0,0 +1,156 @@
+from back.calculator import FormulaCalculator, FORMULA_ROLE, SPILL_ROLE
+from back.arrays import top_left
+from back.sparse_grid import SparseGrid
+from back.string_table import StringTable
+
+# Модель аркуша без Qt: той самий інтерфейс (rowCount/columnCount/item), що й QTableWidget,
+# тож FormulaCalculator працює з нею без змін.
+
+# Межі аркуша Excel. У моделі немає видимої сітки, як у таблиці GUI, тож її розмір - увесь аркуш:
+# посилання за межами заповнених клітинок (=SUM(A1:A100) на трьох рядках) читають порожні клітинки,
+# а не дають #REF!.
+MAX_ROWS = 1048576
+MAX_COLS = 16384
+
+
+class CellItem:
+    __slots__ = ("_text", "formula", "spill")
+
+    def __init__(self, text: str, formula: str | None = None):
+        self._text = text
+        self.formula = formula
+        self.spill = None
+
+    def text(self) -> str:
+        return self._text
+
+    def setText(self, text: str) -> None:
+        self._text = text
+
+    def data(self, role: int):
+        if role == FORMULA_ROLE:
+            return self.formula
+        return self.spill if role == SPILL_ROLE else None
+
+    def setData(self, role: int, value) -> None:
+        if role == FORMULA_ROLE:
+            self.formula = value
+        elif role == SPILL_ROLE:
+            self.spill = value
+
+
+class SharedItem(CellItem):
+    """Клітинка-константа, одна на всі позиції з тим самим вмістом, завантажені разом (див.
+    SheetModel.set_value): позиція зберігає лише посилання на неї. Змінюється тільки заміною."""
+    __slots__ = ()
+
+    def setText(self, text: str) -> None:
+        raise TypeError("Спільну клітинку-константу не можна змінити")
+
+    def setData(self, role: int, value) -> None:
+        raise TypeError("Спільну клітинку-константу не можна змінити")
+
+
+class SheetModel:
+    def __init__(self, name: str, rows: int = 0, cols: int = 0, strings: StringTable | None = None):
+        self.name = name
+        self.rows = rows
+        self.cols = cols
+        self.cells = SparseGrid()
+        # Пул формул книги, спільний для її аркушів.
+        self.strings = strings if strings is not None else StringTable()
+
+    @classmethod
+    def from_rows(cls, name: str, rows, strings: StringTable | None = None) -> "SheetModel":
+        model = cls(name, strings=strings)
+        shared = {}
+        for r, row in enumerate(rows):
+            for c, value in enumerate(row):
+                if value is not None:
+                    model.set_value(r, c, value, shared)
+        return model
+
+    @classmethod
+    def from_cells(cls, name: str, cells, strings: StringTable | None = None) -> "SheetModel":
+        """Модель з (рядок, стовпець, значення) непорожніх клітинок, напр. sheet_loader.iter_sheet_cells."""
+        model = cls(name, strings=strings)
+        shared = {}
+        for r, c, value in cells:
+            model.set_value(r, c, value, shared)
+        return model
+
+    @classmethod
+    def from_sheet_data(cls, data, strings: StringTable | None = None) -> "SheetModel":
+        model = cls(data.name, data.max_row, data.max_col, strings)
+        shared = {}
+        for (r, c), value in data.cells.items():
+            model.set_value(r, c, value, shared)
+        return model
+
+    def rowCount(self) -> int:
+        return MAX_ROWS
+
+    def columnCount(self) -> int:
+        return MAX_COLS
+
+    def extent(self) -> tuple[int, int]:
+        """(рядки, стовпці) заповненої частини аркуша."""
+        return self.rows, self.cols
+
+    def item(self, row: int, col: int) -> CellItem | None:
+        return self.cells.at(row, col)
+
+    def setItem(self, row: int, col: int, item: CellItem) -> None:
+        self.cells[(row, col)] = item
+        if row >= self.rows: self.rows = row + 1
+        if col >= self.cols: self.cols = col + 1
+
+    def takeItem(self, row: int, col: int) -> CellItem | None:
+        return self.cells.pop((row, col), None)
+
+    def set_value(self, row: int, col: int, value, shared: dict[str, SharedItem] | None = None) -> None:
+        """Записує значення або формулу; None чи "" очищає клітинку. Формули інтернуються в пулі книги.
+
+        shared - пул констант масового завантаження {текст: SharedItem}: однакові числа й підписи стають
+        однією клітинкою. Пул живе лише під час завантаження, тож правки не накопичують у ньому значень.
+        """
+        if value is None or value == "":
+            self.cells.pop((row, col), None)
+            return
+        text = value if isinstance(value, str) else str(value)
+        if text.startswith("="):
+            text = self.strings.intern(text)
+            item = CellItem(text, text)
+        elif shared is None:
+            item = CellItem(text)
+        else:
+            item = shared.get(text)
+            if item is None:
+                item = shared[text] = SharedItem(text)
+        self.cells[(row, col)] = item
+        if row >= self.rows: self.rows = row + 1
+        if col >= self.cols: self.cols = col + 1
+
+    def formula_cells(self) -> list[tuple[int, int]]:
+        return [pos for pos, item in self.cells.items() if item.formula]
+
+    def occupied_cells(self) -> list[tuple[int, int]]:
+        return sorted(self.cells.keys())
+
+    def recalculate(self, calculator: FormulaCalculator) -> dict[tuple[int, int], object]:
+        """Перераховує всі формули; повертає {(рядок, стовпець): значення}."""
+        results = {}
+        for pos in self.formula_cells():
+            item = self.cells[pos]
+            value = top_left(calculator.evaluate(item.formula, self, cell=(self.name, *pos)))
+            results[pos] = value
+            item.setText(str(value))
+        return results
+
+
+def occupied_cells(table) -> list[tuple[int, int]]:
+    """Заповнені клітинки таблиці по рядках; без індексу заповнених - повний обхід сітки."""
+    if hasattr(table, "occupied_cells"):
+        return table.occupied_cells()
+    return [(r, c) for r in range(table.rowCount()) for c in range(table.columnCount())
+            if table.item(r, c) is not None]
@@ -0,0 +1,50 @@
+class SheetEntry:
+    __slots__ = ("name", "table", "values")
+
+    def __init__(self, name: str, table, values: dict | None):
+        self.name = name
+        self.table = table
+        self.values = values
+
+
+class SheetRegistry:
+    """Аркуші книги для посилань 'Аркуш!A1': пошук за назвою без урахування регістру за O(1).
+
+    Лексер переводить формулу у верхній регістр, тому ключ - casefold() назви.
+    values - {(рядок, стовпець): значення} обчислених формул аркуша або None.
+    """
+
+    def __init__(self):
+        self._entries: dict[str, SheetEntry] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name.casefold() in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def register(self, name: str, table, values: dict | None = None) -> None:
+        self._entries[name.casefold()] = SheetEntry(name, table, values)
+
+    def unregister(self, name: str) -> None:
+        self._entries.pop(name.casefold(), None)
+
+    def rename(self, old_name: str, new_name: str) -> None:
+        entry = self._entries.pop(old_name.casefold(), None)
+        if entry is not None:
+            entry.name = new_name
+            self._entries[new_name.casefold()] = entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get(self, name: str) -> SheetEntry | None:
+        return self._entries.get(name.casefold())
+
+    def canonical_name(self, name: str) -> str:
+        """Назва аркуша так, як її зареєстровано; для невідомого аркуша - сама назва."""
+        entry = self._entries.get(name.casefold())
+        return entry.name if entry is not None else name
+
+    def names(self) -> list[str]:
+        return [entry.name for entry in self._entries.values()]
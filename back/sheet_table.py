@@ -0,0 +1,74 @@
+from PySide6.QtWidgets import QTableWidget, QTableWidgetItem
+
+from back.calculator import FORMULA_ROLE
+from back.sparse_grid import SparseGrid
+
+# QTableWidget з індексом заповнених клітинок. Елементи створюються лише для непорожніх клітинок,
+# а обходи (перерахунок, збереження, переписування формул, звіт пам'яті) йдуть по індексу замість
+# rowCount x columnCount позицій. Сама сітка Qt усе одно тримає по вказівнику на позицію.
+
+
+class SheetTable(QTableWidget):
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.occupied = SparseGrid()
+        # Редагування порожньої клітинки: Qt створює елемент у C++ в обхід setItem нижче.
+        self.itemChanged.connect(self._track_item)
+
+    def _track_item(self, item: QTableWidgetItem) -> None:
+        self.occupied[(item.row(), item.column())] = True
+
+    def setItem(self, row: int, col: int, item: QTableWidgetItem) -> None:
+        super().setItem(row, col, item)
+        self.occupied[(row, col)] = True
+
+    def takeItem(self, row: int, col: int) -> QTableWidgetItem | None:
+        self.occupied.pop((row, col))
+        return super().takeItem(row, col)
+
+    def insertRow(self, row: int) -> None:
+        super().insertRow(row)
+        self.occupied.shift(0, row, 1)
+
+    def removeRow(self, row: int) -> None:
+        super().removeRow(row)
+        self.occupied.shift(0, row, -1)
+
+    def insertColumn(self, col: int) -> None:
+        super().insertColumn(col)
+        self.occupied.shift(1, col, 1)
+
+    def removeColumn(self, col: int) -> None:
+        super().removeColumn(col)
+        self.occupied.shift(1, col, -1)
+
+    def setRowCount(self, rows: int) -> None:
+        if rows < self.rowCount():
+            self.occupied.shift(0, rows, rows - self.rowCount())
+        super().setRowCount(rows)
+
+    def setColumnCount(self, cols: int) -> None:
+        if cols < self.columnCount():
+            self.occupied.shift(1, cols, cols - self.columnCount())
+        super().setColumnCount(cols)
+
+    def clear(self) -> None:
+        super().clear()
+        self.occupied.clear()
+
+    def clearContents(self) -> None:
+        super().clearContents()
+        self.occupied.clear()
+
+    def occupied_cells(self) -> list[tuple[int, int]]:
+        """Клітинки з елементами по рядках."""
+        return [pos for pos, _ in self.occupied.sorted_items() if self.item(*pos) is not None]
+
+    def formula_cells(self) -> list[tuple[int, int]]:
+        result = []
+        for r, c in self.occupied_cells():
+            formula = self.item(r, c).data(FORMULA_ROLE)
+            if isinstance(formula, str) and formula.startswith("="):
+                result.append((r, c))
+        return result
@@ -1,16 +1,31 @@
+import re
 from PySide6.QtWidgets import (QTabWidget, QTableWidget, QTableWidgetItem, 
                                QHeaderView, QMessageBox, QInputDialog, QMenu)
 from PySide6.QtGui import QAction
 from PySide6.QtCore import Qt, QPoint
-from openpyxl.utils import get_column_letter
+from utils.cell_names import get_column_letter
 
 from utils.config import DEFAULT_ROWS, DEFAULT_COLS
+from utils.tracing import span
 from back.parser import (
     ASTNode, NumberNode, CellRefNode, RangeRefNode, BinaryOpNode, 
     FunctionNode, UnaryOpNode, ErrorNode, ParsingError,
     CircularReferenceError, ReferenceError
 )
-from back.calculator import FormulaCalculator
+from back.calculator import FormulaCalculator, SPILL_ROLE
+from back.sheet_loader import SheetData, iter_sheet_cells
+from back.sheet_model import occupied_cells
+from back.sheet_table import SheetTable
+from back.string_table import StringTable
+from back.undo_stack import UndoEntry
+
+
+_INVALID_SHEET_CHARS = re.compile(r"[\\/*?:\[\]]")
+
+
+def _count(value) -> int | None:
+    """Невід'ємне ціле з журналу (номер рядка, стовпця, розмір) або None."""
+    return value if isinstance(value, int) and not isinstance(value, bool) and value >= 0 else None
 
 
 class SheetWorker:
@@ -37,17 +52,21 @@ class SheetWorker:
         self.tab_widget.blockSignals(True)
         self.tab_widget.clear()
         self.tab_widget.blockSignals(False)
+        self.main_window.workbook_calc.clear()
+        self.main_window.clear_undo()
 
-    def add_sheet_tab(self, sheet_name: str, sheet_data = None) -> QTableWidget:
+    def add_sheet_tab(self, sheet_name: str, sheet_data = None, index: int = -1) -> QTableWidget:
         table_widget = self.create_new_table_widget()
         self.populate_table(table_widget, sheet_data)
-        index = self.tab_widget.addTab(table_widget, sheet_name)
+        # Формули аркуша потрапляють у граф під час повного перерахунку, коли зареєстровано всі аркуші.
+        self.main_window.workbook_calc.add_sheet(sheet_name, table_widget, scan=False)
+        index = self.tab_widget.insertTab(index, table_widget, sheet_name)
         self.tab_widget.setCurrentIndex(index)
         self.update_column_headers(table_widget)
         return table_widget
         
     def create_new_table_widget(self) -> QTableWidget:
-        table_widget = QTableWidget()
+        table_widget = SheetTable()
         table_widget.setToolTip("Клацніть правою кнопкою миші для опцій")
         table_widget.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         table_widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
@@ -55,6 +74,8 @@ class SheetWorker:
         table_widget.customContextMenuRequested.connect(self.main_window.show_context_menu)
         table_widget.itemChanged.connect(self.main_window.on_item_changed)
         table_widget.itemDoubleClicked.connect(self.main_window.on_item_double_clicked)
+        table_widget.currentCellChanged.connect(
+            lambda row, col, *_: self.main_window.on_current_cell_changed(table_widget, row, col))
         return table_widget
     
     def add_new_sheet_action(self):
@@ -65,15 +86,25 @@ class SheetWorker:
         sheet_name, ok = QInputDialog.getText(self.main_window, "Новий аркуш", "Введіть ім'я аркуша:")
         
         if ok and sheet_name:
+            if not self.is_valid_sheet_name(sheet_name):
+                QMessageBox.warning(self.main_window, "Помилка", "Недопустиме ім'я аркуша.")
+                return
             if sheet_name in self.main_window.current_workbook.sheetnames:
                 QMessageBox.warning(self.main_window, "Помилка", "Аркуш з таким іменем вже існує.")
                 return
             
             new_sheet = self.main_window.current_workbook.create_sheet(title=sheet_name)
             self.add_sheet_tab(sheet_name) 
+            self.main_window.record_edit("add_sheet", sheet=sheet_name)
+            self.main_window.push_undo(UndoEntry("add_sheet", sheet_name, (self._tab_index_by_name(sheet_name),)))
             self.main_window.set_dirty(True)
+            # Формули, що вже посилаються на аркуш із цією назвою, тепер мають звідки брати значення.
+            self.main_window.recalculate_all_cells()
 
     def populate_table(self, table_widget: QTableWidget, sheet) -> None:
+        if isinstance(sheet, SheetData):
+            self._populate_table_from_data(table_widget, sheet)
+            return
         table_widget.blockSignals(True)
         
         max_row, max_col = DEFAULT_ROWS, DEFAULT_COLS
@@ -87,24 +118,40 @@ class SheetWorker:
         table_widget.setColumnCount(max_col)
         self.update_column_headers(table_widget)
 
+        # Елементи лише для заповнених клітинок: порожні Qt створює сам, коли їх редагують.
         if sheet:
-            for row_idx, row in enumerate(sheet.iter_rows(max_row=max_row, max_col=max_col)):
-                for col_idx, cell in enumerate(row):
-                    cell_value = cell.value
-                    cell_value_str = str(cell_value) if cell_value is not None else ""
-                    item = QTableWidgetItem()
-                    if cell_value_str.startswith("="):
-                        item.setData(Qt.ItemDataRole.UserRole, cell_value_str)
-                        item.setText("...") 
-                    else:
-                        item.setText(cell_value_str)
-                    table_widget.setItem(row_idx, col_idx, item)
-        else:
-             for r in range(max_row):
-                 for c in range(max_col):
-                     table_widget.setItem(r, c, QTableWidgetItem(""))
+            for row_idx, col_idx, cell_value in iter_sheet_cells(sheet):
+                cell_value_str = str(cell_value)
+                if cell_value_str and row_idx < max_row and col_idx < max_col:
+                    table_widget.setItem(row_idx, col_idx, self._create_item(cell_value_str))
+
+        table_widget.blockSignals(False)
+
+    def _populate_table_from_data(self, table_widget: QTableWidget, data: SheetData) -> None:
+        table_widget.blockSignals(True)
+        max_row, max_col = data.max_row, data.max_col
+        if max_row == 0 or max_col == 0:
+            max_row, max_col = DEFAULT_ROWS, DEFAULT_COLS
+        table_widget.setRowCount(max_row)
+        table_widget.setColumnCount(max_col)
+        self.update_column_headers(table_widget)
 
+        self.main_window.calculator.seed_ast_cache(data.formulas)
+        for (r, c), value in data.cells.items():
+            text = str(value)
+            if text:
+                table_widget.setItem(r, c, self._create_item(text))
         table_widget.blockSignals(False)
+
+    @staticmethod
+    def _create_item(cell_value_str: str) -> QTableWidgetItem:
+        item = QTableWidgetItem()
+        if cell_value_str.startswith("="):
+            item.setData(Qt.ItemDataRole.UserRole, cell_value_str)
+            item.setText("...") 
+        else:
+            item.setText(cell_value_str)
+        return item
         
     def update_column_headers(self, table_widget: QTableWidget | None = None) -> None:
         if table_widget is None:
@@ -118,15 +165,18 @@ class SheetWorker:
         table_widget = self.get_current_table()
         if not table_widget: return
         current_row = table_widget.rowCount()
-        table_widget.insertRow(current_row)
+        self.insert_line(table_widget, 'row', current_row)
+        self.main_window.record_edit("insert_row", sheet=self.get_current_sheet_name(), index=current_row)
+        self.main_window.push_undo(UndoEntry("insert_row", self.get_current_sheet_name(), (current_row,)))
         self.main_window.set_dirty(True)
         
     def add_column(self) -> None:
         table_widget = self.get_current_table()
         if not table_widget: return
         current_col = table_widget.columnCount()
-        table_widget.insertColumn(current_col)
-        self.update_column_headers(table_widget)
+        self.insert_line(table_widget, 'col', current_col)
+        self.main_window.record_edit("insert_col", sheet=self.get_current_sheet_name(), index=current_col)
+        self.main_window.push_undo(UndoEntry("insert_col", self.get_current_sheet_name(), (current_col,)))
         self.main_window.set_dirty(True)
 
     def delete_row(self) -> None:
@@ -138,8 +188,8 @@ class SheetWorker:
             
         last_row_index = row_count - 1
         
-        self.update_formulas_on_delete('row', last_row_index)
-        table_widget.removeRow(last_row_index)
+        self._delete_line_undoable(table_widget, 'row', last_row_index)
+        self.main_window.record_edit("delete_row", sheet=self.get_current_sheet_name(), index=last_row_index)
         self.main_window.set_dirty(True)
         self.main_window.recalculate_all_cells()
 
@@ -152,57 +202,435 @@ class SheetWorker:
 
         last_col_index = col_count - 1
 
-        
-        self.update_formulas_on_delete('col', last_col_index)
-        table_widget.removeColumn(last_col_index)
-        self.update_column_headers(table_widget)
+        self._delete_line_undoable(table_widget, 'col', last_col_index)
+        self.main_window.record_edit("delete_col", sheet=self.get_current_sheet_name(), index=last_col_index)
         self.main_window.set_dirty(True)
         self.main_window.recalculate_all_cells()
-            
-    def update_formulas_on_delete(self, dimension: str, deleted_index: int):
+
+    def _workbook_sheet(self, table_widget: QTableWidget):
+        """Аркуш current_workbook (форматування), що відповідає таблиці, або None."""
+        workbook = self.main_window.current_workbook
+        sheet_name = self.tab_widget.tabText(self.tab_widget.indexOf(table_widget))
+        return workbook[sheet_name] if workbook is not None and sheet_name in workbook.sheetnames else None
+
+    def insert_line(self, table_widget: QTableWidget, dimension: str, index: int) -> None:
+        sheet = self._workbook_sheet(table_widget)
+        if dimension == 'row':
+            table_widget.insertRow(index)
+            if sheet is not None:
+                sheet.insert_rows(index + 1)
+        else:
+            table_widget.insertColumn(index)
+            self.update_column_headers(table_widget)
+            if sheet is not None:
+                sheet.insert_cols(index + 1)
+
+    def delete_line(self, table_widget: QTableWidget, dimension: str, index: int) -> tuple[list, list]:
+        """Видаляє рядок/стовпець; повертає переписані формули [(аркуш, рядок, стовпець, стара формула)]
+        і визначення імен [(ім'я, старе визначення)]."""
+        rewrites = self.update_formulas_on_delete(dimension, index, table_widget)
+        names = self.update_names_on_delete(dimension, index, table_widget)
+        self.remove_line(table_widget, dimension, index)
+        return rewrites, names
+
+    def remove_line(self, table_widget: QTableWidget, dimension: str, index: int) -> None:
+        """Видаляє рядок/стовпець без переписування посилань (скасування вставки)."""
+        sheet = self._workbook_sheet(table_widget)
+        if dimension == 'row':
+            table_widget.removeRow(index)
+            if sheet is not None:
+                sheet.delete_rows(index + 1)
+        else:
+            table_widget.removeColumn(index)
+            self.update_column_headers(table_widget)
+            if sheet is not None:
+                sheet.delete_cols(index + 1)
+
+    def _delete_line_undoable(self, table_widget: QTableWidget, dimension: str, index: int) -> None:
+        sheet_name = self.tab_widget.tabText(self.tab_widget.indexOf(table_widget))
+        axis = 0 if dimension == 'row' else 1
+        line = [pos for pos in occupied_cells(table_widget) if pos[axis] == index]
+        cells, old = [], []
+        for row, col in line:
+            content = self.cell_content(table_widget, row, col, spilled=False)
+            if content:
+                cells.append((sheet_name, row, col))
+                old.append(content)
+        rewrites, names = self.delete_line(table_widget, dimension, index)
+        for sheet, row, col, formula in rewrites:
+            cells.append((sheet, row, col))
+            old.append(formula)
+        self.main_window.push_undo(UndoEntry("delete_" + dimension, sheet_name, (index, names), cells, old))
+
+    def get_table_by_name(self, sheet_name: str) -> QTableWidget | None:
+        entry = self.main_window.workbook_calc.sheets.get(sheet_name)
+        return entry.table if entry is not None else None
+
+    def _tab_index_by_name(self, sheet_name: str) -> int:
+        for idx in range(self.tab_widget.count()):
+            if self.tab_widget.tabText(idx) == sheet_name:
+                return idx
+        return -1
+
+    def show_tab_context_menu(self, position: QPoint) -> None:
+        tab_bar = self.tab_widget.tabBar()
+        index = tab_bar.tabAt(position)
+        if index == -1 or not self.main_window.current_workbook:
+            return
+        self.tab_widget.setCurrentIndex(index)
+        menu = QMenu(self.main_window)
+        menu.addAction(self.main_window.ui_manager.get_action("ren_sheet"))
+        menu.addAction(self.main_window.ui_manager.get_action("del_sheet"))
+        menu.exec(tab_bar.mapToGlobal(position))
+
+    def rename_current_sheet_action(self) -> None:
+        old_name = self.get_current_sheet_name()
+        workbook = self.main_window.current_workbook
+        if old_name is None or not workbook: return
+
+        new_name, ok = QInputDialog.getText(self.main_window, "Перейменувати аркуш",
+                                            "Введіть нове ім'я аркуша:", text=old_name)
+        if not ok or not new_name or new_name == old_name:
+            return
+        if not self.is_valid_sheet_name(new_name):
+            QMessageBox.warning(self.main_window, "Помилка", "Недопустиме ім'я аркуша.")
+            return
+        if new_name in workbook.sheetnames:
+            QMessageBox.warning(self.main_window, "Помилка", "Аркуш з таким іменем вже існує.")
+            return
+        rewrites, names = self.rename_sheet(old_name, new_name)
+        self.main_window.record_edit("rename_sheet", sheet=old_name, new_name=new_name)
+        self.main_window.push_undo(UndoEntry("rename_sheet", old_name, (new_name, names),
+                                             [(sheet, row, col) for sheet, row, col, _ in rewrites],
+                                             [formula for *_, formula in rewrites]))
+        self.main_window.set_dirty(True)
+        self.main_window.recalculate_all_cells(rebuild=False)
+
+    def rename_sheet(self, old_name: str, new_name: str, rewrite: bool = True) -> tuple[list, list]:
+        """Перейменовує аркуш; rewrite - переписати посилання на нього (див. update_formulas_on_rename)."""
+        workbook = self.main_window.current_workbook
+        if old_name in workbook.sheetnames:
+            workbook[old_name].title = new_name
+        index = self._tab_index_by_name(old_name)
+        if index != -1:
+            self.tab_widget.setTabText(index, new_name)
+        rewrites = self.update_formulas_on_rename(old_name, new_name) if rewrite else ([], [])
+        self.main_window.workbook_calc.rename_sheet(old_name, new_name)
+        return rewrites
+
+    def delete_current_sheet_action(self) -> None:
+        sheet_name = self.get_current_sheet_name()
+        if sheet_name is None or not self.main_window.current_workbook: return
+        if self.tab_widget.count() <= 1:
+            QMessageBox.warning(self.main_window, "Помилка", "Книга повинна містити хоча б один аркуш.")
+            return
+
+        reply = QMessageBox.question(self.main_window, "Видалити аркуш",
+                                     f"Видалити аркуш '{sheet_name}'?",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        table_widget = self.get_table_by_name(sheet_name)
+        args = (self._tab_index_by_name(sheet_name), table_widget.rowCount(), table_widget.columnCount())
+        cells, old = [], []
+        for row, col in occupied_cells(table_widget):
+            content = self.cell_content(table_widget, row, col, spilled=False)
+            if content:
+                cells.append((sheet_name, row, col))
+                old.append(content)
+        self.delete_sheet(sheet_name)
+        self.main_window.record_edit("delete_sheet", sheet=sheet_name)
+        self.main_window.push_undo(UndoEntry("delete_sheet", sheet_name, args, cells, old))
+        self.main_window.set_dirty(True)
+        # Посилання на видалений аркуш тепер дають #REF!.
+        self.main_window.recalculate_all_cells(rebuild=False)
+
+    def delete_sheet(self, sheet_name: str) -> None:
+        workbook = self.main_window.current_workbook
+        if sheet_name in workbook.sheetnames:
+            workbook.remove(workbook[sheet_name])
+        self.main_window.workbook_calc.remove_sheet(sheet_name)
+        index = self._tab_index_by_name(sheet_name)
+        if index != -1:
+            self.tab_widget.removeTab(index)
+
+    def insert_sheet(self, sheet_name: str, index: int = -1, rows: int | None = None,
+                     cols: int | None = None) -> QTableWidget:
+        """Додає порожній аркуш на позицію index (-1 - в кінець); rows, cols - розмір таблиці."""
+        self.main_window.current_workbook.create_sheet(title=sheet_name, index=index if index >= 0 else None)
+        table_widget = self.add_sheet_tab(sheet_name, index=index)
+        if rows is not None:
+            table_widget.setRowCount(rows)
+        if cols is not None:
+            table_widget.setColumnCount(cols)
+            self.update_column_headers(table_widget)
+        return table_widget
+
+    def apply_undo_entry(self, entry: UndoEntry, undo: bool) -> None:
+        """Скасовує (undo=True) або повторює правку зі стека скасування.
+
+        Структурна операція обертається без переписування посилань, а вміст, який вона знищила
+        чи переписала, повертається дельтою клітинок. У журнал пишуться рівносильні операції.
+        """
+        main_window = self.main_window
+        op, sheet_name = entry.op, entry.sheet
+        if op == "set":
+            main_window.apply_cells(entry.cells, entry.old if undo else entry.new)
+            return
+        if op == "define_name":
+            name, old, new = entry.args
+            main_window.set_name(name, old if undo else new)
+            return
+
+        if op == "rename_sheet":
+            new_name, names = entry.args
+            if undo:
+                # Ключі переписаних формул записано з новою назвою аркуша - повертаємо їх до перейменування.
+                main_window.apply_cells(entry.cells, entry.old)
+                self.rename_sheet(new_name, sheet_name, rewrite=False)
+                main_window.record_edit("rename_sheet", sheet=new_name, new_name=sheet_name, rewrite=False)
+                for name, formula in names:
+                    main_window.workbook_calc.names.define(name, formula)
+                    main_window.record_edit("define_name", name=name, value=formula)
+            else:
+                self.rename_sheet(sheet_name, new_name)
+                main_window.record_edit("rename_sheet", sheet=sheet_name, new_name=new_name)
+        elif op in ("add_sheet", "delete_sheet"):
+            if (op == "add_sheet") != undo:
+                index, rows, cols = (entry.args + (None, None))[:3]
+                self.insert_sheet(sheet_name, index, rows, cols)
+                main_window.record_edit("add_sheet", sheet=sheet_name, index=index, rows=rows, cols=cols)
+                main_window.apply_cells(entry.cells, entry.old)
+            else:
+                self.delete_sheet(sheet_name)
+                main_window.record_edit("delete_sheet", sheet=sheet_name)
+        else:
+            dimension, index = op[-3:], entry.args[0]
+            table_widget = self.get_table_by_name(sheet_name)
+            if table_widget is None:
+                return
+            if op.startswith("insert") != undo:
+                self.insert_line(table_widget, dimension, index)
+                main_window.record_edit("insert_" + dimension, sheet=sheet_name, index=index)
+                # Визначення імен, переписані видаленням, повертаються до формул, що їх читають.
+                for name, formula in entry.args[1] if len(entry.args) > 1 else ():
+                    main_window.workbook_calc.names.define(name, formula)
+                    main_window.record_edit("define_name", name=name, value=formula)
+                main_window.apply_cells(entry.cells, entry.old)
+            elif undo:
+                self.remove_line(table_widget, dimension, index)
+                main_window.record_edit("remove_" + dimension, sheet=sheet_name, index=index)
+            else:
+                self.delete_line(table_widget, dimension, index)
+                main_window.record_edit("delete_" + dimension, sheet=sheet_name, index=index)
+        main_window.recalculate_all_cells()
+
+    def set_cell_value(self, table_widget: QTableWidget, row: int, col: int, value: str) -> None:
+        self.set_cell_values(table_widget, {(row, col): value})
+
+    def set_cell_values(self, table_widget: QTableWidget, values: dict[tuple[int, int], str]) -> None:
+        """Записує {(рядок, стовпець): вміст} без сигналів itemChanged; таблиця розширюється за потреби."""
+        if not values: return
+        max_row = max(row for row, _ in values)
+        max_col = max(col for _, col in values)
+        if max_row >= table_widget.rowCount():
+            table_widget.setRowCount(max_row + 1)
+        if max_col >= table_widget.columnCount():
+            table_widget.setColumnCount(max_col + 1)
+            self.update_column_headers(table_widget)
+        table_widget.blockSignals(True)
+        try:
+            for (row, col), value in values.items():
+                item = table_widget.item(row, col)
+                if item is None:
+                    item = QTableWidgetItem()
+                    table_widget.setItem(row, col, item)
+                item.setData(Qt.ItemDataRole.UserRole, value if value.startswith("=") else None)
+                # Введене в клітинку розливу значення блокує розлив (#SPILL!).
+                item.setData(SPILL_ROLE, None)
+                item.setText(value)
+        finally:
+            table_widget.blockSignals(False)
+
+    @staticmethod
+    def selected_block(table_widget: QTableWidget) -> tuple[int, int, int, int] | None:
+        """(r1, c1, r2, c2) виділеного блоку з поточною клітинкою або лише поточної клітинки."""
+        row, col = table_widget.currentRow(), table_widget.currentColumn()
+        if row < 0 or col < 0:
+            return None
+        for block in table_widget.selectedRanges():
+            if block.topRow() <= row <= block.bottomRow() and block.leftColumn() <= col <= block.rightColumn():
+                return block.topRow(), block.leftColumn(), block.bottomRow(), block.rightColumn()
+        return row, col, row, col
+
+    @staticmethod
+    def cell_content(table_widget: QTableWidget, row: int, col: int, spilled: bool = True) -> str:
+        """Вміст клітинки, як його ввели: формула або текст; spilled=False - клітинки розливу порожні."""
+        item = table_widget.item(row, col)
+        if item is None or (not spilled and item.data(SPILL_ROLE)):
+            return ""
+        return item.data(Qt.ItemDataRole.UserRole) or item.text()
+
+    @staticmethod
+    def is_valid_sheet_name(name) -> bool:
+        """Ім'я, допустиме для аркуша xlsx: непорожній рядок до 31 символу без \\ / * ? : [ ]."""
+        return isinstance(name, str) and 0 < len(name) <= 31 and not _INVALID_SHEET_CHARS.search(name)
+
+    def apply_journal_entries(self, entries: list[dict]) -> None:
+        """Відтворює записи журналу правок поверх відкритої книги.
+
+        Журнал міг бути записаний для іншої версії книги чи пошкоджений: записи з неіснуючими аркушами,
+        недопустимими іменами чи позиціями пропускаються, а не ламають книгу.
+        """
+        workbook = self.main_window.current_workbook
+        for entry in entries:
+            op = entry.get("op")
+            sheet_name = entry.get("sheet")
+            if op == "add_sheet":
+                index = entry.get("index", -1)
+                if (self.is_valid_sheet_name(sheet_name) and sheet_name not in workbook.sheetnames
+                        and isinstance(index, int)):
+                    self.insert_sheet(sheet_name, index, _count(entry.get("rows")), _count(entry.get("cols")))
+                continue
+            if op == "rename_sheet":
+                new_name = entry.get("new_name")
+                if (self._tab_index_by_name(sheet_name) != -1 and self.is_valid_sheet_name(new_name)
+                        and self._tab_index_by_name(new_name) == -1):
+                    self.rename_sheet(sheet_name, new_name, entry.get("rewrite", True))
+                continue
+            if op == "delete_sheet":
+                if self._tab_index_by_name(sheet_name) != -1 and self.tab_widget.count() > 1:
+                    self.delete_sheet(sheet_name)
+                continue
+            if op == "define_name":
+                names = self.main_window.workbook_calc.names
+                try:
+                    if entry.get("value"):
+                        names.define(entry["name"], entry["value"])
+                    else:
+                        names.remove(entry["name"])
+                except (KeyError, TypeError, ValueError):
+                    pass
+                continue
+
+            table_widget = self.get_table_by_name(sheet_name) if isinstance(sheet_name, str) else None
+            if table_widget is None:
+                continue
+            if op == "set":
+                row, col, value = entry.get("row"), entry.get("col"), entry.get("value") or ""
+                if _count(row) is not None and _count(col) is not None and isinstance(value, str):
+                    self.set_cell_value(table_widget, row, col, value)
+                continue
+            index = entry.get("index")
+            limit = table_widget.rowCount() if op.endswith("_row") else table_widget.columnCount()
+            if _count(index) is None or index > limit:
+                continue
+            if op in ("insert_row", "insert_col"):
+                self.insert_line(table_widget, op[-3:], index)
+            elif index == limit:
+                continue
+            elif op in ("delete_row", "delete_col"):
+                self.delete_line(table_widget, op[-3:], index)
+            elif op in ("remove_row", "remove_col"):
+                self.remove_line(table_widget, op[-3:], index)
+
+    def update_formulas_on_delete(self, dimension: str, deleted_index: int, target: QTableWidget | None = None) -> list:
+        """Замінює на #REF! посилання на видалений рядок/стовпець таблиці target (None - будь-якої).
+
+        Повертає переписані формули [(аркуш, рядок, стовпець, стара формула)] - для скасування.
+        """
         calculator = self.main_window.calculator 
         self.main_window.calculator.clear_caches()
+        sheets = calculator.sheets
+        rewrites = []
 
         for tab_idx in range(self.tab_widget.count()):
             table = self.tab_widget.widget(tab_idx)
-            for r in range(table.rowCount()):
-                for c in range(table.columnCount()):
+            sheet_name = self.tab_widget.tabText(tab_idx)
+
+            def targets_deleted(node) -> bool:
+                if target is None:
+                    return True
+                if node.sheet is None:
+                    return table is target
+                entry = sheets.get(node.sheet)
+                return entry is not None and entry.table is target
+
+            for r, c in occupied_cells(table):
+                if table is target or target is None:
                     if dimension == 'row' and r == deleted_index: continue
                     if dimension == 'col' and c == deleted_index: continue
-                        
-                    item = table.item(r, c)
-                    if not item: continue
-                    
-                    formula = item.data(Qt.ItemDataRole.UserRole)
-                    if not formula or not formula.startswith("="):
+
+                item = table.item(r, c)
+                formula = item.data(Qt.ItemDataRole.UserRole)
+                if not formula or not formula.startswith("="):
+                    continue
+
+                try:
+                    ast = calculator._get_ast(formula)
+                    new_ast = self._transform_ast_on_delete(ast, dimension, deleted_index, calculator,
+                                                            targets_deleted)
+
+                    if not isinstance(new_ast, ErrorNode):
+                        new_ast = self._check_bounds_after_delete(new_ast, dimension, table, calculator)
+
+                    if new_ast is ast:
                         continue
-                        
-                    try:
-                        ast = calculator._get_ast(formula)
-                        new_ast = self._transform_ast_on_delete(ast, dimension, deleted_index, calculator)
-                        
-                        if not isinstance(new_ast, ErrorNode):
-                            new_ast = self._check_bounds_after_delete(new_ast, dimension, table, calculator)
-                        
-                        if new_ast is ast:
-                            continue
 
-                        new_formula = "=" + new_ast.to_string()
-                        item.setData(Qt.ItemDataRole.UserRole, new_formula)
-                        
-                        if self.main_window.is_formula_view:
-                            item.setText(new_formula)
-                        else:
-                            item.setText("#REF!")
-                            
-                    except (ParsingError, ReferenceError, CircularReferenceError):
-                        continue 
+                    new_formula = "=" + new_ast.to_string()
+                    rewrites.append((sheet_name, r, c, formula))
+                    # Переписування формули - не правка користувача: без itemChanged і запису в журнал.
+                    table.blockSignals(True)
+                    item.setData(Qt.ItemDataRole.UserRole, new_formula)
+
+                    if self.main_window.is_formula_view:
+                        item.setText(new_formula)
+                    else:
+                        item.setText("#REF!")
+                    table.blockSignals(False)
+
+                except (ParsingError, ReferenceError, CircularReferenceError):
+                    continue
+        return rewrites
+
+    def update_names_on_delete(self, dimension: str, deleted_index: int, target: QTableWidget) -> list:
+        """Замінює на #REF! посилання визначень імен на видалений рядок/стовпець таблиці target.
+
+        Повертає старі визначення [(ім'я, визначення)] - для скасування.
+        """
+        calculator = self.main_window.calculator
+        sheets = calculator.sheets
+
+        def targets_deleted(node) -> bool:
+            entry = sheets.get(node.sheet) if node.sheet is not None else None
+            return entry is not None and entry.table is target
+
+        names = []
+        for name in calculator.names.names():
+            defined = calculator.names.get(name)
+            new_ast = self._transform_ast_on_delete(defined.ast, dimension, deleted_index, calculator,
+                                                    targets_deleted)
+            if not isinstance(new_ast, ErrorNode):
+                new_ast = self._check_bounds_after_delete(new_ast, dimension, target, calculator)
+            formula = new_ast.to_string()
+            if formula == defined.ast.to_string():
+                continue
+            names.append((name, defined.formula))
+            calculator.names.define(name, formula)
+        return names
     
     def _check_bounds_after_delete(self, node: ASTNode, dim: str, table: QTableWidget, calc: FormulaCalculator) -> ASTNode:
         
         if isinstance(node, (NumberNode, ErrorNode)):
             return node
         
+        if isinstance(node, (CellRefNode, RangeRefNode)) and node.sheet is not None:
+            # Посилання на інший аркуш перевіряється за розмірами того аркуша.
+            entry = calc.sheets.get(node.sheet)
+            if entry is None:
+                return node
+            table = entry.table
+
         if isinstance(node, CellRefNode):
             indices = calc.cell_name_to_indices(node.cell_name)
             if not indices: 
@@ -239,10 +667,14 @@ class SheetWorker:
         
         return node 
                         
-    def _transform_ast_on_delete(self, node: ASTNode, dim: str, idx: int, calc: FormulaCalculator) -> ASTNode:
+    def _transform_ast_on_delete(self, node: ASTNode, dim: str, idx: int, calc: FormulaCalculator,
+                                 targets_deleted=None) -> ASTNode:
         
         if isinstance(node, (NumberNode, ErrorNode)):
             return node 
+
+        if isinstance(node, (CellRefNode, RangeRefNode)) and targets_deleted and not targets_deleted(node):
+            return node
         
         if isinstance(node, CellRefNode):
             indices = calc.cell_name_to_indices(node.cell_name)
@@ -271,38 +703,124 @@ class SheetWorker:
             return node
 
         if isinstance(node, UnaryOpNode):
-            return UnaryOpNode(node.op, self._transform_ast_on_delete(node.operand, dim, idx, calc))
+            return UnaryOpNode(node.op, self._transform_ast_on_delete(node.operand, dim, idx, calc, targets_deleted))
 
         if isinstance(node, BinaryOpNode):
             return BinaryOpNode(
-                self._transform_ast_on_delete(node.left, dim, idx, calc),
+                self._transform_ast_on_delete(node.left, dim, idx, calc, targets_deleted),
                 node.op,
-                self._transform_ast_on_delete(node.right, dim, idx, calc)
+                self._transform_ast_on_delete(node.right, dim, idx, calc, targets_deleted)
             )
 
         if isinstance(node, FunctionNode):
-            new_args = [self._transform_ast_on_delete(arg, dim, idx, calc) for arg in node.args]
+            new_args = [self._transform_ast_on_delete(arg, dim, idx, calc, targets_deleted) for arg in node.args]
             return FunctionNode(node.func_name, new_args)
 
         return node 
+
+    def update_formulas_on_rename(self, old_name: str, new_name: str) -> tuple[list, list]:
+        """Переписує посилання 'Старий!A1' на 'Новий!A1' у формулах усіх аркушів і визначеннях імен.
+
+        Повертає для скасування переписані формули [(аркуш, рядок, стовпець, стара формула)]
+        і визначення імен [(ім'я, старе визначення)].
+        """
+        calculator = self.main_window.calculator
+        old_key = old_name.casefold()
+        rewrites, names = [], []
+        for name in calculator.names.names():
+            ast = calculator.names.resolve(name)
+            new_ast = self._rename_sheet_in_ast(ast, old_key, new_name)
+            if new_ast is not ast:
+                names.append((name, calculator.names.get(name).formula))
+                calculator.names.define(name, new_ast.to_string())
+        for tab_idx in range(self.tab_widget.count()):
+            table = self.tab_widget.widget(tab_idx)
+            sheet_name = self.tab_widget.tabText(tab_idx)
+            table.blockSignals(True)
+            for r, c in occupied_cells(table):
+                item = table.item(r, c)
+                formula = item.data(Qt.ItemDataRole.UserRole)
+                if not formula or "!" not in formula:
+                    continue
+                ast = calculator._get_ast(formula)
+                new_ast = self._rename_sheet_in_ast(ast, old_key, new_name)
+                if new_ast is ast:
+                    continue
+                new_formula = "=" + new_ast.to_string()
+                rewrites.append((sheet_name, r, c, formula))
+                item.setData(Qt.ItemDataRole.UserRole, new_formula)
+                if self.main_window.is_formula_view:
+                    item.setText(new_formula)
+            table.blockSignals(False)
+        return rewrites, names
+
+    def _rename_sheet_in_ast(self, node: ASTNode, old_key: str, new_name: str) -> ASTNode:
+        if isinstance(node, CellRefNode):
+            if node.sheet is not None and node.sheet.casefold() == old_key:
+                return CellRefNode(node.cell_name, new_name)
+            return node
+
+        if isinstance(node, RangeRefNode):
+            if node.sheet is not None and node.sheet.casefold() == old_key:
+                return RangeRefNode(node.start_cell, node.end_cell, new_name)
+            return node
+
+        if isinstance(node, UnaryOpNode):
+            operand = self._rename_sheet_in_ast(node.operand, old_key, new_name)
+            return node if operand is node.operand else UnaryOpNode(node.op, operand)
+
+        if isinstance(node, BinaryOpNode):
+            left = self._rename_sheet_in_ast(node.left, old_key, new_name)
+            right = self._rename_sheet_in_ast(node.right, old_key, new_name)
+            if left is node.left and right is node.right:
+                return node
+            return BinaryOpNode(left, node.op, right)
+
+        if isinstance(node, FunctionNode):
+            args = [self._rename_sheet_in_ast(arg, old_key, new_name) for arg in node.args]
+            if all(new is old for new, old in zip(args, node.args)):
+                return node
+            return FunctionNode(node.func_name, args)
+
+        return node
     
     def update_sheet_from_table(self, sheet, table_widget):
         if sheet.max_row > 0:
             sheet.delete_rows(1, sheet.max_row)
         
+        for r, c in occupied_cells(table_widget):
+            value_to_save = self.cell_content(table_widget, r, c, spilled=False)
+            if value_to_save:
+                sheet.cell(row=r + 1, column=c + 1, value=value_to_save)
+
+    def iter_table_rows(self, table_widget: QTableWidget):
+        col_count = table_widget.columnCount()
+        cells = iter(occupied_cells(table_widget))
+        pos = next(cells, None)
         for r in range(table_widget.rowCount()):
-            for c in range(table_widget.columnCount()):
-                item = table_widget.item(r, c)
-                value_to_save = None 
-                if item:
-                    formula = item.data(Qt.ItemDataRole.UserRole)
-                    if formula:
-                        value_to_save = formula
-                    else:
-                        value_to_save = item.text()
-                
-                if value_to_save:
-                    sheet.cell(row=r + 1, column=c + 1, value=value_to_save)
+            row = [""] * col_count
+            while pos is not None and pos[0] == r:
+                row[pos[1]] = table_widget.item(*pos).text()
+                pos = next(cells, None)
+            yield row
+
+    def snapshot_table(self, table_widget: QTableWidget,
+                       strings: StringTable | None = None) -> dict[tuple[int, int], str]:
+        """Непорожні клітинки {(рядок, стовпець): формула або текст} по рядках; розлив не входить.
+        strings - пул, у якому інтернується вміст (Qt повертає новий рядок на кожен виклик text())."""
+        snapshot = {}
+        intern = strings.intern if strings is not None else None
+        for r, c in occupied_cells(table_widget):
+            value = self.cell_content(table_widget, r, c, spilled=False)
+            if value:
+                snapshot[(r, c)] = intern(value) if intern else value
+        return snapshot
+
+    def snapshot_all_tabs(self) -> list[tuple[str, dict[tuple[int, int], str]]]:
+        """Незмінна копія значень усіх аркушів для серіалізації у фоновому потоці."""
+        strings = StringTable()
+        return [(self.tab_widget.tabText(idx), self.snapshot_table(self.tab_widget.widget(idx), strings))
+                for idx in range(self.tab_widget.count())]
 
     def update_workbook_from_all_tabs(self, workbook):
         if not workbook: return
@@ -314,18 +832,26 @@ class SheetWorker:
             table_widget = self.tab_widget.widget(idx)
             self.update_sheet_from_table(sheet, table_widget)
 
-    def populate_all_tabs(self, workbook) -> None:
+    def populate_all_tabs(self, workbook, sheets: list[SheetData] | None = None) -> None:
         self.clear_tabs()
+        self.main_window.workbook_calc.names.update(
+            {name: defined.attr_text for name, defined in workbook.defined_names.items()})
         
         self.tab_widget.blockSignals(True)
         try:
-            if not workbook.sheetnames:
-                self.add_sheet_tab("Sheet1")
-            else:
-                for sheet_name in workbook.sheetnames:
-                    sheet = workbook[sheet_name]
-                    self.add_sheet_tab(sheet_name, sheet)
-            
+            with span("sheet.populate", "ui") as trace:
+                if sheets:
+                    for data in sheets:
+                        self.add_sheet_tab(data.name, data)
+                    trace.set(sheets=len(sheets), cells=sum(len(data.cells) for data in sheets))
+                elif not workbook.sheetnames:
+                    self.add_sheet_tab("Sheet1")
+                else:
+                    for sheet_name in workbook.sheetnames:
+                        sheet = workbook[sheet_name]
+                        self.add_sheet_tab(sheet_name, sheet)
+                    trace.set(sheets=len(workbook.sheetnames))
+
             self.tab_widget.setCurrentIndex(0)
         finally:
             self.tab_widget.blockSignals(False)
@@ -0,0 +1,145 @@
+# Розріджене зберігання клітинок: лише заповнені позиції, згруповані в блоки 64x64 за координатою
+# блоку. Пам'ять і обходи залежать від кількості заповнених клітинок, а не від розміру аркуша
+# (дані в A1 і Z500000 - це два блоки по одній клітинці). Вибірка діапазону переглядає лише блоки,
+# що його перетинають.
+
+TILE_BITS = 6
+_TILE_MASK = (1 << TILE_BITS) - 1
+_MISSING = object()
+# Локальні індекси блоку як спільні об'єкти int: ключ кожної клітинки - посилання на один із них,
+# а не окреме ціле (int понад 256 у CPython - новий об'єкт у 28 байт).
+_LOCAL_KEYS = tuple(range(1 << 2 * TILE_BITS))
+
+
+class SparseGrid:
+    """{(рядок, стовпець): значення} у блоках; інтерфейс словника з ключами-кортежами."""
+    __slots__ = ("_tiles", "_len")
+
+    def __init__(self, items=None):
+        # (рядок >> TILE_BITS, стовпець >> TILE_BITS) -> {локальний індекс у блоці: значення}
+        self._tiles: dict[tuple[int, int], dict[int, object]] = {}
+        self._len = 0
+        if items:
+            for key, value in (items.items() if hasattr(items, "items") else items):
+                self[key] = value
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __contains__(self, key) -> bool:
+        return self.at(*key, default=_MISSING) is not _MISSING
+
+    def __iter__(self):
+        return self.keys()
+
+    def __getitem__(self, key):
+        value = self.at(*key, default=_MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value) -> None:
+        row, col = key
+        tile_key = (row >> TILE_BITS, col >> TILE_BITS)
+        tile = self._tiles.get(tile_key)
+        if tile is None:
+            tile = self._tiles[tile_key] = {}
+        local = _LOCAL_KEYS[(row & _TILE_MASK) << TILE_BITS | (col & _TILE_MASK)]
+        if local not in tile:
+            self._len += 1
+        tile[local] = value
+
+    def __delitem__(self, key) -> None:
+        if self.pop(key, _MISSING) is _MISSING:
+            raise KeyError(key)
+
+    def at(self, row: int, col: int, default=None):
+        """Значення клітинки без створення кортежу ключа (гаряче місце обчислень)."""
+        tile = self._tiles.get((row >> TILE_BITS, col >> TILE_BITS))
+        if tile is None:
+            return default
+        return tile.get((row & _TILE_MASK) << TILE_BITS | (col & _TILE_MASK), default)
+
+    def get(self, key, default=None):
+        return self.at(*key, default=default)
+
+    def pop(self, key, default=None):
+        row, col = key
+        tile_key = (row >> TILE_BITS, col >> TILE_BITS)
+        tile = self._tiles.get(tile_key)
+        if tile is None:
+            return default
+        value = tile.pop((row & _TILE_MASK) << TILE_BITS | (col & _TILE_MASK), _MISSING)
+        if value is _MISSING:
+            return default
+        self._len -= 1
+        if not tile:
+            del self._tiles[tile_key]
+        return value
+
+    def clear(self) -> None:
+        self._tiles.clear()
+        self._len = 0
+
+    @staticmethod
+    def _tile_items(tile_key: tuple[int, int], tile: dict):
+        base_row, base_col = tile_key[0] << TILE_BITS, tile_key[1] << TILE_BITS
+        for local, value in tile.items():
+            yield (base_row | local >> TILE_BITS, base_col | local & _TILE_MASK), value
+
+    def items(self):
+        for tile_key, tile in self._tiles.items():
+            yield from self._tile_items(tile_key, tile)
+
+    def keys(self):
+        for key, _ in self.items():
+            yield key
+
+    def values(self):
+        for tile in self._tiles.values():
+            yield from tile.values()
+
+    def sorted_items(self) -> list:
+        """Елементи по рядках (row-major) - для збереження й експорту."""
+        return sorted(self.items(), key=_item_key)
+
+    def items_in(self, r1: int, c1: int, r2: int, c2: int):
+        """Заповнені клітинки прямокутника r1..r2 x c1..c2 (включно), без обходу порожніх блоків."""
+        tile_r1, tile_r2 = r1 >> TILE_BITS, r2 >> TILE_BITS
+        tile_c1, tile_c2 = c1 >> TILE_BITS, c2 >> TILE_BITS
+        if (tile_r2 - tile_r1 + 1) * (tile_c2 - tile_c1 + 1) > len(self._tiles):
+            tiles = [(key, tile) for key, tile in self._tiles.items()
+                     if tile_r1 <= key[0] <= tile_r2 and tile_c1 <= key[1] <= tile_c2]
+        else:
+            tiles = [((tr, tc), self._tiles[(tr, tc)]) for tr in range(tile_r1, tile_r2 + 1)
+                     for tc in range(tile_c1, tile_c2 + 1) if (tr, tc) in self._tiles]
+        for tile_key, tile in tiles:
+            for (row, col), value in self._tile_items(tile_key, tile):
+                if r1 <= row <= r2 and c1 <= col <= c2:
+                    yield (row, col), value
+
+    def bounds(self) -> tuple[int, int]:
+        """(рядків, стовпців) - розмір, що охоплює всі заповнені клітинки."""
+        rows = cols = 0
+        for (row, col), _ in self.items():
+            if row >= rows: rows = row + 1
+            if col >= cols: cols = col + 1
+        return rows, cols
+
+    def shift(self, axis: int, index: int, delta: int) -> None:
+        """Вставка (delta > 0) чи видалення (delta < 0) рядків (axis=0) або стовпців (axis=1) з позиції index;
+        клітинки видалених рядків/стовпців зникають, наступні зсуваються."""
+        moved = []
+        for key, value in list(self.items()):
+            if key[axis] < index:
+                continue
+            self.pop(key)
+            if delta < 0 and key[axis] < index - delta:
+                continue
+            moved.append(((key[0] + delta, key[1]) if axis == 0 else (key[0], key[1] + delta), value))
+        for key, value in moved:
+            self[key] = value
+
+
+def _item_key(item):
+    return item[0]
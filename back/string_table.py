@@ -0,0 +1,25 @@
+# Пул рядків книги. Вивантаження повторюють ті самі підписи категорій і формули мільйони разів,
+# а кожна клітинка, прочитана з CSV чи перекладена зі спільної формули xlsx, - окремий об'єкт str.
+# Пул залишає один об'єкт на кожен різний рядок; на відміну від sys.intern, він належить книзі
+# і звільняється разом з нею.
+
+
+class StringTable:
+    """{рядок: той самий рядок} - однаковий вміст клітинок посилається на один об'єкт str."""
+    __slots__ = ("_strings",)
+
+    def __init__(self):
+        self._strings: dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def __contains__(self, text: str) -> bool:
+        return text in self._strings
+
+    def intern(self, text: str) -> str:
+        """Спільний об'єкт для text; перший трапився - він і зберігається."""
+        return self._strings.setdefault(text, text)
+
+    def clear(self) -> None:
+        self._strings.clear()
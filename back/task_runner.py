@@ -0,0 +1,140 @@
+import threading
+from typing import Callable
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QEventLoop, Signal, Slot
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class TaskSignals(QObject):
+    _progress = Signal(int, int)
+    _finished = Signal(object)
+    _failed = Signal(str)
+    _cancelled = Signal()
+    _partial = Signal(object)
+
+    def __init__(self, on_finished=None, on_failed=None, on_cancelled=None, on_progress=None, on_done=None,
+                 on_partial=None):
+        # Створюється в GUI-потоці, тому слоти нижче виконуються в ньому ж (queued connection).
+        super().__init__()
+        self.on_finished = on_finished
+        self.on_failed = on_failed
+        self.on_cancelled = on_cancelled
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_partial = on_partial
+        self._partial.connect(self._handle_partial)
+        self._progress.connect(self._handle_progress)
+        self._finished.connect(self._handle_finished)
+        self._failed.connect(self._handle_failed)
+        self._cancelled.connect(self._handle_cancelled)
+
+    @Slot(int, int)
+    def _handle_progress(self, done: int, total: int):
+        if self.on_progress:
+            self.on_progress(done, total)
+
+    @Slot(object)
+    def _handle_partial(self, result):
+        if self.on_partial:
+            self.on_partial(result)
+
+    @Slot(object)
+    def _handle_finished(self, result):
+        if self.on_done:
+            self.on_done()
+        if self.on_finished:
+            self.on_finished(result)
+
+    @Slot(str)
+    def _handle_failed(self, message: str):
+        if self.on_done:
+            self.on_done()
+        if self.on_failed:
+            self.on_failed(message)
+
+    @Slot()
+    def _handle_cancelled(self):
+        if self.on_done:
+            self.on_done()
+        if self.on_cancelled:
+            self.on_cancelled()
+
+
+class BackgroundTask(QRunnable):
+    """Виконує fn(task, *args) у пулі потоків; fn звітує про прогрес через task.report_progress."""
+
+    def __init__(self, fn: Callable, *args, signals: TaskSignals):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.args = args
+        self.signals = signals
+        self._cancel_event = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self) -> None:
+        if self._cancel_event.is_set():
+            raise TaskCancelled()
+
+    def report_progress(self, done: int, total: int) -> None:
+        self.check_cancelled()
+        self.signals._progress.emit(int(done), int(total))
+
+    def emit_partial(self, result) -> None:
+        """Передає проміжний результат у GUI-потік (напр. чергову сторінку даних)."""
+        self.check_cancelled()
+        self.signals._partial.emit(result)
+
+    def run(self):
+        try:
+            result = self.fn(self, *self.args)
+        except TaskCancelled:
+            self.signals._cancelled.emit()
+        except Exception as e:
+            self.signals._failed.emit(str(e))
+        else:
+            self.signals._finished.emit(result)
+
+
+class TaskRunner:
+    def __init__(self, thread_pool: QThreadPool | None = None):
+        self.thread_pool = thread_pool or QThreadPool.globalInstance()
+        self._active: set[BackgroundTask] = set()
+
+    def has_active_tasks(self) -> bool:
+        return bool(self._active)
+
+    def start(self, fn: Callable, *args, on_finished=None, on_failed=None,
+              on_cancelled=None, on_progress=None, on_partial=None) -> BackgroundTask:
+        task = None
+
+        def on_done():
+            self._active.discard(task)
+
+        signals = TaskSignals(on_finished, on_failed, on_cancelled, on_progress, on_done, on_partial)
+        task = BackgroundTask(fn, *args, signals=signals)
+        self._active.add(task)
+        self.thread_pool.start(task)
+        return task
+
+    def wait(self, task: BackgroundTask) -> None:
+        """Чекає завершення задачі, не блокуючи обробку подій GUI."""
+        if task not in self._active:
+            return
+        loop = QEventLoop()
+        previous_done = task.signals.on_done
+
+        def on_done():
+            if previous_done:
+                previous_done()
+            loop.quit()
+
+        task.signals.on_done = on_done
+        loop.exec()
@@ -0,0 +1,102 @@
+from utils.config import UNDO_MAX_BYTES
+
+# Скасування правок без знімків аркушів: запис зберігає лише дельту - старий і новий вміст змінених
+# клітинок, а структурна операція (рядок, стовпець, аркуш, ім'я) - свої параметри і вміст, який вона
+# знищила або переписала (видалений рядок, формули з #REF! після видалення, формули після перейменування
+# аркуша). Скасування 10 тис. клітинок коштує стільки ж, скільки сама вставка.
+
+# Приблизні накладні витрати на клітинку в записі: кортеж ключа і два посилання на рядки.
+_CELL_BYTES = 120
+_ENTRY_BYTES = 200
+
+
+class UndoEntry:
+    """Одна правка. cells - ключі (аркуш, рядок, стовпець), old/new - вміст клітинок до і після (формула
+    або текст, "" - порожня). Для op != "set" args - параметри операції, а cells/old - вміст, який треба
+    повернути після оберненої операції."""
+    __slots__ = ("op", "sheet", "args", "cells", "old", "new", "size")
+
+    def __init__(self, op: str, sheet: str | None = None, args: tuple = (), cells: list | None = None,
+                 old: list[str] | None = None, new: list[str] | None = None):
+        self.op = op
+        self.sheet = sheet
+        self.args = args
+        self.cells = cells or []
+        self.old = old or []
+        self.new = new or []
+        self.size = (_ENTRY_BYTES + len(self.cells) * _CELL_BYTES
+                     + sum(map(len, self.old)) + sum(map(len, self.new)))
+
+
+def merge_entries(first: UndoEntry, second: UndoEntry) -> UndoEntry:
+    """Дві послідовні правки клітинок як одна: старий вміст - з першої, новий - з другої."""
+    delta = {key: [old, new] for key, old, new in zip(first.cells, first.old, first.new)}
+    for key, old, new in zip(second.cells, second.old, second.new):
+        if key in delta:
+            delta[key][1] = new
+        else:
+            delta[key] = [old, new]
+    return UndoEntry("set", first.sheet if first.sheet == second.sheet else None, cells=list(delta),
+                     old=[old for old, _ in delta.values()], new=[new for _, new in delta.values()])
+
+
+class UndoStack:
+    """Стеки скасування і повтору з обмеженням пам'яті.
+
+    Коли записи скасування перевищують max_bytes, найстаріші правки клітинок зливаються в одну
+    (клітинки, змінені кілька разів, зберігаються один раз), а якщо цього не досить - відкидаються.
+    Останню правку можна скасувати завжди, навіть якщо вона сама більша за межу.
+    """
+
+    def __init__(self, max_bytes: int = UNDO_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._undo: list[UndoEntry] = []
+        self._redo: list[UndoEntry] = []
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._undo)
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def clear(self) -> None:
+        self._undo.clear()
+        self._redo.clear()
+        self.size = 0
+
+    def push(self, entry: UndoEntry) -> None:
+        """Нова правка; повтор скасованих після неї вже неможливий."""
+        self._redo.clear()
+        self._push(entry)
+
+    def undo(self) -> UndoEntry | None:
+        """Запис для скасування (переходить у стек повтору) або None."""
+        if not self._undo:
+            return None
+        entry = self._undo.pop()
+        self.size -= entry.size
+        self._redo.append(entry)
+        return entry
+
+    def redo(self) -> UndoEntry | None:
+        if not self._redo:
+            return None
+        entry = self._redo.pop()
+        self._push(entry)
+        return entry
+
+    def _push(self, entry: UndoEntry) -> None:
+        self._undo.append(entry)
+        self.size += entry.size
+        while self.size > self.max_bytes and len(self._undo) > 1:
+            if len(self._undo) > 2 and self._undo[0].op == "set" and self._undo[1].op == "set":
+                first, second = self._undo[0], self._undo[1]
+                merged = merge_entries(first, second)
+                self._undo[0:2] = [merged]
+                self.size += merged.size - first.size - second.size
+            else:
+                self.size -= self._undo.pop(0).size
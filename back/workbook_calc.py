@@ -0,0 +1,380 @@
+import re
+import sys
+
+from back.arrays import ArrayValue, top_left
+from back.calculator import FormulaCalculator, FORMULA_ROLE, SPILL_ROLE
+from back.dependency_graph import DependencyGraph, CellKey
+from back.sheet_model import CellItem, occupied_cells
+from utils.config import ITERATIVE_MAX_ITERATIONS, ITERATIVE_MAX_CHANGE
+from utils.tracing import span
+
+# Обчислення всієї книги: аркуші (QTableWidget або SheetModel - будь-що з rowCount/columnCount/item)
+# реєструються в калькуляторі для посилань 'Аркуш!A1', а граф залежностей охоплює всі аркуші,
+# тож правка на одному аркуші перераховує залежні формули на інших без обходу всіх вкладок.
+# Формули, протягнуті вниз (однакові у відносних посиланнях, як R1C1), що йдуть у порядку обчислення
+# підряд і не посилаються одна на одну, обчислюються блоком через FormulaCalculator.evaluate_block.
+# В ітеративному режимі цикли не дають #CIRCULAR!: кожна компонента сильної зв'язності графа
+# перераховується до збіжності, решта формул - один раз у топологічному порядку.
+# Формула, що повертає масив (=A1:A1000*B1:B1000), розливає його в сусідні клітинки; якщо їх
+# зайнято, результат - #SPILL!. Клітинки розливу позначаються SPILL_ROLE і не зберігаються у файл.
+
+# Скільки разів поспіль перераховувати формули, що читають новий чи змінений розлив.
+_SPILL_PASSES = 10
+
+# Рядки й назви аркушів у лапках, числа і адреси клітинок - у тому ж порядку, що й у лексері.
+_TOKEN_RE = re.compile(r"""'(?:[^']|'')*'!|"(?:[^"]|"")*"|[^\W\d][\w.]*!|\d+(?:\.\d*)?|([A-Z]+)([0-9]+)""", re.I)
+
+
+def _fill_down_form(formula: str, row: int) -> str:
+    """Формула з номерами рядків у посиланнях, заміненими на зсув від row (як R1C1 для рядків)."""
+    return _TOKEN_RE.sub(lambda m: m.group(0) if m.group(2) is None
+                         else f"{m.group(1).upper()}[{int(m.group(2)) - 1 - row}]", formula)
+
+
+def _formula_cells(table) -> list[tuple[int, int]]:
+    if hasattr(table, "formula_cells"):
+        return table.formula_cells()
+    result = []
+    for r, c in occupied_cells(table):
+        formula = table.item(r, c).data(FORMULA_ROLE)
+        if isinstance(formula, str) and formula.startswith("="):
+            result.append((r, c))
+    return result
+
+
+class WorkbookCalc:
+    """Аркуші книги, граф залежностей між ними і кешовані значення формул."""
+
+    def __init__(self, calculator: FormulaCalculator | None = None):
+        self.calculator = calculator or FormulaCalculator()
+        self.sheets = self.calculator.sheets
+        self.names = self.calculator.names
+        self.graph = DependencyGraph(self.sheets.canonical_name, self.names.resolve)
+        self.values: dict[str, dict[tuple[int, int], object]] = {}
+        # Формули у вигляді _fill_down_form (інтерновані: протягнутий блок ділить один рядок).
+        self._forms: dict[CellKey, str] = {}
+        self.iterative = False
+        self.max_iterations = ITERATIVE_MAX_ITERATIONS
+        self.max_change = ITERATIVE_MAX_CHANGE
+        # Конструктор елемента для клітинок розливу (у GUI - QTableWidgetItem).
+        self.item_factory = CellItem
+        # Клітинки, розлив у які з'явився чи зник: формули, що їх читають, перераховуються ще раз.
+        self._spill_changes: set[CellKey] = set()
+        # Якорі, в розлив яких щось ввели після останньої перевірки його клітинок.
+        self._spill_edits: set[CellKey] = set()
+
+    def add_sheet(self, name: str, table, scan: bool = True) -> None:
+        """Реєструє аркуш; scan=False - без пошуку формул (новий порожній аркуш або перед rebuild)."""
+        values = self.values[name] = {}
+        self.sheets.register(name, table, values)
+        if scan:
+            self._add_formulas(name, table)
+
+    def remove_sheet(self, name: str) -> None:
+        self.sheets.unregister(name)
+        self.values.pop(name, None)
+        self.rebuild()
+
+    def rename_sheet(self, old_name: str, new_name: str) -> None:
+        self._clear_spills()
+        self.sheets.rename(old_name, new_name)
+        if old_name in self.values:
+            self.values[new_name] = self.values.pop(old_name)
+        self.rebuild()
+
+    def clear(self) -> None:
+        self.sheets.clear()
+        self.names.clear()
+        self.values.clear()
+        self.graph = DependencyGraph(self.sheets.canonical_name, self.names.resolve)
+        self._forms.clear()
+        self._spill_changes.clear()
+        self._spill_edits.clear()
+        self.calculator._lookup_indexes.clear()
+
+    def rebuild(self) -> None:
+        """Перебудовує граф з формул усіх зареєстрованих аркушів (після структурних змін)."""
+        self._clear_spills()
+        self.graph = DependencyGraph(self.sheets.canonical_name, self.names.resolve)
+        self._forms.clear()
+        self.calculator._lookup_indexes.clear()
+        for name in self.sheets.names():
+            self.values[name].clear()
+            self._add_formulas(name, self.sheets.get(name).table)
+
+    def define_name(self, name: str, formula: str, update_text: bool = True) -> int:
+        """Додає чи змінює ім'я книги і перераховує формули, що його використовують.
+
+        Формули не розбираються заново: граф лише переприв'язує їхні залежності до нового визначення.
+        ValueError - некоректне ім'я чи визначення (див. NameRegistry.define).
+        """
+        self.names.define(name, formula)
+        return self._rebind_name(name, update_text)
+
+    def remove_name(self, name: str, update_text: bool = True) -> int:
+        self.names.remove(name)
+        return self._rebind_name(name, update_text)
+
+    def _rebind_name(self, name: str, update_text: bool) -> int:
+        users = self.graph.name_dependents(name)
+        for key in users:
+            item = self.sheets.get(key[0]).table.item(key[1], key[2])
+            self.graph.set_formula(key, self.calculator._get_ast(item.data(FORMULA_ROLE)))
+        return self.recalculate_formulas(self.graph.affected_by(users), update_text)
+
+    def _add_formulas(self, name: str, table) -> None:
+        for r, c in _formula_cells(table):
+            self._set_formula((name, r, c), table.item(r, c).data(FORMULA_ROLE))
+
+    def _set_formula(self, key: CellKey, formula: str) -> None:
+        self.graph.set_formula(key, self.calculator._get_ast(formula))
+        self._forms[key] = sys.intern(_fill_down_form(formula, key[1]))
+
+    def update_cell(self, sheet: str, row: int, col: int) -> CellKey:
+        """Оновлює граф після зміни клітинки в таблиці без перерахунку; повертає ключ клітинки."""
+        key = (sheet, row, col)
+        table = self.sheets.get(sheet).table
+        self.calculator.invalidate_cell(table, row, col)
+        item = table.item(row, col)
+        formula = item.data(FORMULA_ROLE) if item is not None else None
+        self.values[sheet].pop((row, col), None)
+        self._spill_edits.update(self.graph.spill_anchors_at(key, blocked=False))
+        if isinstance(formula, str) and formula.startswith("="):
+            self._set_formula(key, formula)
+        else:
+            self.graph.remove_formula(key)
+            self._forms.pop(key, None)
+            self._clear_spill(key)
+        return key
+
+    def set_cell(self, sheet: str, row: int, col: int, update_text: bool = True) -> int:
+        """Оновлює граф після зміни клітинки в таблиці і перераховує залежні формули на всіх аркушах."""
+        key = self.update_cell(sheet, row, col)
+        return self.recalculate_formulas(self.graph.affected_by([key]), update_text)
+
+    def set_cells(self, cells, update_text: bool = True) -> int:
+        """Як set_cell для багатьох клітинок (вставка, протягування, накопичені правки): граф оновлюється
+        для кожної, а залежні формули перераховуються один раз, навіть якщо залежать від багатьох із них."""
+        keys = [self.update_cell(sheet, row, col) for sheet, row, col in cells]
+        return self.recalculate_formulas(self.graph.affected_by(keys), update_text)
+
+    def recalculate_formulas(self, formulas, update_text: bool = True) -> int:
+        """Перераховує задані формули в порядку залежностей, цикли - ітеративно, якщо режим увімкнено.
+
+        Розмір розливу відомий лише після обчислення якоря, тож формули, що читають клітинки
+        нового чи зміненого розливу, перераховуються ще раз - уже після нього.
+        """
+        calculated = self._recalculate_pass(formulas, update_text)
+        for _ in range(_SPILL_PASSES):
+            if not self._spill_changes:
+                break
+            changed, self._spill_changes = self._spill_changes, set()
+            calculated += self._recalculate_pass(self.graph.affected_by(changed, spills=False), update_text)
+        self._spill_changes.clear()
+        return calculated
+
+    def _recalculate_pass(self, formulas, update_text: bool) -> int:
+        if not self.iterative:
+            return self.recalculate(self.graph.evaluation_order(formulas), update_text)
+        calculated = 0
+        for keys, cyclic in self.graph.evaluation_plan(formulas):
+            calculated += self.iterate(keys, update_text) if cyclic else self.recalculate(keys, update_text)
+        return calculated
+
+    def iterate(self, component: list[CellKey], update_text: bool = True) -> int:
+        """Перераховує формули циклу по колу, доки зміна всіх значень не стане меншою за max_change
+        або не вичерпається max_iterations. Початкові значення - попередні результати (нечислові - 0).
+        Повертає кількість формул циклу; кількість ітерацій записується в трасування.
+        """
+        cells = []
+        for key in component:
+            sheet, r, c = key
+            entry = self.sheets.get(sheet)
+            item = entry.table.item(r, c)
+            formula = item.data(FORMULA_ROLE) if item is not None else None
+            if not formula:
+                continue
+            value = entry.values.get((r, c))
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                entry.values[(r, c)] = 0.0
+            cells.append((key, entry, item, formula))
+
+        with span("calc.iterate", "calc", formulas=len(cells)) as trace:
+            iterations = 0
+            change = 0.0
+            while iterations < self.max_iterations:
+                iterations += 1
+                change = 0.0
+                for key, entry, item, formula in cells:
+                    cell = (key[1], key[2])
+                    old = entry.values[cell]
+                    new = top_left(self.calculator.evaluate(formula, entry.table, entry.values, cell=key))
+                    entry.values[cell] = new
+                    self.calculator.invalidate_cell(entry.table, *cell)
+                    if isinstance(new, (int, float)) and isinstance(old, (int, float)):
+                        change = max(change, abs(new - old))
+                    elif new != old:
+                        change = float("inf")
+                if change < self.max_change:
+                    break
+            trace.set(iterations=iterations, converged=change < self.max_change)
+
+        if update_text:
+            for key, entry, item, formula in cells:
+                text = str(entry.values[(key[1], key[2])])
+                if item.text() != text:
+                    item.setText(text)
+        return len(cells)
+
+    def recalculate(self, order: list[CellKey], update_text: bool = True) -> int:
+        """Обчислює формули у вже впорядкованому списку; update_text=False - лише значення (режим формул)."""
+        for sheet, r, c in order:
+            self.values[sheet].pop((r, c), None)
+        calculated = 0
+        start = 0
+        while start < len(order):
+            end = self._block_end(order, start) if self.calculator.vectorize else start + 1
+            sheet, row, col = order[start]
+            entry = self.sheets.get(sheet)
+            results = None
+            if end - start > 1:
+                formula = entry.table.item(row, col).data(FORMULA_ROLE)
+                results = self.calculator.evaluate_block(formula, entry.table, entry.values, end - start)
+            for offset in range(end - start):
+                key = order[start + offset]
+                r, c = key[1], key[2]
+                item = entry.table.item(r, c)
+                formula = item.data(FORMULA_ROLE) if item is not None else None
+                if not formula:
+                    continue
+                if results is not None:
+                    value = results[offset]
+                else:
+                    value = self.calculator.evaluate(formula, entry.table, entry.values, cell=key)
+                if isinstance(value, ArrayValue) or self.graph.spill_extent(key) is not None:
+                    value = self._spill(key, entry, value)
+                entry.values[(r, c)] = value
+                self.calculator.invalidate_cell(entry.table, r, c)
+                calculated += 1
+                if update_text:
+                    text = str(value)
+                    if item.text() != text:
+                        item.setText(text)
+            start = end
+        return calculated
+
+    def _spill(self, anchor: CellKey, entry, value):
+        """Розливає масив з клітинки anchor; повертає значення самої клітинки (лівий верхній елемент)."""
+        extent = self.graph.spill_extent(anchor)
+        if not isinstance(value, ArrayValue) or len(value) == 1:
+            self._clear_spill(anchor)
+            return top_left(value)
+        sheet, row, col = anchor
+        rows, cols = value.rows, value.cols
+        # Клітинки незмінного розливу перевіряються лише після правок у ньому.
+        if (extent != (rows, cols, False) or anchor in self._spill_edits) \
+                and self._spill_blocked(anchor, entry.table, rows, cols):
+            self._spill_edits.discard(anchor)
+            self._clear_spill(anchor)
+            self.graph.set_spill(anchor, rows, cols, blocked=True)
+            return "#SPILL!"
+        if extent is None or extent != (rows, cols, False):
+            self._clear_spill(anchor, keep=(rows, cols))
+            self.graph.set_spill(anchor, rows, cols)
+            self._spill_changes.update((sheet, r, c) for r in range(row, row + rows)
+                                       for c in range(col, col + cols) if (r, c) != (row, col))
+        self._spill_edits.discard(anchor)
+
+        table, values, factory = entry.table, entry.values, self.item_factory
+        self.calculator.invalidate_range(table, row, col, row + rows - 1, col + cols - 1)
+        for i in range(rows):
+            for j in range(cols):
+                if i == 0 and j == 0:
+                    continue
+                r, c = row + i, col + j
+                element = value[i * cols + j]
+                values[(r, c)] = element
+                text = str(element)
+                item = table.item(r, c)
+                if item is None:
+                    item = factory(text)
+                    item.setData(SPILL_ROLE, True)
+                    table.setItem(r, c, item)
+                    continue
+                if not item.data(SPILL_ROLE):
+                    item.setData(SPILL_ROLE, True)
+                if item.text() != text:
+                    item.setText(text)
+        return value[0]
+
+    def _spill_blocked(self, anchor: CellKey, table, rows: int, cols: int) -> bool:
+        """Розлив неможливий: виходить за межі таблиці або клітинки зайняті даними, формулами чи іншим розливом."""
+        sheet, row, col = anchor
+        if row + rows > table.rowCount() or col + cols > table.columnCount():
+            return True
+        graph = self.graph
+        if graph.spill_overlaps(anchor, rows, cols):
+            return True
+        for r in range(row, row + rows):
+            for c in range(col, col + cols):
+                if r == row and c == col:
+                    continue
+                if (sheet, r, c) in graph:
+                    return True
+                item = table.item(r, c)
+                if item is not None and item.text() and not item.data(SPILL_ROLE):
+                    return True
+        return False
+
+    def _clear_spill(self, anchor: CellKey, keep: tuple[int, int] | None = None) -> None:
+        """Прибирає розлив anchor з таблиці і графа; keep=(рядки, стовпці) - клітинки, що лишаються."""
+        extent = self.graph.clear_spill(anchor)
+        entry = self.sheets.get(anchor[0])
+        if extent is None or extent[2] or entry is None:
+            return
+        sheet, row, col = anchor
+        keep_rows, keep_cols = keep or (1, 1)
+        for r in range(row, row + extent[0]):
+            for c in range(col, col + extent[1]):
+                if r - row < keep_rows and c - col < keep_cols:
+                    continue
+                item = entry.table.item(r, c)
+                if item is not None and item.data(SPILL_ROLE):
+                    entry.table.takeItem(r, c)
+                entry.values.pop((r, c), None)
+                self.calculator.invalidate_cell(entry.table, r, c)
+                key = (sheet, r, c)
+                self._spill_changes.add(key)
+                # Звільнена клітинка може розблокувати інший розлив.
+                self._spill_changes.update(self.graph.spill_anchors_at(key))
+
+    def _clear_spills(self) -> None:
+        for anchor in self.graph.spills():
+            self._clear_spill(anchor)
+        self._spill_changes.clear()
+
+    def _block_end(self, order: list[CellKey], start: int) -> int:
+        """Кінець (не включно) блоку протягнутих формул, що починається з order[start]."""
+        sheet, row, col = order[start]
+        if start + 1 == len(order) or order[start + 1] != (sheet, row + 1, col):
+            return start + 1
+        # Зсуви рядків для посилань на власний стовпець: блок не може читати власні клітинки.
+        cells, ranges = self.graph.references(order[start])
+        own_rows = [(r - row, r - row) for s, r, c in cells if c == col and s == sheet]
+        own_rows += [(r1 - row, r2 - row) for s, r1, c1, r2, c2 in ranges if c1 <= col <= c2 and s == sheet]
+        end = start + 1
+        while end < len(order) and order[end] == (sheet, row + end - start, col):
+            span = end - start
+            if any(dr1 <= span and dr2 >= -span for dr1, dr2 in own_rows):
+                break
+            form = self._forms.get(order[start])
+            if form is None or self._forms.get(order[end]) is not form:
+                break
+            end += 1
+        return end
+
+    def recalculate_all(self, update_text: bool = True) -> int:
+        return self.recalculate_formulas(self.graph.formulas(), update_text)
+
+    def value(self, sheet: str, row: int, col: int):
+        return self.values.get(sheet, {}).get((row, col))
@@ -0,0 +1,223 @@
+import io
+import math
+import re
+import zipfile
+from typing import Callable, Iterable
+from xml.sax.saxutils import escape
+
+from utils.cell_names import get_column_letter, column_index_from_string
+
+# Швидкий запис даних аркушів у xlsx зі спільною таблицею рядків. openpyxl пише кожен рядок у клітинку
+# як inlineStr (підпис, повторений мільйон разів, - мільйон копій у файлі) і будує XML поелементно.
+# Тут openpyxl зберігає лише каркас книги (аркуші з форматуванням, стилі, імена), а <sheetData> кожного
+# аркуша і xl/sharedStrings.xml складаються рядками: однаковий текст записується один раз,
+# клітинки посилаються на нього індексом. Стилі клітинок і атрибути рядків (висота, приховування)
+# беруться з <sheetData> каркаса. strip_values робить такий каркас з відкритого файлу без розбору
+# його даних. Модуль не імпортує Qt.
+
+SHARED_STRINGS_PART = "xl/sharedStrings.xml"
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_EMPTY_SHARED_STRINGS = f'<sst xmlns="{_MAIN_NS}" count="0" uniqueCount="0" />'.encode()
+_SHARED_STRINGS_TYPE = '<Override PartName="/xl/sharedStrings.xml" ' \
+                       'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml" />'
+_SHARED_STRINGS_REL = '<Relationship Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/' \
+                      'sharedStrings" Target="sharedStrings.xml" Id="rIdSharedStrings" />'
+_SHEET_DATA_RE = re.compile(r"<sheetData\s*/>|<sheetData>.*?</sheetData>", re.S)
+_DIMENSION_RE = re.compile(r'<dimension ref="[^"]*"\s*/>')
+_TAG_RE = re.compile(r"<(row|c)\s([^>]*?)/?>")
+_ATTR_RE = re.compile(r'([\w:]+)="([^"]*)"')
+_REF_RE = re.compile(r"([A-Z]+)(\d+)")
+# Ті самі обмеження, що й у openpyxl (Cell.check_string): такі значення пише openpyxl.
+_ILLEGAL_CHARACTERS_RE = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+_MAX_STRING = 32767
+_ERROR_CODES = {"#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A"}
+
+
+class UnsupportedValue(ValueError):
+    """Значення, яке цей запис не підтримує (дата, недопустимий символ...); книгу пише openpyxl."""
+
+
+class SharedStrings:
+    """Таблиця спільних рядків: текст -> індекс у xl/sharedStrings.xml."""
+    __slots__ = ("_index", "count")
+
+    def __init__(self):
+        self._index: dict[str, int] = {}
+        self.count = 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def add(self, text: str) -> int:
+        self.count += 1
+        idx = self._index.get(text)
+        if idx is None:
+            idx = self._index[text] = len(self._index)
+        return idx
+
+    def to_xml(self) -> bytes:
+        parts = [f'<sst xmlns="{_MAIN_NS}" count="{self.count}" uniqueCount="{len(self._index)}">']
+        for text in self._index:
+            space = ' xml:space="preserve"' if text != text.strip() else ""
+            parts.append(f"<si><t{space}>{escape(text)}</t></si>")
+        parts.append("</sst>")
+        return "".join(parts).encode("utf-8")
+
+
+def _cell_xml(ref: str, value, strings: SharedStrings, style: str | None = None) -> str:
+    attrs = f'r="{ref}" s="{style}"' if style else f'r="{ref}"'
+    if value is None:
+        return f'<c {attrs} />'
+    if isinstance(value, bool):
+        return f'<c {attrs} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and not math.isfinite(value):
+            raise UnsupportedValue(value)
+        return f'<c {attrs} t="n"><v>{value!r}</v></c>'
+    if not isinstance(value, str) or len(value) > _MAX_STRING or _ILLEGAL_CHARACTERS_RE.search(value):
+        raise UnsupportedValue(value)
+    if len(value) > 1 and value.startswith("="):
+        return f'<c {attrs}><f>{escape(value[1:])}</f><v /></c>'
+    if value in _ERROR_CODES:
+        return f'<c {attrs} t="e"><v>{value}</v></c>'
+    return f'<c {attrs} t="s"><v>{strings.add(value)}</v></c>'
+
+
+def template_layout(sheet_data: str) -> tuple[dict[int, str], dict[tuple[int, int], str]]:
+    """Атрибути рядків {рядок: ' ht="30" customHeight="1"'} і стилі клітинок {(рядок, стовпець): s}
+    з <sheetData> каркаса, від 0. Вміст клітинок каркаса відкидається."""
+    rows: dict[int, str] = {}
+    styles: dict[tuple[int, int], str] = {}
+    for tag, attrs in _TAG_RE.findall(sheet_data):
+        attrs = dict(_ATTR_RE.findall(attrs))
+        if tag == "row":
+            r = int(attrs.pop("r")) - 1
+            attrs.pop("spans", None)
+            if attrs:
+                rows[r] = "".join(f' {name}="{value}"' for name, value in attrs.items())
+        elif attrs.get("s", "0") != "0":
+            match = _REF_RE.fullmatch(attrs["r"])
+            styles[(int(match.group(2)) - 1, column_index_from_string(match.group(1)) - 1)] = attrs["s"]
+    return rows, styles
+
+
+def _with_styles(cells: Iterable[tuple[int, int, object]], styles: dict[tuple[int, int], str],
+                 on_cell: Callable[[], None] | None):
+    """Зливає клітинки даних (по рядках) зі стилізованими клітинками каркаса: (рядок, стовпець, значення, s)."""
+    styled = iter(sorted(styles.items()))
+    pending = next(styled, None)
+    for r, c, value in cells:
+        while pending is not None and pending[0] < (r, c):
+            yield pending[0][0], pending[0][1], None, pending[1]
+            pending = next(styled, None)
+        style = None
+        if pending is not None and pending[0] == (r, c):
+            style = pending[1]
+            pending = next(styled, None)
+        yield r, c, value, style
+        if on_cell:
+            on_cell()
+    while pending is not None:
+        yield pending[0][0], pending[0][1], None, pending[1]
+        pending = next(styled, None)
+
+
+def sheet_data_xml(cells: Iterable[tuple[int, int, object]], strings: SharedStrings,
+                   on_cell: Callable[[], None] | None = None,
+                   layout: tuple[dict[int, str], dict[tuple[int, int], str]] | None = None) -> tuple[str, str | None]:
+    """(<sheetData>, діапазон для <dimension> або None) з клітинок (рядок, стовпець, значення) по рядках;
+    layout - атрибути рядків і стилі клітинок каркаса (template_layout)."""
+    row_attrs, styles = layout or ({}, {})
+    styled_rows = sorted(row_attrs)
+    next_styled = 0
+    letters: dict[int, str] = {}
+    parts = ["<sheetData>"]
+    current_row = -1
+    max_row = max_col = -1
+    for r, c, value, style in _with_styles(cells, styles, on_cell):
+        if r != current_row:
+            if current_row >= 0:
+                parts.append("</row>")
+            # Порожні рядки з власною висотою чи стилем між заповненими.
+            while next_styled < len(styled_rows) and styled_rows[next_styled] < r:
+                parts.append(f'<row r="{styled_rows[next_styled] + 1}"{row_attrs[styled_rows[next_styled]]} />')
+                next_styled += 1
+            if next_styled < len(styled_rows) and styled_rows[next_styled] == r:
+                next_styled += 1
+            parts.append(f'<row r="{r + 1}"{row_attrs.get(r, "")}>')
+            current_row = r
+        letter = letters.get(c)
+        if letter is None:
+            letter = letters[c] = get_column_letter(c + 1)
+        parts.append(_cell_xml(f"{letter}{r + 1}", value, strings, style))
+        if r > max_row: max_row = r
+        if c > max_col: max_col = c
+    if current_row >= 0:
+        parts.append("</row>")
+    for r in styled_rows[next_styled:]:
+        parts.append(f'<row r="{r + 1}"{row_attrs[r]} />')
+    parts.append("</sheetData>")
+    dimension = f"A1:{get_column_letter(max_col + 1)}{max_row + 1}" if max_row >= 0 else None
+    return "".join(parts), dimension
+
+
+def write_with_shared_strings(skeleton: str | io.BytesIO, target: str | io.BytesIO,
+                              sheets: list[Iterable[tuple[int, int, object]]],
+                              on_cell: Callable[[], None] | None = None) -> None:
+    """Копіює книгу-каркас, збережену openpyxl, вписуючи дані sheets[i] у xl/worksheets/sheet{i + 1}.xml
+    (openpyxl нумерує аркуші в порядку книги) і таблицю рядків. Форматування каркаса зберігається.
+
+    UnsupportedValue виникає до запису в target.
+    """
+    strings = SharedStrings()
+    sheet_parts = {}
+    with zipfile.ZipFile(skeleton) as src:
+        names = set(src.namelist())
+        for idx, cells in enumerate(sheets, start=1):
+            part = f"xl/worksheets/sheet{idx}.xml"
+            xml = src.read(part).decode("utf-8")
+            match = _SHEET_DATA_RE.search(xml)
+            layout = template_layout(match.group(0)) if match else None
+            sheet_parts[part] = (xml, sheet_data_xml(cells, strings, on_cell, layout))
+
+        with zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as dst:
+            for info in src.infolist():
+                data = src.read(info.filename)
+                if info.filename in sheet_parts:
+                    xml, (sheet_data, dimension) = sheet_parts[info.filename]
+                    xml = _SHEET_DATA_RE.sub(lambda _: sheet_data, xml, count=1)
+                    if dimension:
+                        xml = _DIMENSION_RE.sub(f'<dimension ref="{dimension}" />', xml, count=1)
+                    data = xml.encode("utf-8")
+                elif SHARED_STRINGS_PART not in names:
+                    if info.filename == "[Content_Types].xml":
+                        data = data.replace(b"</Types>", _SHARED_STRINGS_TYPE.encode() + b"</Types>")
+                    elif info.filename == "xl/_rels/workbook.xml.rels":
+                        data = data.replace(b"</Relationships>", _SHARED_STRINGS_REL.encode() + b"</Relationships>")
+                if info.filename == SHARED_STRINGS_PART:
+                    data = strings.to_xml()
+                dst.writestr(info, data)
+            if SHARED_STRINGS_PART not in names:
+                dst.writestr(SHARED_STRINGS_PART, strings.to_xml())
+
+
+def _is_worksheet_part(name: str) -> bool:
+    return name.startswith("xl/worksheets/") and name.endswith(".xml") and name.count("/") == 2
+
+
+def strip_values(source: str | io.BytesIO, target: str | io.BytesIO) -> None:
+    """Копія xlsx без вмісту клітинок: лишаються стилі клітинок, атрибути рядків і все поза <sheetData>
+    (ширини, об'єднання, закріплення, властивості аркушів, стилі, імена). Таку копію openpyxl
+    завантажує швидко й без даних у пам'яті - це каркас для збереження відкритої книги."""
+    with zipfile.ZipFile(source) as src, zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            data = src.read(info.filename)
+            if _is_worksheet_part(info.filename):
+                xml = data.decode("utf-8")
+                match = _SHEET_DATA_RE.search(xml)
+                if match:
+                    sheet_data, _ = sheet_data_xml((), SharedStrings(), layout=template_layout(match.group(0)))
+                    data = (xml[:match.start()] + sheet_data + xml[match.end():]).encode("utf-8")
+            elif info.filename == SHARED_STRINGS_PART:
+                data = _EMPTY_SHARED_STRINGS
+            dst.writestr(info, data)
@@ -0,0 +1,176 @@
+"""Бенчмарки обчислень і файлових операцій на синтетичних книгах.
+
+    python benchmarks/bench_calc.py --sizes 10k,100k --output results.json
+    python benchmarks/bench_calc.py --baseline results.json --threshold 0.2
+
+Етапи без GUI: load (розбір xlsx), parse (формули), first_calc (перший повний перерахунок),
+edit_recalc (інкрементний перерахунок після зміни однієї клітинки).
+Етапи GUI (offscreen Qt, можна вимкнути --no-gui): populate, delete_row, save.
+Із --baseline завершується з кодом 1, якщо якийсь етап повільніший за базовий більше ніж на поріг.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generators import SCENARIOS, SIZES, write_xlsx, count_cells
+from back.parser import Parser
+from back.sheet_loader import load_sheets
+from back.calc_service import CalcWorkbook
+from utils.cell_names import get_column_letter
+
+# Різниця, меншу за цю (с), не вважаємо регресією: це шум вимірювання.
+MIN_REGRESSION_DELTA = 0.005
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def _first_value_ref(sheets) -> str:
+    for data in sheets:
+        for (r, c), value in sorted(data.cells.items()):
+            if not (isinstance(value, str) and value.startswith("=")):
+                return f"'{data.name}'!{get_column_letter(c + 1)}{r + 1}"
+    raise ValueError("У книзі немає клітинок зі значеннями")
+
+
+def run_headless(path: str, repeat: int) -> tuple[dict, list]:
+    stages = {}
+    stages["load"], sheets = _timed(load_sheets, path)
+
+    formulas = {f for data in sheets for f in data.formulas}
+    stages["parse"], _ = _timed(lambda: [Parser().parse(f) for f in formulas])
+
+    stages["first_calc"], workbook = _timed(CalcWorkbook, path, sheets)
+
+    ref = _first_value_ref(sheets)
+    timings = []
+    for idx in range(repeat):
+        elapsed, _ = _timed(workbook.set_cells, {ref: 1000 + idx})
+        timings.append(elapsed)
+    stages["edit_recalc"] = statistics.median(timings)
+    return stages, sheets
+
+
+def run_gui(window, sheets, save_path: str) -> dict:
+    stages = {}
+    file_manager = window.file_manager
+    sheet_manager = window.sheet_manager
+    workbook = file_manager.workbook_from_sheets(sheets)
+    stages["populate"], _ = _timed(sheet_manager.populate_all_tabs, workbook, sheets)
+
+    table = sheet_manager.get_current_table()
+    stages["delete_row"], _ = _timed(sheet_manager.delete_line, table, "row", 0)
+
+    def save():
+        file_manager.write_snapshot(sheet_manager.snapshot_all_tabs(), save_path)
+
+    stages["save"], _ = _timed(save)
+    sheet_manager.clear_tabs()
+    return stages
+
+
+def run_suite(scenarios: list[str], sizes: list[str], repeat: int = 5, gui: bool = True,
+              log=print) -> dict:
+    window = None
+    if gui:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PySide6.QtWidgets import QApplication
+        from ui.main_window import MainWindow
+        app = QApplication.instance() or QApplication([])
+        window = MainWindow()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            for scenario in scenarios:
+                case = f"{scenario}/{size}"
+                sheets_rows = SCENARIOS[scenario](SIZES[size])
+                cells, formulas = count_cells(sheets_rows)
+                path = os.path.join(tmp_dir, f"{scenario}_{size}.xlsx")
+                write_xlsx(sheets_rows, path)
+                del sheets_rows
+
+                stages, sheets = run_headless(path, repeat)
+                if window is not None:
+                    stages.update(run_gui(window, sheets, os.path.join(tmp_dir, "saved.xlsx")))
+                results[case] = {"cells": cells, "formulas": formulas, "bytes": os.path.getsize(path),
+                                 "stages": stages}
+                log(f"{case:22s} " + "  ".join(f"{name} {value * 1000:9.1f} мс" for name, value in stages.items()))
+    if window is not None:
+        window.set_dirty(False)
+        window.close()
+    return {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                 "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": repeat},
+        "results": results,
+    }
+
+
+def find_regressions(current: dict, baseline: dict, threshold: float,
+                     min_delta: float = MIN_REGRESSION_DELTA) -> list[dict]:
+    """Етапи, що сповільнилися більш ніж на threshold (частка) відносно базових результатів."""
+    regressions = []
+    for case, result in current["results"].items():
+        base = baseline.get("results", {}).get(case)
+        if not base:
+            continue
+        for stage, value in result["stages"].items():
+            base_value = base["stages"].get(stage)
+            if base_value is None:
+                continue
+            if value > base_value * (1 + threshold) and value - base_value > min_delta:
+                regressions.append({"case": case, "stage": stage, "baseline_s": base_value, "current_s": value,
+                                    "ratio": value / base_value if base_value else float("inf")})
+    return regressions
+
+
+def _parse_list(value: str, allowed) -> list[str]:
+    items = [item.strip().lower() for item in value.split(",") if item.strip()]
+    unknown = [item for item in items if item not in allowed]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"невідомі значення: {', '.join(unknown)}")
+    return items
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10k", type=lambda v: _parse_list(v, SIZES),
+                        help=f"розміри через кому: {', '.join(SIZES)}")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), type=lambda v: _parse_list(v, SCENARIOS),
+                        help=f"сценарії через кому: {', '.join(SCENARIOS)}")
+    parser.add_argument("--repeat", type=int, default=5, help="повторів інкрементного перерахунку (медіана)")
+    parser.add_argument("--no-gui", action="store_true", help="пропустити етапи, що потребують Qt")
+    parser.add_argument("--output", help="зберегти результати у JSON")
+    parser.add_argument("--baseline", help="JSON з базовими результатами для перевірки регресій")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустиме сповільнення (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.scenarios, args.sizes, args.repeat, gui=not args.no_gui)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = find_regressions(report, baseline, args.threshold)
+    for item in regressions:
+        print(f"РЕГРЕСІЯ {item['case']} {item['stage']}: {item['baseline_s'] * 1000:.1f} -> "
+              f"{item['current_s'] * 1000:.1f} мс (x{item['ratio']:.2f})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Бенчмарк холодного запуску: час від старту процесу до першого відмалювання головного вікна.
+
+    python benchmarks/bench_startup.py --runs 5 --output startup.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+_CHILD = r"""
+import sys, json, time
+launched = float(sys.argv[1])
+marks = {"interpreter": time.time() - launched}
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QObject, QEvent, QTimer
+app = QApplication(sys.argv[:1])
+from ui.main_window import MainWindow
+marks["imports"] = time.time() - launched
+window = MainWindow()
+marks["window_created"] = time.time() - launched
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint and "first_paint" not in marks:
+            marks["first_paint"] = time.time() - launched
+            QTimer.singleShot(0, app.quit)
+        return False
+
+paint_filter = FirstPaint()
+window.installEventFilter(paint_filter)
+window.show()
+QTimer.singleShot(0, window.restore_google_session)
+QTimer.singleShot(10000, app.quit)
+app.exec()
+print(json.dumps(marks))
+"""
+
+
+def measure_once() -> dict:
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    launched = time.time()
+    output = subprocess.run([sys.executable, "-c", _CHILD, str(launched)], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="файл для збереження результатів у JSON")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    summary = {key: statistics.median(run[key] for run in runs if key in run) for key in runs[0]}
+    report = {"runs": runs, "median": summary}
+    for key, value in summary.items():
+        print(f"{key:15s} {value * 1000:8.1f} ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Генератори синтетичних книг для бенчмарків.
+
+Кожен генератор повертає список аркушів [(назва, рядки)], де рядки - списки значень або формул,
+із приблизно заданою кількістю непорожніх клітинок.
+"""
+import random
+
+from utils.cell_names import get_column_letter
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def chain(cells: int) -> list[tuple[str, list[list]]]:
+    """Довгий ланцюжок залежностей: B - наростаючий підсумок стовпця A."""
+    rows = []
+    for r in range(1, cells // 2 + 1):
+        rows.append([r, "=A1" if r == 1 else f"=B{r - 1}+A{r}"])
+    return [("Chain", rows)]
+
+
+def fan_in(cells: int) -> list[tuple[str, list[list]]]:
+    """Широкі діапазони: 100 формул, кожна підсумовує весь стовпець значень."""
+    formulas = min(100, max(1, cells // 100))
+    values = cells - formulas
+    rows = [[r] for r in range(1, values + 1)]
+    for r in range(formulas):
+        rows[r].append(f"=SUM(A1:A{values})+{r}")
+    return [("FanIn", rows)]
+
+
+def fill_down(cells: int) -> list[tuple[str, list[list]]]:
+    """Формули, протягнуті вниз (аналог спільних формул Excel)."""
+    rows = []
+    for r in range(1, cells // 4 + 1):
+        rows.append([r, r % 7, f"=A{r}*B{r}", f"=C{r}+A{r}"])
+    return [("FillDown", rows)]
+
+
+def dense(cells: int) -> list[tuple[str, list[list]]]:
+    """Щільна таблиця: 8 стовпців значень і 2 стовпці формул у кожному рядку."""
+    rnd = random.Random(1)
+    rows = []
+    for r in range(1, cells // 10 + 1):
+        row = [rnd.randint(0, 1000) for _ in range(8)]
+        row.append(f"=SUM(A{r}:H{r})")
+        row.append(f"=I{r}/(A{r}+1)")
+        rows.append(row)
+    return [("Dense", rows)]
+
+
+def sparse(cells: int) -> list[tuple[str, list[list]]]:
+    """Розріджена таблиця: близько 5% заповнених клітинок у широкій сітці."""
+    rnd = random.Random(2)
+    cols = 40
+    total_rows = max(1, cells * 20 // cols)
+    rows = [[None] * cols for _ in range(total_rows)]
+    filled = 0
+    while filled < cells:
+        r, c = rnd.randrange(total_rows), rnd.randrange(cols)
+        if rows[r][c] is not None:
+            continue
+        if c > 0 and rnd.random() < 0.2:
+            rows[r][c] = f"={get_column_letter(c)}{r + 1}+1"
+        else:
+            rows[r][c] = rnd.randint(0, 100)
+        filled += 1
+    return [("Sparse", rows)]
+
+
+def many_sheets(cells: int, sheet_count: int = 50) -> list[tuple[str, list[list]]]:
+    """Багато невеликих аркушів з однаковою структурою."""
+    per_sheet = max(4, cells // sheet_count)
+    return [(f"Sheet{idx + 1}", fill_down(per_sheet)[0][1]) for idx in range(sheet_count)]
+
+
+SCENARIOS = {
+    "chain": chain,
+    "fan_in": fan_in,
+    "fill_down": fill_down,
+    "dense": dense,
+    "sparse": sparse,
+    "many_sheets": many_sheets,
+}
+
+
+def write_xlsx(sheets: list[tuple[str, list[list]]], path: str) -> None:
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    for name, rows in sheets:
+        sheet = workbook.create_sheet(title=name)
+        for row in rows:
+            sheet.append(row)
+    workbook.save(path)
+
+
+def count_cells(sheets: list[tuple[str, list[list]]]) -> tuple[int, int]:
+    """(непорожні клітинки, формули)."""
+    cells = formulas = 0
+    for _, rows in sheets:
+        for row in rows:
+            for value in row:
+                if value is None:
+                    continue
+                cells += 1
+                if isinstance(value, str) and value.startswith("="):
+                    formulas += 1
+    return cells, formulas
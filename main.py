@@ -1,9 +1,30 @@
 import sys
-from PySide6.QtWidgets import QApplication
-from ui.main_window import MainWindow
 
-if __name__ == "__main__":
+
+def run_gui() -> int:
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QTimer
+    from ui.main_window import MainWindow
+
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    # Мережева ініціалізація Drive - лише після першого відображення вікна.
+    QTimer.singleShot(0, window.restore_google_session)
+    QTimer.singleShot(0, window.restore_untitled_session)
+    return app.exec()
+
+
+if __name__ == "__main__":
+    # KOTUN_TRACE_FILE=trace.json - записати трасування у форматі Chrome trace.
+    from utils.tracing import enable_from_environment
+    enable_from_environment()
+    if len(sys.argv) > 1 and sys.argv[1] == "recalc":
+        # Пакетний режим без GUI: python main.py recalc книга.xlsx ... [-o каталог] [-j процеси]
+        from back.batch_recalc import main as recalc_main
+        sys.exit(recalc_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        # Локальний сервіс обчислень: python main.py serve [--port 8765] [--root каталог]
+        from back.calc_service import main as serve_main
+        sys.exit(serve_main(sys.argv[2:]))
+    sys.exit(run_gui())
@@ -0,0 +1,85 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from back.arrays import ArrayValue
+from back.calculator import SPILL_ROLE
+from back.sheet_model import SheetModel, MAX_ROWS
+from back.workbook_calc import WorkbookCalc
+
+
+class TestArrayFormulas(unittest.TestCase):
+
+    def setUp(self):
+        self.model = SheetModel.from_rows("Data", [[r, r * 10, None, None] for r in range(1, 6)])
+        self.calc = WorkbookCalc()
+        self.calc.add_sheet("Data", self.model)
+
+    def column(self, col: int) -> list:
+        return [self.calc.value("Data", r, col) for r in range(5)]
+
+    # ranges in expressions are arrays: element-wise operators, broadcasting, errors per element
+    def test_array_operations(self):
+        self.calc.recalculate_all()
+        evaluate = lambda formula: self.calc.calculator.evaluate(formula, self.model, self.calc.values["Data"])
+
+        result = evaluate("=A1:A3*B1:B3")
+        self.assertIsInstance(result, ArrayValue)
+        self.assertEqual((result.rows, result.cols, list(result)), (3, 1, [10.0, 40.0, 90.0]))
+        self.assertEqual(list(evaluate("=-A1:B1+A1:A2")), [0.0, -9.0, 1.0, -8.0])
+        self.assertEqual(list(evaluate("=A4:A5/(A1:A2-1)")), ["#DIV/0!", 5.0])
+        self.assertEqual(list(evaluate("=A1:A3+A1:A2")), [2.0, 4.0, "#N/A"])
+        self.assertEqual(evaluate("=SUM(A1:A5*2)"), 30.0)
+        self.assertEqual(evaluate("=SUM(A4:A5*B4:B5)"), 410.0)
+        self.assertEqual(self.calc.calculator.parse_and_calculate("=A2:A3*3", self.model), "6.0")
+
+    # the result spills into neighbouring cells; occupied cells and the sheet edge give #SPILL!
+    def test_spill_and_block(self):
+        self.model.set_value(0, 2, "=A1:A5*B1:B5")
+        self.calc.rebuild()
+        self.calc.recalculate_all()
+        self.assertEqual(self.column(2), [10.0, 40.0, 90.0, 160.0, 250.0])
+        self.assertEqual(self.model.item(3, 2).text(), "160.0")
+        self.assertTrue(self.model.item(3, 2).data(SPILL_ROLE))
+        self.assertEqual(self.calc.graph.spill_anchor(("Data", 3, 2)), ("Data", 0, 2))
+
+        self.model.set_value(3, 2, "x")
+        self.calc.set_cell("Data", 3, 2)
+        self.assertEqual(self.calc.value("Data", 0, 2), "#SPILL!")
+        self.assertIsNone(self.model.item(1, 2))
+
+        self.model.set_value(3, 2, None)
+        self.calc.set_cell("Data", 3, 2)
+        self.assertEqual(self.column(2), [10.0, 40.0, 90.0, 160.0, 250.0])
+
+        self.model.set_value(0, 3, "=A1:A6")
+        self.calc.set_cell("Data", 0, 3)
+        self.assertEqual([self.calc.value("Data", r, 3) for r in range(6)], [1.0, 2.0, 3.0, 4.0, 5.0, 0.0])
+        self.model.set_value(MAX_ROWS - 2, 3, "=A1:B5")
+        self.calc.set_cell("Data", MAX_ROWS - 2, 3)
+        self.assertEqual(self.calc.value("Data", MAX_ROWS - 2, 3), "#SPILL!")
+
+    # formulas reading spilled cells follow the anchor, even when evaluated before the spill existed
+    def test_spill_dependents(self):
+        self.model.set_value(4, 3, "=C3+1")
+        self.model.set_value(0, 3, "=SUM(C1:C5)")
+        self.model.set_value(0, 2, "=A1:A5*2")
+        self.calc.rebuild()
+        self.calc.recalculate_all()
+        self.assertEqual((self.calc.value("Data", 4, 3), self.calc.value("Data", 0, 3)), (7.0, 30.0))
+
+        self.model.set_value(2, 0, 10)
+        self.assertEqual(self.calc.set_cell("Data", 2, 0), 3)
+        self.assertEqual((self.calc.value("Data", 4, 3), self.calc.value("Data", 0, 3)), (21.0, 44.0))
+
+        self.model.set_value(0, 2, "=A1:A2*2")
+        self.calc.set_cell("Data", 0, 2)
+        self.assertEqual(self.column(2), [2.0, 4.0, None, None, None])
+        self.assertIsNone(self.model.item(2, 2))
+        self.assertEqual((self.calc.value("Data", 4, 3), self.calc.value("Data", 0, 3)), (1.0, 6.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
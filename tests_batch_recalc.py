@@ -0,0 +1,80 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import openpyxl
+from back.calculator import FormulaCalculator
+from back.sheet_model import SheetModel
+from back.batch_recalc import recalculate_workbook, run_batch
+from back.calc_service import CalcWorkbook
+
+
+class TestBatchRecalc(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "book.xlsx")
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        for r in range(1, 4):
+            sheet.cell(r, 1, r * 10)
+        sheet["B1"] = "=SUM(A1:A3)"
+        sheet["B2"] = "=B1/0"
+        workbook.save(self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    # the non-Qt sheet model behaves like a table widget for the calculator
+    def test_sheet_model_recalculate(self):
+        model = SheetModel.from_rows("Sheet", [[1, "=A1+A2"], [2, "=B1*2"]])
+
+        results = model.recalculate(FormulaCalculator())
+
+        self.assertEqual(results[(0, 1)], 3.0)
+        self.assertEqual(results[(1, 1)], 6.0)
+        self.assertEqual(model.item(1, 1).text(), "6.0")
+
+    # computed values are cached in the saved file, formulas are kept
+    def test_cached_values_written(self):
+        output = os.path.join(self.tmp_dir.name, "out", "book.xlsx")
+
+        report = recalculate_workbook(self.path, output)
+
+        self.assertTrue(report["ok"])
+        self.assertEqual((report["formulas"], report["errors"]), (2, 1))
+        values = openpyxl.load_workbook(output, data_only=True).active
+        formulas = openpyxl.load_workbook(output).active
+        self.assertEqual(values["B1"].value, 60)
+        self.assertEqual(values["B2"].value, "#DIV/0!")
+        self.assertEqual(formulas["B1"].value, "=SUM(A1:A3)")
+
+    # references past the filled cells read as empty in the batch and service paths, as in the GUI grid
+    def test_reads_past_data_are_empty(self):
+        workbook = openpyxl.load_workbook(self.path)
+        workbook.active["C1"] = "=SUM(A1:A100)+Z500"
+        workbook.save(self.path)
+        output = os.path.join(self.tmp_dir.name, "out.xlsx")
+
+        recalculate_workbook(self.path, output)
+        service = CalcWorkbook.load(self.path)
+
+        self.assertEqual(openpyxl.load_workbook(output, data_only=True).active["C1"].value, 60)
+        self.assertEqual(service.get_cells(["C1"]), {"C1": 60.0})
+
+    # a broken file is reported without stopping the batch
+    def test_batch_reports_failures(self):
+        broken = os.path.join(self.tmp_dir.name, "broken.xlsx")
+        with open(broken, "w") as f:
+            f.write("not a workbook")
+
+        summary = run_batch([self.path, broken], max_workers=1)
+
+        self.assertEqual((summary["succeeded"], summary["failed"]), (1, 1))
+        self.assertEqual([r["path"] for r in summary["results"]], [self.path, broken])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from benchmarks.generators import SCENARIOS, count_cells
+from benchmarks.bench_calc import find_regressions
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+
+    # every generator produces roughly the requested number of cells
+    def test_generators_cell_counts(self):
+        for name, generate in SCENARIOS.items():
+            cells, formulas = count_cells(generate(1000))
+            self.assertTrue(900 <= cells <= 1100, name)
+            self.assertGreater(formulas, 0, name)
+
+    # slowdowns above the threshold are reported, noise and speedups are not
+    def test_find_regressions(self):
+        baseline = {"results": {"chain/10k": {"stages": {"load": 0.100, "parse": 0.001, "save": 0.2}}}}
+        current = {"results": {"chain/10k": {"stages": {"load": 0.150, "parse": 0.003, "save": 0.1}},
+                               "dense/10k": {"stages": {"load": 1.0}}}}
+
+        regressions = find_regressions(current, baseline, threshold=0.2)
+
+        self.assertEqual([(r["case"], r["stage"]) for r in regressions], [("chain/10k", "load")])
+
+if __name__ == '__main__':
+    unittest.main()
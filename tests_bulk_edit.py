@@ -0,0 +1,56 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from back.bulk_edit import parse_clipboard, format_clipboard, shift_formula, fill_down
+from back.calc_profiler import CalcProfiler
+from back.sheet_model import SheetModel
+from back.workbook_calc import WorkbookCalc
+
+
+class TestBulkEdit(unittest.TestCase):
+
+    # clipboard text is tab-separated rows; quoted cells may hold tabs and line breaks
+    def test_clipboard_round_trip(self):
+        rows = [["1", "=A1*2", ""], ["two\nlines", "a\tb", "x"]]
+        text = format_clipboard(rows)
+        self.assertEqual(parse_clipboard(text), rows)
+        self.assertEqual(parse_clipboard("1\t2\r\n3\t4\r\n"), [["1", "2"], ["3", "4"]])
+        self.assertEqual(parse_clipboard("a\n\nb"), [["a"], [""], ["b"]])
+        self.assertEqual(parse_clipboard(""), [])
+
+    # relative references move with the cell; references off the sheet become #REF!
+    def test_shift_and_fill_down(self):
+        self.assertEqual(shift_formula("=SUM(A1:B2)+Data!C3*Rate", 2, 1), "=SUM(B3:C4)+(Data!D5*Rate)")
+        self.assertEqual(shift_formula("=A2+B1", -1, 0), "=A1+#REF!")
+        self.assertEqual(shift_formula("text", 5, 5), "text")
+        self.assertEqual(shift_formula("=1+", 1, 0), "=1+")
+
+        asts = {}
+        rows = fill_down(["=A1*B1", "5", "=SUM(Data!A1:A2)"], 3, asts)
+        self.assertEqual(rows[0], ["=A2*B2", "5", "=SUM(Data!A2:A3)"])
+        self.assertEqual([row[0] for row in rows], ["=A2*B2", "=A3*B3", "=A4*B4"])
+        self.assertEqual(asts["=A4*B4"].to_string(), "A4*B4")
+
+    # a bulk edit updates the graph per cell but recalculates each dependent once
+    def test_set_cells_recalculates_once(self):
+        model = SheetModel.from_rows("Data", [[r, None] for r in range(100)])
+        model.set_value(0, 1, "=SUM(A1:A100)")
+        calc = WorkbookCalc()
+        calc.add_sheet("Data", model)
+        calc.recalculate_all()
+        profiler = CalcProfiler()
+        profiler.attach(calc.calculator)
+
+        for r in range(100):
+            model.set_value(r, 0, 1)
+        self.assertEqual(calc.set_cells([("Data", r, 0) for r in range(100)]), 1)
+        self.assertEqual(calc.value("Data", 0, 1), 100.0)
+        self.assertEqual(profiler.stats[("Data", 0, 1)].count, 1)
+        profiler.detach()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import sys
+import os
+import csv
+import json
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from back.calculator import FormulaCalculator
+from back.calc_profiler import CalcProfiler
+from back.sheet_model import SheetModel
+
+
+class TestCalcProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.calculator = FormulaCalculator()
+        self.profiler = CalcProfiler()
+        self.model = SheetModel.from_rows("Sheet", [[1, "=A1*2", "=SUM(A1:A3)+B1"], [2], [3]])
+
+    # per-cell counters: evaluations, scanned range cells, reference depth, cache hits
+    def test_records_per_cell_stats(self):
+        self.profiler.attach(self.calculator)
+        self.model.recalculate(self.calculator)
+        self.model.recalculate(self.calculator)
+
+        rows = {row["cell"]: row for row in self.profiler.report()}
+
+        self.assertEqual(rows["C1"]["count"], 2)
+        self.assertEqual(rows["C1"]["range_cells"], 6)
+        self.assertEqual(rows["C1"]["max_depth"], 2)
+        self.assertEqual(rows["B1"]["max_depth"], 1)
+        self.assertGreater(rows["C1"]["ast_cache_hits"], 0)
+
+    # detaching restores the plain class methods, nothing is recorded afterwards
+    def test_detach_restores_methods(self):
+        self.profiler.attach(self.calculator)
+        self.profiler.detach()
+        self.model.recalculate(self.calculator)
+
+        self.assertNotIn("evaluate", vars(self.calculator))
+        self.assertEqual(self.profiler.report(), [])
+
+    # the report can be exported as JSON and CSV
+    def test_export(self):
+        self.profiler.attach(self.calculator)
+        self.model.recalculate(self.calculator)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = os.path.join(tmp_dir, "profile.json")
+            csv_path = os.path.join(tmp_dir, "profile.csv")
+            self.profiler.export(json_path)
+            self.profiler.export(csv_path, group_by="formula")
+            with open(json_path, encoding="utf-8") as f:
+                self.assertEqual(len(json.load(f)), 2)
+            with open(csv_path, encoding="utf-8-sig") as f:
+                self.assertEqual(len(list(csv.DictReader(f))), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+import threading
+import http.client
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import openpyxl
+from back.calc_service import CalcWorkbook, ServiceError, WorkbookCache, create_server
+from back.dependency_graph import DependencyGraph
+from back.parser import Parser
+
+
+class TestCalcService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "model.xlsx")
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = "Inputs"
+        for r in range(1, 11):
+            sheet.cell(r, 1, r)
+            sheet.cell(r, 2, f"=A{r}*2")
+        sheet["C1"] = "=SUM(B1:B10)"
+        sheet["D1"] = "=C1+1"
+        sheet["E1"] = "=A1+1"
+        workbook.save(self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    # only formulas that depend on the edited cell are recalculated
+    def test_incremental_recalculation(self):
+        workbook = CalcWorkbook.load(self.path)
+        self.assertEqual(workbook.get_cells(["D1"])["D1"], 111.0)
+
+        result = workbook.calculate({"Inputs!A10": 20}, ["C1", "D1", "E1"])
+
+        self.assertEqual(result["values"], {"C1": 130.0, "D1": 131.0, "E1": 2.0})
+        self.assertEqual(result["recalculated"], 3)
+
+    # transient inputs are rolled back after the outputs are read
+    def test_transient_request(self):
+        workbook = CalcWorkbook.load(self.path)
+
+        result = workbook.calculate({"A1": 100}, ["E1"], transient=True)
+
+        self.assertEqual(result["values"]["E1"], 101.0)
+        self.assertEqual(workbook.get_cells(["E1", "A1"]), {"E1": 2.0, "A1": 1.0})
+
+    # a bad reference rejects the whole request before any input is changed
+    def test_invalid_ref_changes_nothing(self):
+        workbook = CalcWorkbook.load(self.path)
+
+        with self.assertRaises(ServiceError):
+            workbook.calculate({"A1": 100, "Missing!A1": 1}, ["E1"])
+
+        self.assertEqual(workbook.get_cells(["A1", "E1"]), {"A1": 1.0, "E1": 2.0})
+
+    # cycles are ordered last and do not block the rest of the graph
+    def test_evaluation_order_with_cycle(self):
+        graph = DependencyGraph()
+        for key, formula in {("S", 0, 1): "=A1", ("S", 0, 2): "=B1+D1", ("S", 0, 3): "=C1", ("S", 1, 0): "=B1"}.items():
+            graph.set_formula(key, Parser().parse(formula))
+
+        order = graph.evaluation_order(graph.formulas())
+
+        self.assertEqual(order[:2], [("S", 0, 1), ("S", 1, 0)])
+        self.assertEqual(set(order[2:]), {("S", 0, 2), ("S", 0, 3)})
+
+    # the HTTP endpoint serves requests from the warm cache
+    def test_http_calc_uses_warm_cache(self):
+        server = create_server("127.0.0.1", 0, WorkbookCache(root=self.tmp_dir.name))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            connection = http.client.HTTPConnection(*server.server_address)
+            for value in (1, 2):
+                body = json.dumps({"workbook": "model.xlsx", "set": {"A1": value}, "get": ["B1"]})
+                connection.request("POST", "/calc", body, {"Content-Type": "application/json"})
+                response = json.loads(connection.getresponse().read())
+            self.assertEqual(response["values"]["B1"], 4.0)
+            connection.request("POST", "/calc", json.dumps({"workbook": "../outside.xlsx"}))
+            self.assertEqual(connection.getresponse().status, 400)
+            self.assertEqual((server.cache.hits, server.cache.misses), (1, 1))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from back.file_worker import FileWorker
+
+
+def _rows(data):
+    return [tuple(data.cells.get((r, c)) for c in range(data.max_col)) for r in range(data.max_row)]
+
+
+class TestDelimitedImportExport(unittest.TestCase):
+
+    def setUp(self):
+        self.file_worker = FileWorker(None)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    # CSV import with number parsing
+    def test_load_csv_converts_numbers(self):
+        path = self._path("data.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("name,qty,price\nalpha,10,2.5\n\"beta, gamma\",-3,1e2\n")
+
+        progress = []
+        data = self.file_worker.load_delimited(path, chunk_rows=1,
+                                               progress_callback=lambda done, total: progress.append((done, total)))
+        rows = _rows(data)
+
+        self.assertEqual(data.name, "data")
+        self.assertEqual(rows[1], ("alpha", 10, 2.5))
+        self.assertEqual(rows[2], ("beta, gamma", -3, 100.0))
+        self.assertEqual(progress[-1][0], progress[-1][1])
+
+    # TSV round trip
+    def test_tsv_round_trip(self):
+        path = self._path("out.tsv")
+        written = self.file_worker.save_delimited([["a", 1, None], ["b", 2.5, "x"]], path)
+        rows = _rows(self.file_worker.load_delimited(path))
+
+        self.assertEqual(written, 2)
+        self.assertEqual(rows, [("a", 1, None), ("b", 2.5, "x")])
+
+    # saving an opened workbook keeps its styles, merges, widths, heights, freeze panes and sheet properties
+    def test_save_keeps_formatting(self):
+        import datetime
+        import openpyxl
+        from openpyxl.styles import Font, PatternFill
+        path = self._path("styled.xlsx")
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = "Data"
+        sheet["A1"] = "Title"
+        sheet["A1"].font = Font(bold=True)
+        sheet.merge_cells("A1:C1")
+        sheet["B2"] = 0.25
+        sheet["B2"].number_format = "0.00%"
+        sheet["D5"].fill = PatternFill("solid", fgColor="FFFF00")
+        sheet["C4"] = "old"
+        sheet.column_dimensions["A"].width = 30
+        sheet.row_dimensions[3].height = 40
+        sheet.freeze_panes = "A2"
+        sheet.sheet_properties.tabColor = "FF0000"
+        workbook.save(path)
+
+        opened = self.file_worker.load_workbook(path)
+        data = {(0, 0): "Report", (1, 1): "=1/2", (5, 0): "new"}
+        # Дата не підтримується записом зі спільними рядками - друге збереження йде через openpyxl.
+        for extra in ({}, {(6, 0): datetime.datetime(2024, 1, 2)}):
+            template = self.file_worker.workbook_template(opened, ["Data"], {"Rate": "Data!$B$2"})
+            self.file_worker.write_snapshot([("Data", {**data, **extra})], path, names={"Rate": "Data!$B$2"},
+                                            template=template)
+            saved = openpyxl.load_workbook(path)
+            sheet = saved["Data"]
+            self.assertEqual((sheet["A1"].value, sheet["B2"].value, sheet["C4"].value, sheet["A6"].value),
+                             ("Report", "=1/2", None, "new"))
+            self.assertTrue(sheet["A1"].font.bold)
+            self.assertEqual([str(rng) for rng in sheet.merged_cells.ranges], ["A1:C1"])
+            self.assertEqual(sheet["B2"].number_format, "0.00%")
+            self.assertEqual(sheet["D5"].fill.fgColor.rgb, "00FFFF00")
+            self.assertEqual(sheet.column_dimensions["A"].width, 30)
+            self.assertEqual(sheet.row_dimensions[3].height, 40)
+            self.assertEqual(sheet.freeze_panes, "A2")
+            self.assertEqual(sheet.sheet_properties.tabColor.rgb, "00FF0000")
+            self.assertEqual(saved.defined_names["Rate"].attr_text, "Data!$B$2")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from back.functions import FUNCTIONS, register_function
+from back.sheet_model import SheetModel
+from back.workbook_calc import WorkbookCalc
+
+
+class TestFunctionRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.model = SheetModel.from_rows("Data", [[1, 2], [3, "#N/A"], [5, 6]])
+        self.model.set_value(1, 1, "=1/0")
+        self.calc = WorkbookCalc()
+        self.calc.add_sheet("Data", self.model)
+        self.calc.recalculate_all()
+
+    def tearDown(self):
+        for name in ("DOUBLE", "STRICTSUM", "SCALED"):
+            FUNCTIONS.unregister(name)
+
+    def evaluate(self, formula: str):
+        return self.calc.calculator.evaluate(formula, self.model, self.calc.values["Data"])
+
+    # functions registered outside the calculator are callable from formulas; arity is checked
+    def test_register_function(self):
+        @register_function("double", min_args=1, max_args=1)
+        def double(args):
+            return args[0] * 2
+
+        self.assertIn("DOUBLE", FUNCTIONS)
+        self.assertEqual(self.evaluate("=Double(A3)+1"), 11.0)
+        self.assertEqual(self.evaluate("=DOUBLE(A1,A2)"), "#ERROR!")
+        self.assertEqual(self.evaluate("=DOUBLE()"), "#ERROR!")
+        self.assertEqual(self.evaluate("=DOUBLE(\"x\")"), "xx")
+        self.assertEqual(self.evaluate("=NOSUCH(A1)"), "#ERROR!")
+
+    # "skip" ignores error cells inside ranges, "propagate" returns the first one; scalar errors always propagate
+    def test_error_modes(self):
+        register_function("STRICTSUM", FUNCTIONS.get("SUM").impl, min_args=1, errors="propagate")
+
+        self.assertEqual(self.evaluate("=SUM(A1:B3)"), 17.0)
+        self.assertEqual(self.evaluate("=STRICTSUM(A1:B3)"), "#DIV/0!")
+        self.assertEqual(self.evaluate("=SUM(B2,A1)"), "#DIV/0!")
+        with self.assertRaises(ValueError):
+            register_function("BAD", lambda args: 0, errors="ignore")
+
+    # a filled-down block calls the vector implementation once and matches per-cell results
+    def test_vector_block(self):
+        calls = []
+
+        def scaled_vector(columns):
+            calls.append(len(columns[0]))
+            return [sum(row) * factor for row, factor in zip(columns[0], columns[1])]
+
+        register_function("SCALED", lambda args: sum(args[0]) * args[1], min_args=2, max_args=2,
+                          vector=scaled_vector)
+        model = SheetModel.from_rows("Fill", [[r, r % 3, f"=SCALED(A{r}:B{r},2)", f"=C{r}/B{r}"]
+                                              for r in range(1, 7)])
+        results = []
+        for vectorize in (True, False):
+            calc = WorkbookCalc()
+            calc.calculator.vectorize = vectorize
+            calc.add_sheet("Fill", model)
+            calc.recalculate_all()
+            results.append([(calc.value("Fill", r, 2), calc.value("Fill", r, 3)) for r in range(6)])
+
+        self.assertEqual(calls, [6])
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0][2], (6.0, "#DIV/0!"))
+
+
+if __name__ == "__main__":
+    unittest.main()
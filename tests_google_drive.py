@@ -0,0 +1,206 @@
+import unittest
+import sys
+import os
+import io
+import re
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import time
+import tempfile
+import httplib2
+from back.google_drive import GoogleDriveManager
+from back.drive_cache import DriveCache
+from back.drive_listing_cache import DriveListingCache
+from urllib.parse import urlparse, parse_qs
+
+
+class FakeDriveHandler(BaseHTTPRequestHandler):
+    """Мінімальний Drive v3: media-завантаження з Range і resumable-вивантаження."""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data):
+        self._send(200, json.dumps(data).encode(), {"Content-Type": "application/json"})
+
+    def do_GET(self):
+        state = self.server.state
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path.endswith("/changes/startPageToken"):
+            return self._send_json({"startPageToken": "token-1"})
+        if url.path.endswith("/changes"):
+            return self._send_json({"changes": state["changes"].get(params["pageToken"], []),
+                                    "newStartPageToken": "token-2"})
+        if url.path.endswith("/files"):
+            start = int(params.get("pageToken", 0))
+            end = start + int(params["pageSize"])
+            listing = state["listing"]
+            page = {"files": listing[start:end]}
+            if end < len(listing):
+                page["nextPageToken"] = str(end)
+            return self._send_json(page)
+        match = re.match(r".*/files/([^/?]+)\?.*alt=media", self.path)
+        if not match:
+            return self._send(404)
+        data = state["files"][match.group(1)]
+        start, end = map(int, re.match(r"bytes=(\d+)-(\d+)", self.headers["Range"]).groups())
+        state["download_requests"] += 1
+        if state["download_requests"] == state.get("fail_download_on"):
+            return self._send(503)
+        end = min(end, len(data) - 1)
+        self._send(206, data[start:end + 1], {"Content-Range": f"bytes {start}-{end}/{len(data)}"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        host, port = self.server.server_address
+        self._send(200, headers={"Location": f"http://{host}:{port}/upload/session"})
+
+    def do_PUT(self):
+        state = self.server.state
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        received = state["uploaded"]
+        content_range = self.headers.get("Content-Range", "")
+        query = re.match(r"bytes \*/(\d+)", content_range)
+        if query:
+            return self._send(308, headers={"Range": f"bytes=0-{len(received) - 1}"} if received else {})
+
+        state["upload_requests"] += 1
+        if state["upload_requests"] == state.get("fail_upload_on"):
+            return self._send(503)
+        start, _, total = map(int, re.match(r"bytes (\d+)-(\d+)/(\d+)", content_range).groups())
+        del received[start:]
+        received.extend(body)
+        if len(received) < total:
+            return self._send(308, headers={"Range": f"bytes=0-{len(received) - 1}"})
+        self._send(200, json.dumps({"id": "uploaded-id", "webViewLink": "http://drive/uploaded-id"}).encode(),
+                   {"Content-Type": "application/json"})
+
+
+class LocalHttp(httplib2.Http):
+    # googleapiclient keeps the https scheme for media upload URLs, the fake server is plain http.
+    def __init__(self):
+        super().__init__()
+        # Same as googleapiclient.http.build_http: 308 is "resume incomplete", not a redirect.
+        self.redirect_codes = self.redirect_codes - {308}
+
+    def request(self, uri, *args, **kwargs):
+        return super().request(uri.replace("https://", "http://", 1), *args, **kwargs)
+
+
+class TestChunkedDriveTransfers(unittest.TestCase):
+
+    CHUNK = 256 * 1024
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeDriveHandler)
+        self.payload = bytes(range(256)) * (self.CHUNK * 3 // 256 + 100)
+        self.server.state = {"files": {"file-1": self.payload}, "download_requests": 0,
+                             "upload_requests": 0, "uploaded": bytearray(), "listing": [], "changes": {}}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address
+
+        self.manager = GoogleDriveManager(None, api_endpoint=f"http://{host}:{port}/")
+        self.manager.resume_backoff = 0
+        self.manager.service = self.manager.build_service(http=LocalHttp())
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # download resumes after a dropped chunk and reports progress
+    def test_download_resumes_from_last_chunk(self):
+        self.server.state["fail_download_on"] = 2
+        progress = []
+
+        buffer, error = self.manager.download_file(
+            "file-1", "application/octet-stream", chunk_size=self.CHUNK,
+            progress_callback=lambda done, total: progress.append((done, total)))
+
+        self.assertIsNone(error)
+        self.assertEqual(buffer.read(), self.payload)
+        self.assertEqual(progress[0], (self.CHUNK, len(self.payload)))
+        self.assertEqual(progress[-1], (len(self.payload), len(self.payload)))
+
+    # resumable upload continues after a server error instead of restarting
+    def test_upload_resumes_after_error(self):
+        self.server.state["fail_upload_on"] = 2
+        progress = []
+
+        file_meta, error = self.manager.upload_file(
+            "book.xlsx", io.BytesIO(self.payload), chunk_size=self.CHUNK,
+            progress_callback=lambda done, total: progress.append((done, total)))
+
+        self.assertIsNone(error)
+        self.assertEqual(file_meta["id"], "uploaded-id")
+        self.assertEqual(bytes(self.server.state["uploaded"]), self.payload)
+        self.assertEqual(progress[-1], (len(self.payload), len(self.payload)))
+
+    # listing walks every page, then refreshes incrementally from the changes feed
+    def test_listing_pagination_and_changes_feed(self):
+        xlsx = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        self.server.state["listing"] = [{"id": f"id-{i}", "name": f"book {i}", "mimeType": xlsx} for i in range(450)]
+        self.server.state["changes"]["token-1"] = [
+            {"fileId": "id-0", "removed": True},
+            {"fileId": "id-new", "file": {"id": "id-new", "name": "new", "mimeType": xlsx}},
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = DriveListingCache(os.path.join(tmp_dir, "listing.json"))
+            pages = []
+
+            self.manager.refresh_listing(cache, lambda updated, removed: pages.append(len(updated)))
+            self.assertEqual(pages, [200, 200, 50])
+            self.assertEqual(cache.start_page_token, "token-1")
+
+            self.manager.refresh_listing(cache, lambda updated, removed: pages.append(removed))
+            reloaded = DriveListingCache(cache.path)
+
+        self.assertEqual(pages[-1], ["id-0"])
+        self.assertEqual(len(reloaded.files), 450)
+        self.assertIn("id-new", reloaded.files)
+        self.assertEqual(reloaded.start_page_token, "token-2")
+
+
+class TestDriveCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = DriveCache(self.tmp_dir.name, max_bytes=150)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _store(self, file_meta, size):
+        key = self.cache.key_for(file_meta)
+        with self.cache.new_download_file() as fh:
+            fh.write(b"x" * size)
+        self.cache.store_file(key, fh.name)
+        return key
+
+    # key changes with the checksum and least recently used entries are evicted
+    def test_lru_eviction_by_checksum_key(self):
+        old_key = self._store({"id": "a", "md5Checksum": "1"}, 100)
+        self.assertNotEqual(old_key, self.cache.key_for({"id": "a", "md5Checksum": "2"}))
+        os.utime(self.cache.get_file(old_key), (time.time() - 60, time.time() - 60))
+
+        new_key = self._store({"id": "b", "modifiedTime": "2024-01-01T00:00:00Z"}, 100)
+
+        self.assertIsNone(self.cache.get_file(old_key))
+        self.assertIsNotNone(self.cache.get_file(new_key))
+
+if __name__ == '__main__':
+    unittest.main()
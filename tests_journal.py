@@ -0,0 +1,71 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from back.journal import (EditJournal, compact_entries, load_recoverable_entries, claim_untitled_journal,
+                          journal_path_for)
+
+class TestEditJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.workbook_path = os.path.join(self.tmp_dir.name, "book.xlsx")
+        with open(self.workbook_path, "wb") as f:
+            f.write(b"stub")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    # compaction keeps the last value per cell between structural ops
+    def test_compact_entries(self):
+        entries = [
+            {"op": "set", "sheet": "S", "row": 0, "col": 0, "value": "1"},
+            {"op": "set", "sheet": "S", "row": 0, "col": 0, "value": "2"},
+            {"op": "delete_row", "sheet": "S", "index": 3},
+            {"op": "set", "sheet": "S", "row": 0, "col": 0, "value": "3"},
+        ]
+        compacted = compact_entries(entries)
+
+        self.assertEqual([e.get("value") for e in compacted], ["2", None, "3"])
+
+    # entries after the save mark survive a reset
+    def test_reset_keeps_entries_after_mark(self):
+        journal = EditJournal(self.workbook_path)
+        journal.record("set", sheet="S", row=0, col=0, value="1")
+        mark_id = journal.mark()
+        journal.record("set", sheet="S", row=1, col=0, value="2")
+        journal.reset(mark_id)
+        journal.close()
+
+        entries = load_recoverable_entries(self.workbook_path)
+
+        self.assertEqual([e["value"] for e in entries], ["2"])
+
+    # each untitled session has its own journal; only a crashed new-workbook journal is claimed at startup
+    def test_claim_untitled_journal(self):
+        self.assertNotEqual(journal_path_for(None), journal_path_for(None))
+        journal_dir = self.tmp_dir.name
+
+        def untitled(name, blank):
+            journal = EditJournal(None, blank=blank, path=os.path.join(journal_dir, f"untitled-{name}.journal"))
+            journal.record("set", sheet="Sheet1", row=0, col=0, value=name)
+            return journal
+
+        crashed, imported, live = untitled("crashed", True), untitled("csv", False), untitled("live", True)
+        for journal in (crashed, imported):
+            journal.close()
+
+        claimed = claim_untitled_journal(journal_dir)
+        live.close(discard=True)
+
+        self.assertIsNotNone(claimed)
+        path, entries = claimed
+        self.assertEqual([e["value"] for e in entries], ["crashed"])
+        self.assertFalse(os.path.exists(crashed.path) or os.path.exists(imported.path))
+        self.assertEqual(sorted(os.listdir(journal_dir)), sorted(["book.xlsx", os.path.basename(path)]))
+
+if __name__ == '__main__':
+    unittest.main()
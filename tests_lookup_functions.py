@@ -0,0 +1,61 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from back.sheet_model import SheetModel
+from back.workbook_calc import WorkbookCalc
+
+
+class TestLookupFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.model = SheetModel.from_rows("Prices", [
+            ["apple", 3, "red"],
+            ["Banana", 5, "yellow"],
+            ["cherry", 7, "red"],
+            ["banana", 9, "green"],
+        ])
+        self.calc = WorkbookCalc()
+        self.calc.add_sheet("Prices", self.model)
+
+    def evaluate(self, formula: str):
+        return self.calc.calculator.evaluate(formula, self.model, self.calc.values["Prices"])
+
+    # exact matches are case-insensitive; approximate matches take the largest value <= lookup
+    def test_vlookup_match_xlookup(self):
+        self.assertEqual(self.evaluate('=VLOOKUP("BANANA",A1:C4,3,FALSE)'), "yellow")
+        self.assertEqual(self.evaluate('=VLOOKUP(6,B1:C4,2)'), "yellow")
+        self.assertEqual(self.evaluate('=VLOOKUP("kiwi",A1:C4,2,FALSE)'), "#N/A")
+        self.assertEqual(self.evaluate('=MATCH("cherry",A1:A4,0)'), 3.0)
+        self.assertEqual(self.evaluate('=MATCH(8,B1:B4)'), 3.0)
+        self.assertEqual(self.evaluate('=XLOOKUP("banana",A1:A4,B1:B4,0,0,-1)'), 9.0)
+        self.assertEqual(self.evaluate('=XLOOKUP("kiwi",A1:A4,B1:B4,"none")'), "none")
+
+    # criteria support comparison operators, "<>" and wildcards
+    def test_countif_sumif(self):
+        self.assertEqual(self.evaluate('=COUNTIF(A1:A4,"banana")'), 2.0)
+        self.assertEqual(self.evaluate('=COUNTIF(B1:B4,">4")'), 3.0)
+        self.assertEqual(self.evaluate('=COUNTIF(C1:C4,"<>red")'), 2.0)
+        self.assertEqual(self.evaluate('=SUMIF(A1:A4,"b*",B1:B4)'), 14.0)
+        self.assertEqual(self.evaluate('=SUMIF(B1:B4,"<=5")'), 8.0)
+
+    # formulas over the same range share one index, which is updated after an edit
+    def test_shared_index_invalidation(self):
+        for r in range(4):
+            self.model.set_value(r, 3, f'=COUNTIF(C1:C4,C{r + 1})')
+        self.calc.rebuild()
+        self.calc.recalculate_all()
+        self.assertEqual([self.calc.value("Prices", r, 3) for r in range(4)], [2.0, 1.0, 2.0, 1.0])
+        self.assertEqual(len(self.calc.calculator._lookup_indexes), 1)
+
+        self.model.set_value(1, 2, "red")
+        self.calc.set_cell("Prices", 1, 2)
+
+        self.assertEqual([self.calc.value("Prices", r, 3) for r in range(4)], [3.0, 3.0, 3.0, 1.0])
+        self.assertEqual(len(self.calc.calculator._lookup_indexes), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from back.calculator import FormulaCalculator
+from back.memory_report import table_memory, calculator_memory, check_budgets, MemoryTracker
+from back.sheet_model import SheetModel
+
+
+class TestMemoryReport(unittest.TestCase):
+
+    # cells, text values and formulas are counted per sheet
+    def test_table_memory_counts(self):
+        model = SheetModel.from_rows("Sheet", [[1, "x", "=A1*2"], [2, None, "=SUM(A1:A2)"]])
+
+        report = table_memory(model)
+
+        self.assertEqual((report["rows"], report["cols"]), (2, 3))
+        self.assertEqual(report["cells"], 5)
+        self.assertEqual(report["formulas"], 2)
+        self.assertEqual(report["strings"], 1)
+        self.assertGreater(report["estimated_bytes"], 0)
+
+    # budgets use dotted paths into the nested report; missing paths are ignored
+    def test_check_budgets(self):
+        calculator = FormulaCalculator()
+        calculator.evaluate("=1+2", SheetModel("Sheet", 1, 1))
+        report = {"calculator": calculator_memory(calculator), "sheets": {"Sheet": {"estimated_bytes": 10}}}
+
+        self.assertEqual(report["calculator"]["ast_cache_entries"], 1)
+        violations = check_budgets(report, {"calculator.ast_cache_bytes": 1, "sheets.Sheet.estimated_bytes": 100,
+                                            "missing.path": 1})
+        self.assertEqual(len(violations), 1)
+        self.assertTrue(violations[0].startswith("calculator.ast_cache_bytes"))
+
+    # the second snapshot reports growth since the first one
+    def test_tracker_growth(self):
+        tracker = MemoryTracker()
+        try:
+            first = tracker.snapshot()
+            self.assertNotIn("growth", first)
+            retained = [bytearray(1024) for _ in range(200)]
+            second = tracker.snapshot()
+            self.assertIn("growth", second)
+            self.assertGreater(sum(item["size_diff_bytes"] for item in second["growth"]), 100_000)
+            del retained
+        finally:
+            tracker.stop()
+
+    # snapshots and stops from several service threads do not interleave
+    def test_tracker_threads(self):
+        tracker = MemoryTracker()
+        errors = []
+
+        def work():
+            try:
+                for _ in range(5):
+                    tracker.snapshot(limit=1)
+                    tracker.stop()
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertFalse(tracker.tracing)
+
+
+if __name__ == "__main__":
+    unittest.main()
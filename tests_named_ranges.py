@@ -0,0 +1,105 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from back.file_worker import FileWorker
+from back.parser import Parser, NameNode
+from back.sheet_loader import read_defined_names
+from back.sheet_model import SheetModel
+from back.workbook_calc import WorkbookCalc
+
+
+class TestNamedRanges(unittest.TestCase):
+
+    def setUp(self):
+        self.data = SheetModel.from_rows("Data", [[1, 10], [2, 20], [3, 30]])
+        self.report = SheetModel.from_rows("Report", [["=SUM(Sales)*Rate", "=VLOOKUP(2,Prices,2,FALSE)",
+                                                       "=Total+1", "=Missing*2", "=A1+1"]])
+        self.calc = WorkbookCalc()
+        self.calc.names.update({"Sales": "Data!$A$1:$A$3", "Rate": "0.5", "Prices": "Data!A1:B3",
+                                "Total": "SUM(Sales)+Rate", "_xlnm.Print_Area": "Data!$A$1:$B$3"})
+        for model in (self.data, self.report):
+            self.calc.add_sheet(model.name, model, scan=False)
+        self.calc.rebuild()
+        self.calc.recalculate_all()
+
+    def row(self) -> list:
+        return [self.calc.value("Report", 0, c) for c in range(5)]
+
+    # names parse to NameNode, definitions are parsed once with precomputed indices; invalid names are rejected
+    def test_define_and_evaluate(self):
+        self.assertIsInstance(Parser().parse("=q1_sales"), NameNode)
+        self.assertEqual(Parser().parse("=Q1_sales+A1").to_string(), "Q1_sales+A1")
+        self.assertEqual(self.calc.names.get("sales").ast.bounds, (0, 0, 2, 0))
+        self.assertEqual(self.calc.names.names(), ["Sales", "Rate", "Prices", "Total"])
+
+        self.assertEqual(self.row(), [3.0, 20.0, 7.5, "#NAME?", 4.0])
+        for name, formula in (("B2", "1"), ("TRUE", "1"), ("Total", "Total*2"), ("Rate", "Total")):
+            with self.assertRaises(ValueError):
+                self.calc.names.define(name, formula)
+
+    # redefining a name recalculates only formulas that use it, without reparsing them
+    def test_redefine_repoints_dependents(self):
+        self.assertEqual(self.calc.graph.name_dependents("SALES"),
+                         {("Report", 0, 0), ("Report", 0, 2)})
+        cached = len(self.calc.calculator._ast_cache)
+
+        self.assertEqual(self.calc.define_name("Sales", "Data!B1:B3"), 3)
+        self.assertEqual(self.row(), [30.0, 20.0, 61.5, "#NAME?", 31.0])
+        self.assertEqual(len(self.calc.calculator._ast_cache), cached)
+
+        self.data.set_value(0, 1, 100)
+        self.assertEqual(self.calc.set_cell("Data", 0, 1), 4)
+        self.assertEqual(self.row()[0], 75.0)
+
+        self.calc.define_name("Missing", "Rate*10")
+        self.assertEqual(self.row()[3], 10.0)
+        self.calc.remove_name("Rate")
+        self.assertEqual(self.row(), ["#NAME?", 20.0, "#NAME?", "#NAME?", "#NAME?"])
+
+    # names are written as xlsx defined names with absolute references and read back
+    def test_xlsx_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "names.xlsx")
+            FileWorker(None).write_snapshot([("Data", [[1, 10]])], path, names=self.calc.names.definitions())
+            names = read_defined_names(path)
+
+        self.assertEqual(names, {"Sales": "Data!$A$1:$A$3", "Rate": "0.5", "Prices": "Data!$A$1:$B$3",
+                                 "Total": "SUM(Sales)+Rate"})
+
+    # deleting a row turns a name over it into #REF!; undo restores the definition
+    def test_delete_row_rewrites_names(self):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PySide6.QtWidgets import QApplication
+        from ui.main_window import MainWindow
+        app = QApplication.instance() or QApplication([])
+        window = MainWindow()
+        window.new_file()
+        try:
+            sheets = window.sheet_manager
+            table = sheets.get_current_table()
+            sheets.set_cell_values(table, {(0, 0): "1", (1, 0): "2", (2, 0): "3", (0, 1): "=SUM(Vals)"})
+            window.set_name("Vals", "Sheet1!$A$1:$A$3")
+            window.set_name("Top", "Sheet1!$A$1")
+            window.recalculate_all_cells()
+
+            sheets._delete_line_undoable(table, "row", 1)
+            window.recalculate_all_cells()
+            self.assertEqual(window.workbook_calc.names.definitions(), {"Vals": "#REF!", "Top": "Sheet1!$A$1"})
+            self.assertEqual(table.item(0, 1).text(), "#REF!")
+
+            window.undo()
+            self.assertEqual(window.workbook_calc.names.definitions(),
+                             {"Vals": "Sheet1!$A$1:$A$3", "Top": "Sheet1!$A$1"})
+            self.assertEqual(table.item(0, 1).text(), "6.0")
+        finally:
+            window._close_journal()
+            window.close()
+            app.processEvents()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from back.sheet_loader import load_sheets, parse_sheet
+from back.file_worker import FileWorker
+
+
+def _cells(sheets):
+    return [(data.name, data.max_row, data.max_col, data.cells.sorted_items(), sorted(data.formulas))
+            for data in sheets]
+
+
+class TestSheetLoader(unittest.TestCase):
+
+    def setUp(self):
+        import openpyxl
+        from openpyxl.styles import Font
+        from openpyxl.workbook.defined_name import DefinedName
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "book.xlsx")
+        workbook = openpyxl.Workbook()
+        first = workbook.active
+        first.title = "First"
+        for r in range(1, 50):
+            first.cell(r, 1, f"label {r % 3}")
+            first.cell(r, 2, r * 1.5)
+            first.cell(r, 3, f"=B{r}*2")
+        first["A1"].font = Font(bold=True)
+        first.merge_cells("D1:E1")
+        first.column_dimensions["A"].width = 25
+        first.freeze_panes = "A2"
+        second = workbook.create_sheet("Second")
+        second["C7"] = "=SUM(First!B1:B49)"
+        workbook.create_sheet("Empty")
+        workbook.defined_names["Total"] = DefinedName("Total", attr_text="Second!$C$7")
+        workbook.save(self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    # the process pool returns the same sheets, in workbook order, as serial parsing
+    def test_parallel_matches_serial(self):
+        progress = []
+        parallel = load_sheets(self.path, max_workers=2,
+                               progress_callback=lambda done, total: progress.append((done, total)))
+        serial = load_sheets(self.path, max_workers=1)
+
+        self.assertEqual(_cells(parallel), _cells(serial))
+        self.assertEqual(_cells(serial), _cells(parse_sheet(self.path, name) for name in ("First", "Second", "Empty")))
+        self.assertEqual([data.name for data in parallel], ["First", "Second", "Empty"])
+        self.assertEqual(progress[-1], (3, 3))
+
+    # opening keeps a workbook with the file's formatting and names but none of its cell values
+    def test_open_keeps_formatting_workbook(self):
+        worker = FileWorker(None)
+        workbook, sheets = worker.load_workbook_parallel(self.path)
+
+        self.assertEqual(_cells(sheets), _cells(load_sheets(self.path, max_workers=1)))
+        self.assertEqual(workbook.sheetnames, ["First", "Second", "Empty"])
+        self.assertEqual(workbook.defined_names["Total"].attr_text, "Second!$C$7")
+        first = workbook["First"]
+        self.assertTrue(first["A1"].font.bold)
+        self.assertEqual([str(rng) for rng in first.merged_cells.ranges], ["D1:E1"])
+        self.assertEqual((first.column_dimensions["A"].width, first.freeze_panes), (25, "A2"))
+        self.assertEqual([cell.value for sheet in workbook for row in sheet.iter_rows() for cell in row
+                          if cell.value is not None], [])
+
+        snapshot = [(data.name, {key: str(value) for key, value in data.cells.items()}) for data in sheets]
+        template = worker.workbook_template(workbook, [name for name, _ in snapshot], {"Total": "Second!$C$7"})
+        worker.write_snapshot(snapshot, self.path, template=template)
+        reopened, _ = worker.load_workbook_parallel(self.path)
+        self.assertTrue(reopened["First"]["A1"].font.bold)
+        self.assertEqual(reopened.defined_names["Total"].attr_text, "Second!$C$7")
+        self.assertEqual(_cells(load_sheets(self.path, max_workers=1))[1][3], [((6, 2), "=SUM(First!B1:B49)")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import sys
+import os
+import pickle
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from back.sparse_grid import SparseGrid
+from back.sheet_loader import parse_sheet
+from back.sheet_model import SheetModel
+from back.file_worker import FileWorker
+
+
+class TestSparseGrid(unittest.TestCase):
+
+    # the grid behaves like a dict keyed by (row, col) and keeps one tile per occupied 64x64 block
+    def test_mapping(self):
+        grid = SparseGrid({(0, 0): "a", (499999, 25): "z"})
+        grid[(1, 1)] = "b"
+        grid[(1, 1)] = "c"
+
+        self.assertEqual(len(grid), 3)
+        self.assertEqual(len(grid._tiles), 2)
+        self.assertEqual(grid[(1, 1)], "c")
+        self.assertEqual(grid.at(499999, 25), "z")
+        self.assertIsNone(grid.at(2, 2))
+        self.assertNotIn((2, 2), grid)
+        self.assertEqual(grid.sorted_items(), [((0, 0), "a"), ((1, 1), "c"), ((499999, 25), "z")])
+        self.assertEqual(grid.bounds(), (500000, 26))
+
+        del grid[(499999, 25)]
+        self.assertEqual((len(grid), len(grid._tiles)), (2, 1))
+        with self.assertRaises(KeyError):
+            grid[(499999, 25)]
+        self.assertEqual(pickle.loads(pickle.dumps(grid)).sorted_items(), grid.sorted_items())
+
+    # range queries and row/column shifts only touch occupied cells
+    def test_items_in_and_shift(self):
+        grid = SparseGrid({(r, c): r * 100 + c for r in (0, 63, 64, 200) for c in (0, 70)})
+        self.assertEqual(sorted(key for key, _ in grid.items_in(60, 0, 100, 69)), [(63, 0), (64, 0)])
+        self.assertEqual(list(grid.items_in(1, 1, 50, 50)), [])
+
+        grid.shift(0, 63, -1)
+        self.assertEqual(sorted({r for r, _ in grid}), [0, 63, 199])
+        self.assertEqual(grid[(63, 70)], 6470)
+        grid.shift(1, 10, 5)
+        self.assertEqual(sorted({c for _, c in grid}), [0, 75])
+
+    # a far-away cell loads without filling the gap, and dense and sparse snapshots save the same
+    def test_loader_and_snapshot(self):
+        import openpyxl
+        workbook = openpyxl.Workbook()
+        workbook.active.title = "Data"
+        workbook.active["A1"] = 4
+        workbook.active["Z100000"] = "=A1*2"
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sparse.xlsx")
+            workbook.save(path)
+            data = parse_sheet(path, "Data")
+
+            self.assertEqual((data.max_row, data.max_col), (100000, 26))
+            self.assertEqual(data.cells.sorted_items(), [((0, 0), 4), ((99999, 25), "=A1*2")])
+            model = SheetModel.from_sheet_data(data)
+            self.assertEqual(model.occupied_cells(), [(0, 0), (99999, 25)])
+            self.assertEqual(model.formula_cells(), [(99999, 25)])
+
+            sparse = [("Data", {(1, 2): "x", (0, 0): "1"})]
+            dense = [("Data", [["1", None, None], [None, None, "x"], [None, None, None]])]
+            self.assertEqual(FileWorker.snapshot_hash(sparse), FileWorker.snapshot_hash(dense))
+            FileWorker(None).write_snapshot(sparse, path)
+            self.assertEqual(list(openpyxl.load_workbook(path)["Data"].values), [("1", None, None), (None, None, "x")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import sys
+import os
+import io
+import datetime
+import zipfile
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from back.string_table import StringTable
+from back.sheet_model import SheetModel, SharedItem
+from back.file_worker import FileWorker
+
+
+class TestStringTable(unittest.TestCase):
+
+    # repeated labels and numbers loaded together share one cell; formulas share the workbook's string table
+    def test_model_shares_repeated_contents(self):
+        strings = StringTable()
+        labels = ["".join("North") for _ in range(3)]
+        model = SheetModel.from_rows("S", [[labels[0], 5, "=A1&1"], [labels[1], 5.0, "".join("=A1&1")],
+                                           [labels[2], 5, None]], strings)
+        other = SheetModel.from_rows("T", [["".join("=A1&1")]], strings)
+
+        self.assertIs(model.item(0, 0), model.item(2, 0))
+        self.assertIsInstance(model.item(0, 0), SharedItem)
+        self.assertIs(model.item(0, 1), model.item(2, 1))
+        self.assertEqual((model.item(0, 1).text(), model.item(1, 1).text()), ("5", "5.0"))
+        self.assertIsNot(model.item(0, 2), model.item(1, 2))
+        self.assertIs(model.item(0, 2).formula, other.item(0, 0).formula)
+        self.assertEqual(len(strings), 1)
+
+        with self.assertRaises(TypeError):
+            model.item(0, 0).setText("South")
+        model.set_value(0, 0, "South")
+        self.assertEqual((model.item(0, 0).text(), model.item(2, 0).text()), ("South", "North"))
+
+    # CSV import keeps one object per distinct label
+    def test_csv_labels_interned(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "data.csv")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("Region,Amount\nNorth,1\nNorth,2.5\nSouth,3\n")
+            cells = FileWorker(None).load_delimited(path, delimiter=",").cells
+
+        self.assertIs(cells[(1, 0)], cells[(2, 0)])
+        self.assertEqual([cells[(r, 1)] for r in range(4)], ["Amount", 1, 2.5, 3])
+
+    # saves write repeated text once into the shared string table; unsupported values fall back to openpyxl
+    def test_save_with_shared_strings(self):
+        import openpyxl
+        worker = FileWorker(None)
+        target = io.BytesIO()
+        snapshot = [("Data", {(0, 0): "North", (1, 0): "North", (1, 1): " padded ", (2, 1): "=B2&A1",
+                              (2, 2): 4, (3, 0): "#N/A"}), ("Empty", {})]
+        worker.write_snapshot(snapshot, target, names={"Rate": "Data!$C$3"})
+
+        with zipfile.ZipFile(target) as archive:
+            shared = archive.read("xl/sharedStrings.xml").decode()
+        self.assertEqual(shared.count("<si>"), 2)
+        self.assertIn('<t xml:space="preserve"> padded </t>', shared)
+        workbook = openpyxl.load_workbook(target)
+        self.assertEqual([[cell.value for cell in row] for row in workbook["Data"].iter_rows()],
+                         [["North", None, None], ["North", " padded ", None], [None, "=B2&A1", 4],
+                          ["#N/A", None, None]])
+        self.assertEqual(workbook.sheetnames, ["Data", "Empty"])
+        self.assertEqual(workbook.defined_names["Rate"].attr_text, "Data!$C$3")
+
+        target = io.BytesIO()
+        worker.write_snapshot([("Data", {(0, 0): datetime.datetime(2024, 1, 2)})], target)
+        self.assertEqual(openpyxl.load_workbook(target)["Data"]["A1"].value, datetime.datetime(2024, 1, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from utils.tracing import Tracer
+
+
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.tracer = Tracer()
+
+    # a disabled tracer records nothing
+    def test_disabled_tracer_is_noop(self):
+        with self.tracer.span("file.load") as trace:
+            trace.set(cells=10)
+        self.tracer.counter("memory", rss=1)
+
+        self.assertEqual(self.tracer.events(), [])
+
+    # spans from several threads are exported as Chrome trace complete events
+    def test_chrome_trace_export(self):
+        self.tracer.enable()
+        with self.tracer.span("calc.recalculate", "calc", sheet="Sheet1") as trace:
+            trace.set(formulas=3)
+        worker = threading.Thread(target=lambda: self.tracer.span("drive.download", "drive").__enter__().__exit__(None, None, None),
+                                  name="worker")
+        worker.start()
+        worker.join()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "trace.json")
+            self.tracer.export_chrome_trace(path)
+            with open(path, encoding="utf-8") as f:
+                events = json.load(f)["traceEvents"]
+
+        spans = {e["name"]: e for e in events if e["ph"] == "X"}
+        self.assertEqual(spans["calc.recalculate"]["args"]["formulas"], 3)
+        self.assertEqual(spans["calc.recalculate"]["args"]["sheet"], "Sheet1")
+        self.assertNotEqual(spans["calc.recalculate"]["tid"], spans["drive.download"]["tid"])
+        thread_names = {e["args"]["name"] for e in events if e["ph"] == "M"}
+        self.assertIn("worker", thread_names)
+        self.assertEqual(self.tracer.summary()["drive.download"]["count"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
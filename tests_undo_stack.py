@@ -0,0 +1,63 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from back.undo_stack import UndoStack, UndoEntry, merge_entries
+
+
+def cells_entry(values: dict, old: str = "") -> UndoEntry:
+    return UndoEntry("set", "S", cells=[("S", r, c) for r, c in values], old=[old] * len(values),
+                     new=list(values.values()))
+
+
+class TestUndoStack(unittest.TestCase):
+
+    # undo moves entries to the redo stack; a new edit drops what could be redone
+    def test_undo_redo_order(self):
+        stack = UndoStack()
+        first, second = cells_entry({(0, 0): "1"}), UndoEntry("insert_row", "S", (10,))
+        stack.push(first)
+        stack.push(second)
+
+        self.assertIs(stack.undo(), second)
+        self.assertIs(stack.undo(), first)
+        self.assertIsNone(stack.undo())
+        self.assertIs(stack.redo(), first)
+        self.assertTrue(stack.can_redo())
+
+        stack.push(cells_entry({(1, 0): "2"}))
+        self.assertFalse(stack.can_redo())
+        self.assertEqual(len(stack), 2)
+        self.assertEqual(stack.size, first.size + stack._undo[1].size)
+
+    # merged cell edits keep the first old value and the last new value per cell
+    def test_merge_entries(self):
+        first = UndoEntry("set", "S", cells=[("S", 0, 0), ("S", 1, 0)], old=["a", ""], new=["b", "x"])
+        second = UndoEntry("set", "S", cells=[("S", 0, 0), ("T", 0, 0)], old=["b", "1"], new=["c", "2"])
+        merged = merge_entries(first, second)
+
+        self.assertEqual(merged.cells, [("S", 0, 0), ("S", 1, 0), ("T", 0, 0)])
+        self.assertEqual((merged.old, merged.new), (["a", "", "1"], ["c", "x", "2"]))
+        self.assertLess(merged.size, first.size + second.size)
+
+    # over the memory cap the oldest cell edits are merged, then the oldest entries dropped
+    def test_memory_cap(self):
+        entry_size = cells_entry({(0, 0): "1"}, old="0").size
+        stack = UndoStack(max_bytes=entry_size * 3)
+        for value in "123":
+            stack.push(cells_entry({(0, 0): value}, old=str(int(value) - 1)))
+        stack.push(cells_entry({(0, 1): "x"}))
+
+        self.assertEqual(len(stack), 3)
+        self.assertLessEqual(stack.size, stack.max_bytes)
+        self.assertEqual((stack._undo[0].old, stack._undo[0].new), (["0"], ["2"]))
+
+        stack.push(UndoEntry("delete_sheet", "S", (0, 10, 5), [("S", r, 0) for r in range(10)], ["v"] * 10))
+        self.assertEqual([entry.op for entry in stack._undo], ["delete_sheet"])
+        self.assertEqual(stack.size, stack._undo[0].size)
+
+
+if __name__ == "__main__":
+    unittest.main()
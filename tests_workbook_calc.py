@@ -0,0 +1,81 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from back.calculator import FormulaCalculator
+from back.parser import Parser
+from back.sheet_model import SheetModel
+from back.workbook_calc import WorkbookCalc
+
+
+class TestWorkbookCalc(unittest.TestCase):
+
+    def setUp(self):
+        self.data = SheetModel.from_rows("Data", [[5], [7]])
+        self.report = SheetModel.from_rows("Report", [["=Data!A1*2", "=SUM(data!A1:A2)+A1"]])
+        self.summary = SheetModel.from_rows("My Sheet", [["=Report!B1+1"]])
+        self.calc = WorkbookCalc()
+        for model in (self.data, self.report, self.summary):
+            self.calc.add_sheet(model.name, model, scan=False)
+        self.calc.rebuild()
+        self.calc.recalculate_all()
+
+    # sheet-qualified references keep the sheet name; quoted names are unescaped and re-quoted
+    def test_parse_sheet_references(self):
+        self.assertEqual(Parser().parse("=Data!a1+1").to_string(), "Data!A1+1")
+        ast = Parser().parse("='It''s a sheet'!A1:B2")
+        self.assertEqual(ast.sheet, "It's a sheet")
+        self.assertEqual(ast.to_string(), "'It''s a sheet'!A1:B2")
+
+    # references resolve through the registry case-insensitively; unknown sheets give #REF!
+    def test_cross_sheet_evaluation(self):
+        self.assertEqual(self.calc.value("Report", 0, 1), 22.0)
+        self.assertEqual(self.calc.value("My Sheet", 0, 0), 23.0)
+        self.assertEqual(FormulaCalculator().evaluate("=Data!A1", self.report), "#REF!")
+        self.assertEqual(self.calc.calculator.evaluate("='my sheet'!A1*2", self.data), 46.0)
+
+    # an edit recalculates only dependents, across sheets; cross-sheet cycles are detected
+    def test_incremental_across_sheets(self):
+        self.data.set_value(1, 0, 10)
+
+        self.assertEqual(self.calc.set_cell("Data", 1, 0), 2)
+        self.assertEqual(self.calc.value("Report", 0, 1), 25.0)
+        self.assertEqual(self.calc.value("My Sheet", 0, 0), 26.0)
+        self.assertEqual(self.report.item(0, 0).text(), "10.0")
+
+        self.data.set_value(0, 0, "='My Sheet'!A1")
+        self.calc.set_cell("Data", 0, 0)
+        self.assertEqual(self.calc.value("My Sheet", 0, 0), "#CIRCULAR!")
+
+    # iterative mode converges cycles (interest on average balance); acyclic formulas stay single-pass
+    def test_iterative_cycles(self):
+        loan = SheetModel.from_rows("Loan", [[0.1, 1000], ["", "=A1*(B1+B3)/2"], ["", "=B1+B2"], ["", "=B3*2"],
+                                             ["=Data!A1+1", "=A5+B5"]])
+        self.calc.add_sheet("Loan", loan)
+        self.calc.recalculate_all()
+        self.assertEqual(self.calc.value("Loan", 3, 1), "#CIRCULAR!")
+
+        plan = self.calc.graph.evaluation_plan(self.calc.graph.formulas())
+        self.assertEqual([cyclic for _, cyclic in plan], [False, True, False, True])
+        self.assertEqual(sorted(plan[1][0]), [("Loan", 1, 1), ("Loan", 2, 1)])
+
+        self.calc.iterative = True
+        self.calc.recalculate_all()
+        self.assertAlmostEqual(self.calc.value("Loan", 2, 1), 1050 / 0.95, places=2)
+        self.assertAlmostEqual(self.calc.value("Loan", 3, 1), 2100 / 0.95, places=2)
+        self.assertEqual(self.calc.value("Loan", 4, 0), 6.0)
+        self.assertEqual(self.calc.value("Loan", 4, 1), 600.0)
+
+        loan.set_value(0, 1, 2000)
+        self.calc.set_cell("Loan", 0, 1)
+        self.assertAlmostEqual(self.calc.value("Loan", 2, 1), 2100 / 0.95, places=2)
+
+        self.calc.max_iterations = 3
+        self.calc.recalculate_all()
+        self.assertEqual(self.calc.value("Loan", 4, 1), 618.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QLineEdit, QListWidget, QListWidgetItem,
+                               QDialogButtonBox, QLabel)
+from PySide6.QtCore import Qt, Signal
+
+
+class DrivePickerDialog(QDialog):
+    """Вибір таблиці з Google Drive: миттєво показує кеш і доповнюється сторінками з мережі."""
+
+    search_requested = Signal(str)
+
+    def __init__(self, parent, files: list[dict]):
+        super().__init__(parent)
+        self.setWindowTitle("Обрати файл")
+        self.resize(420, 480)
+        self._files: dict[str, dict] = {f['id']: f for f in files}
+
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Пошук за назвою (Enter - шукати на Google Drive)")
+        self.search_edit.textChanged.connect(self._refresh_list)
+        self.search_edit.returnPressed.connect(lambda: self.search_requested.emit(self.search_edit.text().strip()))
+
+        self.file_list = QListWidget()
+        self.file_list.itemDoubleClicked.connect(lambda _: self.accept())
+        self.status_label = QLabel()
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Оберіть файл з Google Drive:"))
+        layout.addWidget(self.search_edit)
+        layout.addWidget(self.file_list)
+        layout.addWidget(self.status_label)
+        layout.addWidget(buttons)
+        self._refresh_list()
+
+    def set_loading(self, loading: bool) -> None:
+        self.status_label.setText("Оновлення списку..." if loading else f"Файлів: {len(self._files)}")
+
+    def apply_page(self, page: tuple[list[dict], list[str]]) -> None:
+        updated, removed = page
+        for f in updated:
+            self._files[f['id']] = f
+        for file_id in removed:
+            self._files.pop(file_id, None)
+        self._refresh_list()
+
+    def _refresh_list(self) -> None:
+        selected = self.selected_file()
+        selected_id = selected['id'] if selected else None
+        needle = self.search_edit.text().strip().lower()
+        files = sorted(self._files.values(), key=lambda f: f.get('modifiedTime', ''), reverse=True)
+
+        self.file_list.setUpdatesEnabled(False)
+        self.file_list.clear()
+        for f in files:
+            if needle and needle not in f['name'].lower():
+                continue
+            item = QListWidgetItem(f['name'])
+            item.setData(Qt.ItemDataRole.UserRole, f['id'])
+            self.file_list.addItem(item)
+            if f['id'] == selected_id:
+                self.file_list.setCurrentItem(item)
+        if self.file_list.currentRow() < 0 and self.file_list.count():
+            self.file_list.setCurrentRow(0)
+        self.file_list.setUpdatesEnabled(True)
+
+    def selected_file(self) -> dict | None:
+        item = self.file_list.currentItem() if hasattr(self, 'file_list') else None
+        if item is None:
+            return None
+        return self._files.get(item.data(Qt.ItemDataRole.UserRole))
@@ -1,18 +1,35 @@
 import sys
 import os
 import io
+import tempfile
 
 from PySide6.QtWidgets import (QMainWindow, QMessageBox, QTableWidgetItem, 
-                               QMenu, QTabWidget, QPushButton, QInputDialog)
+                               QMenu, QTabWidget, QPushButton, QInputDialog,
+                               QProgressBar, QLabel, QDialog, QFileDialog, QApplication)
 from PySide6.QtGui import QCloseEvent
-from PySide6.QtCore import Qt, QTimer, QPoint
-
-from back.calculator import FormulaCalculator
+from PySide6.QtCore import Qt, QPoint, QTimer
+
+from back.calculator import FormulaCalculator, SPILL_ROLE
+from back.calc_profiler import CalcProfiler
+from back.bulk_edit import parse_clipboard, format_clipboard, shift_formula, fill_down
+from back.workbook_calc import WorkbookCalc
+from back.memory_report import (table_memory, workbook_memory, calculator_memory, process_memory,
+                                check_budgets, MemoryTracker)
 from back.file_worker import FileWorker
-from back.google_drive import GoogleDriveManager
+from back.google_drive import GoogleDriveManager, CONTENT_HASH_PROPERTY, GOOGLE_SHEET_MIME_TYPE
 from back.sheet_worker import SheetWorker
+from back.sheet_model import occupied_cells
+from back.task_runner import TaskRunner
+from back.journal import EditJournal, load_recoverable_entries, claim_untitled_journal
+from back.undo_stack import UndoStack, UndoEntry
+from back.drive_cache import DriveCache
+from back.drive_listing_cache import DriveListingCache
 from ui.ui_dispatcher import UIRenderer
-from utils.config import APP_NAME, DEFAULT_SHEET_NAME
+from ui.drive_picker import DrivePickerDialog
+from ui.profiler_panel import ProfilerPanel
+from ui.memory_dialog import MemoryReportDialog
+from utils.config import APP_NAME, DEFAULT_SHEET_NAME, DRIVE_CHUNK_SIZE, TOKEN_FILE, MEMORY_BUDGETS
+from utils.tracing import TRACER, span
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -25,11 +42,35 @@ class MainWindow(QMainWindow):
         self.is_dirty = False
         self.is_formula_view = False
         self.is_calculating = False
+        self.edit_generation = 0
+        self.current_task = None
+        self.journal = None
+        self.drive_file = None
+        # Змінені клітинки, залежні від яких ще не перераховано: усі правки до повернення в цикл подій
+        # (вставка, протягування, серія itemChanged) перераховуються одним інкрементним проходом.
+        self._pending_edits: set[tuple[str, int, int]] = set()
+        self._recalc_timer = QTimer(self)
+        self._recalc_timer.setSingleShot(True)
+        self._recalc_timer.setInterval(0)
+        self._recalc_timer.timeout.connect(self.flush_pending_edits)
+        # Останнє копіювання: (текст буфера, рядок, стовпець) - щоб при вставці зсунути посилання у формулах.
+        self._copied = None
+        self.undo_stack = UndoStack()
+        # (таблиця, рядок, стовпець, вміст) поточної клітинки до редагування: itemChanged старого тексту не дає.
+        self._cell_before = None
 
         #Back end managers
         self.calculator = FormulaCalculator()
+        self.workbook_calc = WorkbookCalc(self.calculator)
+        self.workbook_calc.item_factory = QTableWidgetItem
+        self.profiler = CalcProfiler()
+        self.profiler_panel = None
+        self.memory_tracker = MemoryTracker()
         self.file_manager = FileWorker(self)
         self.google_manager = GoogleDriveManager(self)
+        self.task_runner = TaskRunner()
+        self.drive_cache = DriveCache()
+        self.drive_listing = DriveListingCache()
         
         # UI
         self.tab_widget = QTabWidget()
@@ -48,10 +89,13 @@ class MainWindow(QMainWindow):
         self.ui_manager.setup_toolbar()
         self.ui_manager.setup_context_menus()
         self.add_sheet_button.clicked.connect(self._sheet_action)
+        self._setup_task_progress()
 
         self.reset_app()
 
     def set_dirty(self, dirty: bool) -> None:
+        if dirty:
+            self.edit_generation += 1
         if self.is_dirty == dirty:
             return
         self.is_dirty = dirty
@@ -63,11 +107,95 @@ class MainWindow(QMainWindow):
 
     #Events handlers
     def on_tab_changed(self, index: int):
-        self.recalculate_all_cells()
+        self.refresh_formula_display()
         
     def toggle_formula_view(self, checked: bool):
         self.is_formula_view = checked
-        self.recalculate_all_cells()
+        self.refresh_formula_display()
+
+    def define_name(self):
+        """Додає чи змінює ім'я книги; порожнє визначення видаляє ім'я."""
+        name, ok = QInputDialog.getText(self, "Ім'я", "Ім'я (наприклад, Ставка):")
+        if not ok or not name.strip():
+            return
+        name = name.strip()
+        current = self.workbook_calc.names.get(name)
+        formula, ok = QInputDialog.getText(self, "Ім'я", f"Посилання або значення для {name} (наприклад, Аркуш1!A1:A10):",
+                                           text=current.formula if current else "")
+        if not ok or self.is_calculating:
+            return
+        try:
+            self.set_name(name, formula.strip())
+        except ValueError as e:
+            QMessageBox.warning(self, "Помилка", str(e))
+            return
+        self.push_undo(UndoEntry("define_name", args=(name, current.formula if current else "", formula.strip())))
+        self.set_dirty(True)
+
+    def set_name(self, name: str, formula: str) -> None:
+        """Визначає ім'я (порожнє formula - видаляє) і записує це в журнал; ValueError - некоректне визначення."""
+        self.is_calculating = True
+        try:
+            if formula:
+                self.workbook_calc.define_name(name, formula, update_text=not self.is_formula_view)
+            else:
+                self.workbook_calc.remove_name(name, update_text=not self.is_formula_view)
+        finally:
+            self.is_calculating = False
+        self.record_edit("define_name", name=name, value=formula)
+
+    def toggle_iterative_calc(self, checked: bool):
+        self.workbook_calc.iterative = checked
+        self.recalculate_all_cells(rebuild=False)
+
+    def toggle_profiler(self, checked: bool):
+        if checked:
+            if self.profiler_panel is None:
+                self.profiler_panel = ProfilerPanel(self, self.profiler)
+                self.profiler_panel.closed.connect(lambda: self.ui_manager.set_action_checked("profiler", False))
+                self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.profiler_panel)
+            self.profiler.attach(self.calculator)
+            self.profiler_panel.show()
+            self.recalculate_all_cells()
+        else:
+            self.profiler.detach()
+            if self.profiler_panel is not None:
+                self.profiler_panel.hide()
+
+    def toggle_tracing(self, checked: bool):
+        if checked:
+            TRACER.clear()
+            TRACER.enable()
+            return
+        TRACER.disable()
+        path, _ = QFileDialog.getSaveFileName(self, "Зберегти трасування", "trace.json",
+                                              "Chrome Trace (*.json);;All Files (*)")
+        if not path:
+            return
+        try:
+            TRACER.export_chrome_trace(path)
+            self.statusBar().showMessage(f"Трасування збережено: {path}", 5000)
+        except OSError as e:
+            QMessageBox.critical(self, "Помилка", f"Не вдалося зберегти трасування: {e}")
+
+    def memory_report(self) -> dict:
+        sheets = {}
+        for idx in range(self.tab_widget.count()):
+            sheets[self.tab_widget.tabText(idx)] = table_memory(self.tab_widget.widget(idx))
+        report = {
+            "process": process_memory(),
+            "sheets": sheets,
+            "grid_estimated_bytes": sum(s["estimated_bytes"] for s in sheets.values()),
+            "workbook_model": workbook_memory(self.current_workbook),
+            "calculator": calculator_memory(self.calculator),
+            "profiler_entries": len(self.profiler.stats),
+            "tracer_events": TRACER.event_count(),
+        }
+        report["budget_violations"] = check_budgets(report, MEMORY_BUDGETS)
+        return report
+
+    def show_memory_report(self):
+        MemoryReportDialog(self, self.memory_report, self.memory_tracker, MEMORY_BUDGETS).exec()
 
     def on_item_double_clicked(self, item: QTableWidgetItem):
         if self.is_calculating: return
@@ -77,6 +205,10 @@ class MainWindow(QMainWindow):
             item.setText(formula)    
             self.is_calculating = False
 
+    def on_current_cell_changed(self, table_widget, row: int, col: int):
+        self._cell_before = (table_widget, row, col,
+                             self.sheet_manager.cell_content(table_widget, row, col, spilled=False))
+
     def on_item_changed(self, item: QTableWidgetItem):
         if self.is_calculating: return 
         self.set_dirty(True)
@@ -84,19 +216,147 @@ class MainWindow(QMainWindow):
         if not table_widget: return
 
         user_text = item.text()
-        self.is_calculating = True 
-        if user_text.startswith("="):
-            item.setData(Qt.ItemDataRole.UserRole, user_text)
-            if self.is_formula_view:
-                item.setText(user_text)
-            else:
-                result = self.calculator.parse_and_calculate(user_text, table_widget)
-                item.setText(result)
+        sheet_name = self.tab_widget.tabText(self.tab_widget.indexOf(table_widget))
+        row, col = item.row(), item.column()
+        self.record_edit("set", sheet=sheet_name, row=row, col=col, value=user_text)
+        if self._cell_before is not None and self._cell_before[:3] == (table_widget, row, col):
+            old_text = self._cell_before[3]
         else:
-            item.setData(Qt.ItemDataRole.UserRole, None)
-            item.setText(user_text) 
-        self.is_calculating = False 
-        QTimer.singleShot(0, self.recalculate_all_cells)
+            old_text = "" if item.data(SPILL_ROLE) else item.data(Qt.ItemDataRole.UserRole) or ""
+        self._cell_before = (table_widget, row, col, user_text)
+        self.push_undo(UndoEntry("set", sheet_name, cells=[(sheet_name, row, col)], old=[old_text], new=[user_text]))
+        self.is_calculating = True 
+        try:
+            item.setData(Qt.ItemDataRole.UserRole, user_text if user_text.startswith("=") else None)
+            # Введене в клітинку розливу значення блокує розлив (#SPILL!).
+            item.setData(SPILL_ROLE, None)
+        finally:
+            self.is_calculating = False 
+        self._queue_recalc([(sheet_name, item.row(), item.column())])
+
+    def apply_edits(self, sheet_name: str, values: dict[tuple[int, int], str], undoable: bool = True) -> None:
+        """Масова правка однією транзакцією: клітинки записуються без itemChanged,
+        журнал отримує по запису на клітинку, стек скасування - один запис, а залежні формули
+        перераховуються один раз."""
+        table_widget = self.sheet_manager.get_table_by_name(sheet_name)
+        if table_widget is None or not values: return
+        with span("sheet.bulk_edit", "ui", sheet=sheet_name, cells=len(values)):
+            if undoable:
+                content = self.sheet_manager.cell_content
+                old = [content(table_widget, row, col, spilled=False) for row, col in values]
+                self.push_undo(UndoEntry("set", sheet_name, cells=[(sheet_name, row, col) for row, col in values],
+                                         old=old, new=list(values.values())))
+            self.sheet_manager.set_cell_values(table_widget, values)
+            for (row, col), value in values.items():
+                self.record_edit("set", sheet=sheet_name, row=row, col=col, value=value)
+        self.set_dirty(True)
+        self._queue_recalc([(sheet_name, row, col) for row, col in values])
+
+    def apply_cells(self, cells: list[tuple[str, int, int]], values: list[str]) -> None:
+        """Записує вміст у клітинки кількох аркушів (скасування й повтор) без нового запису скасування."""
+        by_sheet: dict[str, dict[tuple[int, int], str]] = {}
+        for (sheet_name, row, col), value in zip(cells, values):
+            by_sheet.setdefault(sheet_name, {})[(row, col)] = value
+        for sheet_name, sheet_values in by_sheet.items():
+            self.apply_edits(sheet_name, sheet_values, undoable=False)
+
+    #Undo
+    def push_undo(self, entry: UndoEntry) -> None:
+        self.undo_stack.push(entry)
+        self._update_undo_actions()
+
+    def clear_undo(self) -> None:
+        self.undo_stack.clear()
+        self._cell_before = None
+        self._update_undo_actions()
+
+    def undo(self):
+        if self.is_calculating or not self.undo_stack.can_undo(): return
+        with span("sheet.undo", "ui"):
+            self.sheet_manager.apply_undo_entry(self.undo_stack.undo(), undo=True)
+        self._cell_before = None
+        self.set_dirty(True)
+        self._update_undo_actions()
+
+    def redo(self):
+        if self.is_calculating or not self.undo_stack.can_redo(): return
+        with span("sheet.redo", "ui"):
+            self.sheet_manager.apply_undo_entry(self.undo_stack.redo(), undo=False)
+        self._cell_before = None
+        self.set_dirty(True)
+        self._update_undo_actions()
+
+    def _update_undo_actions(self) -> None:
+        self.ui_manager.set_action_enabled("undo", self.undo_stack.can_undo())
+        self.ui_manager.set_action_enabled("redo", self.undo_stack.can_redo())
+
+    def _queue_recalc(self, cells) -> None:
+        self._pending_edits.update(cells)
+        self._recalc_timer.start()
+
+    def flush_pending_edits(self) -> None:
+        """Перераховує формули, залежні від накопичених правок, - лише їх і на всіх аркушах книги."""
+        if not self._pending_edits: return
+        if self.is_calculating:
+            self._recalc_timer.start()
+            return
+        sheets = self.workbook_calc.sheets
+        cells = [key for key in self._pending_edits if sheets.get(key[0]) is not None]
+        self._pending_edits.clear()
+        self.is_calculating = True
+        try:
+            with span("calc.incremental", "calc", cells=len(cells)) as trace:
+                trace.set(formulas=self.workbook_calc.set_cells(cells, update_text=not self.is_formula_view))
+        finally:
+            self.is_calculating = False
+        if self.profiler.enabled and self.profiler_panel is not None:
+            self.profiler_panel.refresh()
+
+    def copy_cells(self):
+        table_widget = self.sheet_manager.get_current_table()
+        block = self.sheet_manager.selected_block(table_widget) if table_widget else None
+        if block is None: return
+        r1, c1, r2, c2 = block
+        text = format_clipboard([[self.sheet_manager.cell_content(table_widget, r, c) for c in range(c1, c2 + 1)]
+                                 for r in range(r1, r2 + 1)])
+        QApplication.clipboard().setText(text)
+        self._copied = (text, r1, c1)
+
+    def paste_cells(self):
+        """Вставляє блок з буфера від лівої верхньої виділеної клітинки. Формули, скопійовані тут же,
+        зсуваються на відстань вставки; текст з інших програм вставляється як є."""
+        table_widget = self.sheet_manager.get_current_table()
+        block = self.sheet_manager.selected_block(table_widget) if table_widget else None
+        if block is None or self.is_calculating: return
+        text = QApplication.clipboard().text()
+        row, col = block[0], block[1]
+        d_row = d_col = 0
+        if self._copied is not None and self._copied[0] == text:
+            d_row, d_col = row - self._copied[1], col - self._copied[2]
+        values = {}
+        for i, cells in enumerate(parse_clipboard(text)):
+            for j, value in enumerate(cells):
+                values[(row + i, col + j)] = shift_formula(value, d_row, d_col)
+        self.apply_edits(self.sheet_manager.get_current_sheet_name(), values)
+
+    def fill_down(self):
+        """Копіює верхній рядок виділення в решту його рядків (для одного рядка - рядок над ним)
+        зі зсувом відносних посилань, як Ctrl+D в Excel."""
+        table_widget = self.sheet_manager.get_current_table()
+        block = self.sheet_manager.selected_block(table_widget) if table_widget else None
+        if block is None or self.is_calculating: return
+        r1, c1, r2, c2 = block
+        if r1 == r2:
+            r1 -= 1
+        if r1 < 0: return
+        source = [self.sheet_manager.cell_content(table_widget, r1, c) for c in range(c1, c2 + 1)]
+        values, asts = {}, {}
+        rows = fill_down(source, r2 - r1, asts)
+        self.calculator.seed_ast_cache(asts)
+        for i, cells in enumerate(rows, start=r1 + 1):
+            for j, value in enumerate(cells, start=c1):
+                values[(i, j)] = value
+        self.apply_edits(self.sheet_manager.get_current_sheet_name(), values)
 
     def show_context_menu(self, position: QPoint) -> None:
         table_widget = self.sheet_manager.get_current_table() 
@@ -121,6 +381,10 @@ class MainWindow(QMainWindow):
         context_menu.addSeparator()
         context_menu.addAction(self.ui_manager.get_action("add_col"))
         context_menu.addAction(action_del_col)
+        context_menu.addSeparator()
+        context_menu.addAction(self.ui_manager.get_action("copy"))
+        context_menu.addAction(self.ui_manager.get_action("paste"))
+        context_menu.addAction(self.ui_manager.get_action("fill_down"))
         
         global_pos = table_widget.mapToGlobal(position)
         context_menu.exec(global_pos)
@@ -129,10 +393,13 @@ class MainWindow(QMainWindow):
         self.sheet_manager.show_tab_context_menu(position)
 
     def closeEvent(self, event: QCloseEvent):
+        if self.current_task:
+            self.task_runner.wait(self.current_task)
         if self.is_dirty:
             if not self.prompt_save_changes():
                 event.ignore()
                 return
+        self._close_journal()
         event.accept()
 
     def prompt_save_changes(self) -> bool:
@@ -142,143 +409,447 @@ class MainWindow(QMainWindow):
             QMessageBox.StandardButton.Cancel)
 
         if reply == QMessageBox.StandardButton.Yes:
-            return self.save_file()
+            return self.save_file(wait=True)
         elif reply == QMessageBox.StandardButton.No:
             return True
         else:
             return False
 
     #Calculations
-    def recalculate_all_cells(self):
+    def recalculate_all_cells(self, rebuild: bool = True):
+        """Повний перерахунок усієї книги; rebuild - перебудувати граф залежностей (після структурних змін)."""
+        if self.is_calculating or self.tab_widget.count() == 0: return
+
+        # Накопичені правки покриває повний перерахунок; без rebuild їх треба лише внести в граф.
+        pending, self._pending_edits = self._pending_edits, set()
+        self.is_calculating = True
+        try:
+            with span("calc.recalculate", "calc", sheets=self.tab_widget.count()) as trace:
+                if rebuild:
+                    self.workbook_calc.rebuild()
+                else:
+                    for sheet, row, col in pending:
+                        if self.workbook_calc.sheets.get(sheet) is not None:
+                            self.workbook_calc.update_cell(sheet, row, col)
+                trace.set(formulas=self.workbook_calc.recalculate_all(update_text=not self.is_formula_view))
+        finally:
+            self.is_calculating = False
+        self.refresh_formula_display()
+        if self.profiler.enabled and self.profiler_panel is not None:
+            self.profiler_panel.refresh()
+
+    def refresh_formula_display(self):
+        """Показує у поточній вкладці формули або їх значення відповідно до режиму перегляду."""
         table_widget = self.sheet_manager.get_current_table()
-        if not table_widget: return
-        if self.is_calculating: return
-            
+        if not table_widget or self.is_calculating: return
+
+        sheet_name = self.tab_widget.tabText(self.tab_widget.indexOf(table_widget))
+        values = self.workbook_calc.values.get(sheet_name, {})
         self.is_calculating = True
         try:
-            for _ in range(2):
-                for r in range(table_widget.rowCount()):
-                    for c in range(table_widget.columnCount()):
-                        item = table_widget.item(r, c)
-                        if not item: continue
-                        formula = item.data(Qt.ItemDataRole.UserRole)
-                        if formula and formula.startswith("="):
-                            if self.is_formula_view:
-                                if item.text() != formula:
-                                    item.setText(formula)
-                            else:
-                                result = self.calculator.parse_and_calculate(formula, table_widget)
-                                if item.text() != result:
-                                    item.setText(str(result))
+            for r, c in occupied_cells(table_widget):
+                item = table_widget.item(r, c)
+                formula = item.data(Qt.ItemDataRole.UserRole)
+                if not formula or not formula.startswith("="): continue
+                if self.is_formula_view:
+                    text = formula
+                elif (r, c) in values:
+                    text = str(values[(r, c)])
+                else:
+                    text = self.calculator.parse_and_calculate(formula, table_widget, cell=(sheet_name, r, c))
+                if item.text() != text:
+                    item.setText(text)
         finally:
             self.is_calculating = False
 
+    #Background tasks
+    def _setup_task_progress(self):
+        self.task_label = QLabel()
+        self.task_progress = QProgressBar()
+        self.task_progress.setMaximumWidth(200)
+        self.task_cancel_button = QPushButton("Скасувати")
+        self.task_cancel_button.clicked.connect(self.cancel_current_task)
+        status_bar = self.statusBar()
+        status_bar.addPermanentWidget(self.task_label)
+        status_bar.addPermanentWidget(self.task_progress)
+        status_bar.addPermanentWidget(self.task_cancel_button)
+        self._show_task_progress(False)
+
+    def _show_task_progress(self, visible: bool):
+        self.task_label.setVisible(visible)
+        self.task_progress.setVisible(visible)
+        self.task_cancel_button.setVisible(visible)
+
+    def _on_task_progress(self, done: int, total: int):
+        if total <= 0:
+            self.task_progress.setRange(0, 0)
+        else:
+            self.task_progress.setRange(0, 100)
+            self.task_progress.setValue(int(done * 100 / total))
+
+    def cancel_current_task(self):
+        if self.current_task:
+            self.current_task.cancel()
+
+    def _run_task(self, title: str, fn, on_finished, wait: bool = False) -> bool:
+        """Запускає fn(task) у фоновому потоці; on_finished(result) виконується в GUI-потоці."""
+        if self.current_task:
+            QMessageBox.information(self, APP_NAME, "Зачекайте завершення поточної операції.")
+            return False
+
+        outcome = {"ok": False}
+
+        def finish():
+            self.current_task = None
+            self._show_task_progress(False)
+
+        def finished(result):
+            finish()
+            outcome["ok"] = True
+            on_finished(result)
+
+        def failed(message: str):
+            finish()
+            QMessageBox.critical(self, "Помилка", f"{title}\n{message}")
+
+        def cancelled():
+            finish()
+            self.statusBar().showMessage("Операцію скасовано.", 3000)
+
+        self.task_label.setText(title)
+        self.task_progress.setRange(0, 0)
+        self._show_task_progress(True)
+        self.current_task = self.task_runner.start(
+            fn, on_finished=finished, on_failed=failed,
+            on_cancelled=cancelled, on_progress=self._on_task_progress)
+        if wait:
+            self.task_runner.wait(self.current_task)
+        return outcome["ok"] if wait else True
+
+    def _show_workbook(self, workbook, filepath: str | None, title: str, dirty: bool = False, sheets=None,
+                       drive_file: dict | None = None):
+        self.current_workbook = workbook
+        self.current_filepath = filepath
+        self.drive_file = drive_file
+        self.sheet_manager.populate_all_tabs(self.current_workbook, sheets)
+        self._update_ui_state(is_file_open=True)
+        self.setWindowTitle(title)
+        self.set_dirty(dirty)
+        self._start_journal(filepath)
+
+    #Crash recovery journal
+    def record_edit(self, op: str, **fields) -> None:
+        if self.journal:
+            self.journal.record(op, **fields)
+
+    def _close_journal(self, discard: bool = True) -> None:
+        if self.journal:
+            self.journal.close(discard=discard)
+            self.journal = None
+
+    def _start_journal(self, filepath: str | None, blank: bool = False,
+                       recovered: tuple[str, list[dict]] | None = None) -> None:
+        """Відкриває журнал правок книги. blank - нова порожня книга; recovered - (журнал, записи)
+        незбереженої нової книги, яку вже погодилися відновити при запуску."""
+        self._close_journal()
+        journal_path, entries = recovered or (None, [])
+        if filepath:
+            entries = load_recoverable_entries(filepath)
+            if entries:
+                reply = QMessageBox.question(self, "Відновлення",
+                    "Знайдено незбережені зміни з попереднього сеансу. Відновити їх?",
+                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                    QMessageBox.StandardButton.Yes)
+                if reply != QMessageBox.StandardButton.Yes:
+                    entries = []
+        if entries:
+            self.sheet_manager.apply_journal_entries(entries)
+            self.recalculate_all_cells()
+            self.set_dirty(True)
+        try:
+            self.journal = EditJournal(filepath, keep_existing=bool(entries), blank=blank, path=journal_path)
+        except OSError as e:
+            self.journal = None
+            self.statusBar().showMessage(f"Журнал відновлення недоступний: {e}", 5000)
+
+    def restore_untitled_session(self):
+        """При запуску пропонує відновити нову книгу, не збережену через збій попереднього сеансу.
+        Журнали книг без файлу окремі для кожного сеансу, тож пропонуються лише тут, а не при new_file."""
+        if self.current_workbook is not None:
+            return
+        recovered = claim_untitled_journal()
+        if recovered is None:
+            return
+        reply = QMessageBox.question(self, "Відновлення",
+            "Знайдено незбережену нову книгу з попереднього сеансу. Відновити її?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.Yes)
+        if reply == QMessageBox.StandardButton.Yes:
+            self._open_new_workbook(recovered)
+        else:
+            try:
+                os.remove(recovered[0])
+            except OSError:
+                pass
+
+    def _mark_saved(self, generation: int, title: str):
+        # Правки, зроблені під час фонового збереження, не потрапили у знімок.
+        still_dirty = self.edit_generation != generation
+        self.setWindowTitle(title + ("*" if still_dirty else ""))
+        if not still_dirty:
+            self.set_dirty(False)
+
     #Files managing
     def new_file(self):
         if self.is_dirty:
             if not self.prompt_save_changes(): return
-                
+        self._open_new_workbook()
+
+    def _open_new_workbook(self, recovered: tuple[str, list[dict]] | None = None):
         workbook = self.file_manager.create_new_workbook()
         if workbook:
             self.current_workbook = workbook
             self.current_filepath = None
+            self.drive_file = None
             self.sheet_manager.clear_tabs()
             sheet_name = self.current_workbook.sheetnames[0]
             self.sheet_manager.add_sheet_tab(sheet_name) 
             self._update_ui_state(is_file_open=True)
             self.setWindowTitle(f"{APP_NAME} - Новий файл")
             self.set_dirty(False)
+            self._start_journal(None, blank=True, recovered=recovered)
 
     def open_file(self):
         if self.is_dirty:
             if not self.prompt_save_changes(): return
 
-        workbook, filepath = self.file_manager.open_local_workbook()
-        if workbook and filepath:
-            self.current_workbook = workbook
-            self.current_filepath = filepath
-            self.sheet_manager.populate_all_tabs(self.current_workbook)
-            self._update_ui_state(is_file_open=True)
-            self.setWindowTitle(f"{APP_NAME} - {filepath}")
-            self.set_dirty(False)
+        filepath = self.file_manager.ask_open_path()
+        if not filepath: return
+        self._run_task(
+            "Відкриття файлу...",
+            lambda task: self.file_manager.load_workbook_parallel(filepath, task.report_progress),
+            lambda result: self._show_workbook(result[0], filepath, f"{APP_NAME} - {filepath}", sheets=result[1]))
 
-    def save_file(self) -> bool:
+    def save_file(self, wait: bool = False) -> bool:
         if not self.current_workbook: return False
-        self.sheet_manager.update_workbook_from_all_tabs(self.current_workbook)
-        saved, new_path = self.file_manager.save_local_workbook(self.current_workbook, self.current_filepath)
-        if saved:
-            self.current_filepath = new_path
-            self.set_dirty(False)
-            self.setWindowTitle(f"{APP_NAME} - {new_path}")
-        return saved
+        save_path = self.file_manager.ask_save_path(self.current_filepath)
+        if not save_path: return False
+
+        snapshot = self.sheet_manager.snapshot_all_tabs()
+        names = self.workbook_calc.names.definitions()
+        template = self.file_manager.workbook_template(self.current_workbook, [name for name, _ in snapshot], names)
+        generation = self.edit_generation
+        mark_id = self.journal.mark() if self.journal else None
+
+        def on_saved(_):
+            if self.journal:
+                self.journal.reset(mark_id, save_path)
+            self.current_filepath = save_path
+            self._mark_saved(generation, f"{APP_NAME} - {save_path}")
+            self.statusBar().showMessage(f"Файл успішно збережено у: {save_path}", 5000)
+
+        return self._run_task(
+            "Збереження файлу...",
+            lambda task: self.file_manager.write_snapshot(snapshot, save_path, task.report_progress, names, template),
+            on_saved, wait=wait)
+
+    def import_csv(self):
+        if self.is_dirty:
+            if not self.prompt_save_changes(): return
+
+        filepath = self.file_manager.ask_import_path()
+        if not filepath: return
+        self._run_task(
+            "Імпорт даних...",
+            lambda task: self.file_manager.load_delimited(filepath, progress_callback=task.report_progress),
+            lambda data: self._show_workbook(
+                self.file_manager.workbook_from_sheets([data]), None, f"{APP_NAME} - {os.path.basename(filepath)}",
+                dirty=True, sheets=[data]))
+
+    def export_csv(self):
+        table_widget = self.sheet_manager.get_current_table()
+        if not table_widget: return
+        suggested_name = f"{self.sheet_manager.get_current_sheet_name() or DEFAULT_SHEET_NAME}.csv"
+        export_path = self.file_manager.ask_export_path(suggested_name)
+        if not export_path: return
+
+        rows = list(self.sheet_manager.iter_table_rows(table_widget))
+        self._run_task(
+            "Експорт даних...",
+            lambda task: self.file_manager.save_delimited(
+                rows, export_path, total_rows=len(rows), progress_callback=task.report_progress),
+            lambda _: self.statusBar().showMessage(f"Дані успішно експортовано у: {export_path}", 5000))
 
     #Drive managing
     def authenticate_google(self):
          if self.google_manager.authenticate():
-              self.ui_manager.set_action_enabled("google_login", False)
-              self.ui_manager.set_action_enabled("google_logout", True)
-              self.ui_manager.set_action_enabled("select_from_drive", True)
-              if self.current_workbook:
-                   self.ui_manager.set_action_enabled("save_to_drive", True)
+              self._set_google_actions(True)
 
     def logout_google(self):
         self.google_manager.logout()
-        self.ui_manager.set_action_enabled("google_login", True)
-        self.ui_manager.set_action_enabled("google_logout", False)
-        self.ui_manager.set_action_enabled("select_from_drive", False)
-        self.ui_manager.set_action_enabled("save_to_drive", False)
+        self.drive_listing.clear()
+        self._set_google_actions(False)
         
     def select_from_drive(self):
         if self.is_dirty:
             if not self.prompt_save_changes(): return
             
-        files, error = self.google_manager.list_spreadsheets()
-        if error:
-            QMessageBox.critical(self, "Помилка Google Drive", error)
-            return
-        if not files:
-            QMessageBox.information(self, "Google Drive", "На вашому диску не знайдено таблиць.")
+        if not self.google_manager.service:
+            QMessageBox.critical(self, "Помилка Google Drive", "Спочатку потрібно авторизуватися.")
             return
 
-        file_map = {f['name']: (f['id'], f['mimeType']) for f in files}
-        item_name, ok = QInputDialog.getItem(self, "Обрати файл", 
-            "Оберіть файл з Google Drive:", file_map.keys(), 0, False)
+        dialog = DrivePickerDialog(self, self.drive_listing.snapshot())
+        listing = {"task": None}
+
+        def stop_refresh():
+            if listing["task"]:
+                listing["task"].cancel()
+                self.task_runner.wait(listing["task"])
+                listing["task"] = None
+
+        def start_refresh(name_filter: str | None = None):
+            stop_refresh()
+            dialog.set_loading(True)
+            listing["task"] = self.task_runner.start(
+                lambda task: self.google_manager.refresh_listing(
+                    self.drive_listing, lambda updated, removed: task.emit_partial((updated, removed)), name_filter),
+                on_partial=dialog.apply_page,
+                on_finished=lambda _: dialog.set_loading(False),
+                on_failed=lambda message: dialog.status_label.setText(f"Помилка Google API: {message}"),
+                on_cancelled=lambda: dialog.set_loading(False))
+
+        dialog.search_requested.connect(lambda text: start_refresh(text or None))
+        start_refresh()
+        accepted = dialog.exec() == QDialog.DialogCode.Accepted
+        file_meta = dialog.selected_file()
+        stop_refresh()
+
+        if accepted and file_meta:
+            self._run_task(
+                "Завантаження з Google Drive...",
+                lambda task: self._load_drive_file(file_meta, task),
+                lambda result: self._show_workbook(
+                    result[0], None, f"{APP_NAME} - {result[2]['name']} (Google Drive)", sheets=result[1],
+                    # Нативні Google-таблиці не оновлюються xlsx-вмістом: їх зберігаємо як нові файли.
+                    drive_file=result[2] if result[2]['mimeType'] != GOOGLE_SHEET_MIME_TYPE else None))
+
+    def _load_drive_file(self, file_meta: dict, task):
+        """Виконується у фоні: бере книгу з локального кешу або завантажує і кешує її.
+        Повертає (книга, аркуші, свіжі метадані файлу)."""
+        # Метадані зі списку могли застаріти (кеш списку, зміни після відкриття діалогу): ключ кешу
+        # і ревізія для перевірки конфліктів при збереженні беруться з Drive зараз.
+        file_meta, error = self.google_manager.get_file_metadata(file_meta['id'])
+        if error:
+            raise RuntimeError(error)
+        key = self.drive_cache.key_for(file_meta)
+        path = self.drive_cache.get_file(key) if key else None
+        if path is not None:
+            sheets = self.drive_cache.get_sheets(key)
+            if sheets is not None:
+                # Дані - з кешу розібраних аркушів; з файлу лише форматування.
+                return self.file_manager.load_template(path), sheets, file_meta
+        else:
+            fh = self.drive_cache.new_download_file()
+            part_path = fh.name
+            try:
+                with fh:
+                    _, error = self.google_manager.download_file(
+                        file_meta['id'], file_meta['mimeType'], task.report_progress, fh=fh)
+                if error:
+                    raise RuntimeError(error)
+            except BaseException:
+                os.remove(part_path)
+                raise
+            if key:
+                path = self.drive_cache.store_file(key, part_path)
+            else:
+                path = part_path
 
-        if ok and item_name:
-            file_id, mime_type = file_map[item_name]
-            buffer, error = self.google_manager.download_file(file_id, mime_type)
-            if error:
-                 QMessageBox.critical(self, "Помилка Google Drive", error)
-                 return
-            if buffer:
-                 workbook = self.file_manager.load_workbook_from_buffer(buffer)
-                 if workbook:
-                    self.current_workbook = workbook
-                    self.current_filepath = None
-                    self.sheet_manager.populate_all_tabs(self.current_workbook)
-                    self._update_ui_state(is_file_open=True)
-                    self.setWindowTitle(f"{APP_NAME} - {item_name} (Google Drive)")
-                    self.set_dirty(False)
+        try:
+            workbook, sheets = self.file_manager.load_workbook_parallel(path, task.report_progress)
+        finally:
+            if not key:
+                os.remove(path)
+        if key:
+            self.drive_cache.store_sheets(key, sheets)
+        return workbook, sheets, file_meta
 
     def save_to_drive(self):
         if not self.current_workbook: return
         
-        file_name_suggestion = os.path.basename(self.current_filepath) if self.current_filepath else "Untitled.xlsx"
+        if self.drive_file:
+            file_name_suggestion = self.drive_file['name']
+        else:
+            file_name_suggestion = os.path.basename(self.current_filepath) if self.current_filepath else "Untitled.xlsx"
         file_name, ok = QInputDialog.getText(self, "Зберегти на Google Drive", 
             "Введіть ім'я файлу:", text=file_name_suggestion)
 
         if ok and file_name:
             if not file_name.endswith(".xlsx"): file_name += ".xlsx"
-            self.sheet_manager.update_workbook_from_all_tabs(self.current_workbook)
-            buffer = self.file_manager.save_workbook_to_buffer(self.current_workbook)
-            if buffer:
-                file_id, link, error = self.google_manager.upload_file(file_name, buffer)
+            # Той самий файл оновлюється на місці; нове ім'я означає нову копію.
+            target = self.drive_file if self.drive_file and self.drive_file['name'] == file_name else None
+            self._upload_to_drive(self.sheet_manager.snapshot_all_tabs(), file_name, target)
+
+    def _upload_to_drive(self, snapshot, file_name: str, target: dict | None, force: bool = False):
+        generation = self.edit_generation
+        names = self.workbook_calc.names.definitions()
+        template = self.file_manager.workbook_template(self.current_workbook, [name for name, _ in snapshot], names)
+
+        def serialize_and_upload(task):
+            content_hash = self.file_manager.snapshot_hash(snapshot, names)
+            if target and not force:
+                remote, error = self.google_manager.get_file_metadata(target['id'])
                 if error:
-                     QMessageBox.critical(self, "Помилка Google Drive", error)
-                else:
-                     QMessageBox.information(self, "Успіх", 
-                         f"Файл успішно збережено на Google Drive.\nПосилання: {link}")
-                     self.set_dirty(False)
+                    raise RuntimeError(error)
+                # Без headRevisionId у збережених метаданих ревізію відкриття не порівняти: це не конфлікт,
+                # базою стають щойно отримані метадані. Зміна на Drive між цією перевіркою та upload_file
+                # не виявляється і перезаписується (попередня версія лишається в історії версій Drive).
+                if target.get('headRevisionId') is not None and \
+                        remote.get('headRevisionId') != target['headRevisionId']:
+                    return "conflict", remote
+                if (remote.get('appProperties') or {}).get(CONTENT_HASH_PROPERTY) == content_hash:
+                    return "unchanged", remote
+
+            # xlsx-архів потребує seek, тому великі книги серіалізуються на диск, а не в пам'ять.
+            with tempfile.SpooledTemporaryFile(max_size=DRIVE_CHUNK_SIZE) as buffer:
+                self.file_manager.write_snapshot(snapshot, buffer, task.report_progress, names, template)
+                task.check_cancelled()
+                file_meta, error = self.google_manager.upload_file(
+                    file_name, buffer, progress_callback=task.report_progress,
+                    file_id=target['id'] if target else None,
+                    app_properties={CONTENT_HASH_PROPERTY: content_hash})
+            if error:
+                raise RuntimeError(error)
+            return "uploaded", file_meta
+
+        def on_uploaded(result):
+            status, file_meta = result
+            if status == "conflict":
+                self._resolve_drive_conflict(snapshot, file_name, target)
+                return
+            self.drive_file = file_meta
+            title = f"{APP_NAME} - {file_meta['name']} (Google Drive)"
+            self._mark_saved(generation, title)
+            if status == "unchanged":
+                self.statusBar().showMessage("Файл на Google Drive вже актуальний, завантаження пропущено.", 5000)
+            else:
+                QMessageBox.information(self, "Успіх", 
+                    f"Файл успішно збережено на Google Drive.\nПосилання: {file_meta.get('webViewLink')}")
+
+        self._run_task("Збереження на Google Drive...", serialize_and_upload, on_uploaded)
+
+    def _resolve_drive_conflict(self, snapshot, file_name: str, target: dict):
+        box = QMessageBox(QMessageBox.Icon.Warning, "Конфлікт змін",
+            f"Файл '{target['name']}' було змінено на Google Drive після відкриття.", parent=self)
+        overwrite = box.addButton("Перезаписати", QMessageBox.ButtonRole.DestructiveRole)
+        save_copy = box.addButton("Зберегти копію", QMessageBox.ButtonRole.AcceptRole)
+        box.addButton(QMessageBox.StandardButton.Cancel)
+        box.exec()
+        if box.clickedButton() is overwrite:
+            self._upload_to_drive(snapshot, file_name, target, force=True)
+        elif box.clickedButton() is save_copy:
+            base, ext = os.path.splitext(file_name)
+            self._upload_to_drive(snapshot, f"{base} (копія){ext}", None)
 
     # Sheets managing
     def _sheet_action(self):
@@ -300,37 +871,45 @@ class MainWindow(QMainWindow):
     def reset_app(self):
         self.current_workbook = None
         self.current_filepath = None
+        self.drive_file = None
         self.sheet_manager.clear_tabs()
         self._update_ui_state(is_file_open=False)
         self.setWindowTitle(APP_NAME)
         self.set_dirty(False)
         
-        is_logged_in = os.path.exists('token.json')
-        if is_logged_in:
-             try:
-                 creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-                 if creds.valid or (creds.expired and creds.refresh_token):
-                     if creds.expired: creds.refresh(Request())
-                     self.google_manager.service = build('drive', 'v3', credentials=creds)
-                 else:
-                      is_logged_in = False
-             except Exception:
-                  is_logged_in = False
-        
+        self._set_google_actions(self.google_manager.service is not None)
+
+    def _set_google_actions(self, is_logged_in: bool):
         self.ui_manager.set_action_enabled("google_login", not is_logged_in)
         self.ui_manager.set_action_enabled("google_logout", is_logged_in)
         self.ui_manager.set_action_enabled("select_from_drive", is_logged_in)
+        self.ui_manager.set_action_enabled("save_to_drive", is_logged_in and self.current_workbook is not None)
+
+    def restore_google_session(self):
+        """Відновлює сесію Google у фоні після першого відображення вікна."""
+        if not os.path.exists(TOKEN_FILE):
+            return
+        self.ui_manager.set_action_enabled("google_login", False)
+        self.task_runner.start(
+            lambda task: self.google_manager.restore_session(),
+            on_finished=self._set_google_actions,
+            on_failed=lambda _: self._set_google_actions(False))
 
 
     def _update_ui_state(self, is_file_open: bool):
         self.ui_manager.set_action_enabled("save", is_file_open)
         self.ui_manager.set_action_enabled("show_formulas", is_file_open)
+        self.ui_manager.set_action_enabled("export_csv", is_file_open)
+        self.ui_manager.set_action_enabled("define_name", is_file_open)
         self.add_sheet_button.setEnabled(is_file_open)
         
         self.ui_manager.set_action_enabled("add_row", is_file_open)
         self.ui_manager.set_action_enabled("del_row", is_file_open)
         self.ui_manager.set_action_enabled("add_col", is_file_open)
         self.ui_manager.set_action_enabled("del_col", is_file_open)
+        self.ui_manager.set_action_enabled("copy", is_file_open)
+        self.ui_manager.set_action_enabled("paste", is_file_open)
+        self.ui_manager.set_action_enabled("fill_down", is_file_open)
 
         # Keep other lines as they are
         self.ui_manager.set_action_enabled("save", is_file_open)
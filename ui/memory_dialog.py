@@ -0,0 +1,94 @@
+import json
+
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTreeWidget, QTreeWidgetItem, QPushButton,
+                               QLabel, QFileDialog, QMessageBox, QHeaderView)
+
+from back.memory_report import check_budgets
+
+
+def _format_value(key: str, value) -> str:
+    if isinstance(value, int) and key.endswith("bytes"):
+        return f"{value / (1024 * 1024):.2f} МБ"
+    return str(value)
+
+
+class MemoryReportDialog(QDialog):
+    """Звіт про пам'ять: аркуші, модель книги, кеші калькулятора і знімки tracemalloc."""
+
+    def __init__(self, parent, report_fn, tracker, budgets: dict[str, int]):
+        super().__init__(parent)
+        self.setWindowTitle("Використання пам'яті")
+        self.resize(640, 520)
+        self.report_fn = report_fn
+        self.tracker = tracker
+        self.budgets = budgets
+        self.report: dict = {}
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["Показник", "Значення"])
+        self.tree.header().setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
+        self.budget_label = QLabel()
+        self.budget_label.setWordWrap(True)
+
+        refresh_button = QPushButton("Оновити")
+        refresh_button.clicked.connect(self.refresh)
+        snapshot_button = QPushButton("Знімок tracemalloc")
+        snapshot_button.setToolTip("Перший знімок вмикає tracemalloc; наступні показують приріст пам'яті")
+        snapshot_button.clicked.connect(self.take_snapshot)
+        save_button = QPushButton("Зберегти JSON...")
+        save_button.clicked.connect(self.save_report)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(refresh_button)
+        buttons.addWidget(snapshot_button)
+        buttons.addStretch()
+        buttons.addWidget(save_button)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.tree)
+        layout.addWidget(self.budget_label)
+        layout.addLayout(buttons)
+        self.refresh()
+
+    def refresh(self) -> None:
+        snapshot = self.report.get("tracemalloc")
+        self.report = self.report_fn()
+        if snapshot:
+            self.report["tracemalloc"] = snapshot
+        self._show_report()
+
+    def take_snapshot(self) -> None:
+        self.report["tracemalloc"] = self.tracker.snapshot()
+        self._show_report()
+
+    def _show_report(self) -> None:
+        self.tree.clear()
+        self._add_items(self.tree.invisibleRootItem(), self.report)
+        for idx in range(self.tree.topLevelItemCount()):
+            self.tree.topLevelItem(idx).setExpanded(True)
+
+        violations = check_budgets(self.report, self.budgets)
+        self.budget_label.setText("Перевищено бюджет: " + "; ".join(violations) if violations else "")
+
+    def _add_items(self, parent: QTreeWidgetItem, data) -> None:
+        entries = data.items() if isinstance(data, dict) else enumerate(data)
+        for key, value in entries:
+            item = QTreeWidgetItem(parent)
+            if isinstance(value, dict) and "location" in value:
+                item.setText(0, value["location"])
+                item.setText(1, ", ".join(f"{k}={_format_value(k, v)}" for k, v in value.items() if k != "location"))
+                continue
+            item.setText(0, str(key))
+            if isinstance(value, (dict, list)):
+                self._add_items(item, value)
+            else:
+                item.setText(1, _format_value(str(key), value))
+
+    def save_report(self) -> None:
+        path, _ = QFileDialog.getSaveFileName(self, "Зберегти звіт", "memory.json", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.report, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            QMessageBox.critical(self, "Помилка", f"Не вдалося зберегти звіт: {e}")
@@ -0,0 +1,83 @@
+from PySide6.QtWidgets import (QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+                               QPushButton, QComboBox, QFileDialog, QMessageBox, QHeaderView)
+from PySide6.QtCore import Qt, Signal
+
+from back.calc_profiler import CalcProfiler, REPORT_FIELDS
+
+_HEADERS = {
+    "sheet": "Аркуш", "cell": "Клітинка", "formula": "Формула", "count": "Обчислень",
+    "total_ms": "Усього, мс", "mean_ms": "Середнє, мс", "max_ms": "Макс., мс",
+    "ast_cache_hits": "Кеш AST", "value_cache_hits": "Кеш значень",
+    "range_cells": "Клітинок у діапазонах", "max_depth": "Глибина",
+}
+
+
+class ProfilerPanel(QDockWidget):
+    """Панель гарячих формул: таблиця звіту профілювальника з сортуванням і експортом."""
+
+    closed = Signal()
+
+    def __init__(self, parent, profiler: CalcProfiler):
+        super().__init__("Профілювання обчислень", parent)
+        self.profiler = profiler
+
+        self.group_combo = QComboBox()
+        self.group_combo.addItem("За клітинками", "cell")
+        self.group_combo.addItem("За формулами", "formula")
+        self.group_combo.currentIndexChanged.connect(self.refresh)
+        clear_button = QPushButton("Очистити")
+        clear_button.clicked.connect(self.clear)
+        export_button = QPushButton("Експорт...")
+        export_button.clicked.connect(self.export)
+
+        self.table = QTableWidget(0, len(REPORT_FIELDS))
+        self.table.setHorizontalHeaderLabels([_HEADERS[field] for field in REPORT_FIELDS])
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.setSortingEnabled(True)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.group_combo)
+        buttons.addStretch()
+        buttons.addWidget(clear_button)
+        buttons.addWidget(export_button)
+        content = QWidget()
+        layout = QVBoxLayout(content)
+        layout.addLayout(buttons)
+        layout.addWidget(self.table)
+        self.setWidget(content)
+
+    def closeEvent(self, event):
+        super().closeEvent(event)
+        self.closed.emit()
+
+    def refresh(self) -> None:
+        rows = self.profiler.report(self.group_combo.currentData())
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            for c, field in enumerate(REPORT_FIELDS):
+                value = row[field]
+                item = QTableWidgetItem()
+                if isinstance(value, float):
+                    item.setData(Qt.ItemDataRole.DisplayRole, round(value, 3))
+                else:
+                    item.setData(Qt.ItemDataRole.DisplayRole, value)
+                self.table.setItem(r, c, item)
+        self.table.setSortingEnabled(True)
+
+    def clear(self) -> None:
+        self.profiler.clear()
+        self.refresh()
+
+    def export(self) -> None:
+        path, selected_filter = QFileDialog.getSaveFileName(self, "Експорт звіту", "profile.json",
+                                                            "JSON (*.json);;CSV (*.csv)")
+        if not path:
+            return
+        if selected_filter.startswith("CSV") and not path.lower().endswith(".csv"):
+            path += ".csv"
+        try:
+            self.profiler.export(path, self.group_combo.currentData())
+        except OSError as e:
+            QMessageBox.critical(self, "Помилка", f"Не вдалося зберегти звіт: {e}")
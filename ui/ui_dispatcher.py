@@ -21,6 +21,14 @@ class UIRenderer:
                          style.standardIcon(QStyle.StandardPixmap.SP_DialogOpenButton), self.window.open_file)
         self._add_action(toolbar, "save", "Зберегти", "Зберегти файл (Ctrl + S)", "Ctrl+S", 
                          style.standardIcon(QStyle.StandardPixmap.SP_DialogSaveButton), self.window.save_file, enabled=False)
+        self._add_action(toolbar, "undo", "Скасувати", "Скасувати останню правку (Ctrl + Z)", "Ctrl+Z",
+                         style.standardIcon(QStyle.StandardPixmap.SP_ArrowBack), self.window.undo, enabled=False)
+        self._add_action(toolbar, "redo", "Повторити", "Повторити скасовану правку (Ctrl + Y)", "Ctrl+Y",
+                         style.standardIcon(QStyle.StandardPixmap.SP_ArrowForward), self.window.redo, enabled=False)
+        self._add_action(toolbar, "import_csv", "Імпорт CSV", "Імпортувати CSV/TSV файл", None,
+                         style.standardIcon(QStyle.StandardPixmap.SP_ArrowDown), self.window.import_csv)
+        self._add_action(toolbar, "export_csv", "Експорт CSV", "Експортувати поточний аркуш у CSV/TSV", None,
+                         style.standardIcon(QStyle.StandardPixmap.SP_ArrowUp), self.window.export_csv, enabled=False)
 
         toolbar.addSeparator()
 
@@ -28,6 +36,22 @@ class UIRenderer:
                              style.standardIcon(QStyle.StandardPixmap.SP_FileDialogDetailedView), self.window.toggle_formula_view, 
                              enabled=False, checkable=True)
         act.toggled.connect(self.window.toggle_formula_view) 
+        self._add_action(toolbar, "define_name", "Імена", "Визначити ім'я діапазону чи значення", None,
+                         style.standardIcon(QStyle.StandardPixmap.SP_FileDialogListView), self.window.define_name,
+                         enabled=False)
+        act = self._add_action(toolbar, "iterative_calc", "Ітеративні обчислення",
+                               "Обчислювати циклічні посилання ітераціями до збіжності", None,
+                               style.standardIcon(QStyle.StandardPixmap.SP_BrowserReload), None, checkable=True)
+        act.toggled.connect(self.window.toggle_iterative_calc)
+        act = self._add_action(toolbar, "profiler", "Профілювання", "Профілювання обчислень формул", None,
+                               style.standardIcon(QStyle.StandardPixmap.SP_FileDialogInfoView), None, checkable=True)
+        act.toggled.connect(self.window.toggle_profiler)
+        act = self._add_action(toolbar, "tracing", "Трасування",
+                               "Записувати трасування завантаження, обчислень, збереження і Drive", None,
+                               style.standardIcon(QStyle.StandardPixmap.SP_BrowserReload), None, checkable=True)
+        act.toggled.connect(self.window.toggle_tracing)
+        self._add_action(toolbar, "memory", "Пам'ять", "Звіт про використання пам'яті", None,
+                         style.standardIcon(QStyle.StandardPixmap.SP_DriveHDIcon), self.window.show_memory_report)
 
 
         toolbar.addSeparator()
@@ -61,6 +85,13 @@ class UIRenderer:
         self._add_action(None, "del_row", "Видалити рядок", trigger_slot=self.window.delete_row)
         self._add_action(None, "add_col", "Додати стовпець", trigger_slot=self.window.add_column)
         self._add_action(None, "del_col", "Видалити стовпець", trigger_slot=self.window.delete_column)
+        # Додаються у вікно, щоб працювали скорочення; вставка і протягування - одна правка з одним перерахунком.
+        self._add_action(self.window, "copy", "Копіювати", shortcut="Ctrl+C", trigger_slot=self.window.copy_cells,
+                         enabled=False)
+        self._add_action(self.window, "paste", "Вставити", shortcut="Ctrl+V", trigger_slot=self.window.paste_cells,
+                         enabled=False)
+        self._add_action(self.window, "fill_down", "Заповнити вниз", shortcut="Ctrl+D",
+                         trigger_slot=self.window.fill_down, enabled=False)
 
     def _add_action(self, parent_widget, name, text, tooltip=None, shortcut=None, 
                     icon=None, trigger_slot=None, enabled=True, checkable=False) -> QAction:
@@ -0,0 +1,25 @@
+from functools import lru_cache
+
+# Власні аналоги openpyxl.utils, щоб калькулятор не тягнув openpyxl під час запуску.
+
+
+@lru_cache(maxsize=None)
+def get_column_letter(col_idx: int) -> str:
+    if not 1 <= col_idx <= 18278:
+        raise ValueError(f"Invalid column index {col_idx}")
+    letters = ""
+    while col_idx > 0:
+        col_idx, remainder = divmod(col_idx - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+@lru_cache(maxsize=None)
+def column_index_from_string(col_str: str) -> int:
+    col_str = col_str.upper()
+    if not col_str or len(col_str) > 3 or not col_str.isalpha() or not col_str.isascii():
+        raise ValueError(f"{col_str} is not a valid column name")
+    index = 0
+    for ch in col_str:
+        index = index * 26 + (ord(ch) - 64)
+    return index
@@ -1,7 +1,36 @@
+import os
+
 SCOPES = ['https://www.googleapis.com/auth/drive']
 APP_NAME = "KotunSpreadSheeter"
 DEFAULT_SHEET_NAME = "Sheet1"
 DEFAULT_ROWS = 10
 DEFAULT_COLS = 5
 TOKEN_FILE = 'token.json'
-CREDENTIALS_FILE = 'credentials.json'
\ No newline at end of file
+CREDENTIALS_FILE = 'credentials.json'
+CSV_CHUNK_ROWS = 10000
+CSV_SNIFF_BYTES = 64 * 1024
+CSV_ENCODING = 'utf-8-sig'
+JOURNAL_DIR = os.path.join(os.path.expanduser("~"), ".kotun_spreadsheeter", "recovery")
+UNTITLED_JOURNAL_PREFIX = 'untitled-'
+JOURNAL_COMPACT_THRESHOLD = 5000
+PARALLEL_LOAD_MIN_SHEETS = 2
+DRIVE_API_ENDPOINT = None
+# Для завантаження на Drive розмір чанка має бути кратним 256 КБ.
+DRIVE_CHUNK_SIZE = 5 * 1024 * 1024
+DRIVE_RESUME_ATTEMPTS = 5
+DRIVE_RESUME_BACKOFF = 1.0
+DRIVE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".kotun_spreadsheeter", "drive_cache")
+DRIVE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+DRIVE_PAGE_SIZE = 200
+DRIVE_LISTING_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".kotun_spreadsheeter", "drive_listing.json")
+CALC_SERVICE_HOST = '127.0.0.1'
+CALC_SERVICE_PORT = 8765
+CALC_CACHE_WORKBOOKS = 8
+# Бюджети пам'яті для звіту: шлях у звіті через крапку -> межа в байтах,
+# напр. {"grid_estimated_bytes": 512 * 1024 * 1024}.
+MEMORY_BUDGETS: dict[str, int] = {}
+# Ітеративні обчислення циклічних посилань (значення за замовчуванням, як в Excel).
+ITERATIVE_MAX_ITERATIONS = 100
+ITERATIVE_MAX_CHANGE = 0.001
+# Межа пам'яті стека скасування; найстаріші правки зливаються, а потім відкидаються.
+UNDO_MAX_BYTES = 64 * 1024 * 1024
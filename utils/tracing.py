@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Легкі спани й лічильники для етапів завантаження, відображення, перерахунку, збереження і Drive.
+# Експорт - у форматі Chrome trace (chrome://tracing, Perfetto). Вимкнений трасувальник повертає
+# спільний порожній спан і нічого не записує.
+
+TRACE_FILE_ENV = "KOTUN_TRACE_FILE"
+
+
+def _peak_rss_kb() -> int | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS повертає байти, Linux - кілобайти.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "category", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0.0
+
+    def set(self, **args) -> None:
+        """Додає до спану метрики, відомі лише після виконання (кількість клітинок, байти...)."""
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        peak = _peak_rss_kb()
+        if peak is not None:
+            self.args["peak_rss_kb"] = peak
+        self.tracer._add_complete(self, end)
+        return False
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self._events: list[dict] = []
+        self._threads: dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._events.clear()
+            self._threads.clear()
+
+    def span(self, name: str, category: str = "app", **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, category, args)
+
+    def counter(self, name: str, **values) -> None:
+        if not self.enabled:
+            return
+        self._append({"name": name, "ph": "C", "ts": self._ts(time.perf_counter()), "args": values})
+
+    def _ts(self, moment: float) -> float:
+        return (moment - self._origin) * 1_000_000
+
+    def _append(self, event: dict) -> None:
+        thread = threading.current_thread()
+        event["pid"] = os.getpid()
+        event["tid"] = thread.ident
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self._events.append(event)
+
+    def _add_complete(self, span: Span, end: float) -> None:
+        self._append({"name": span.name, "cat": span.category, "ph": "X", "ts": self._ts(span.start),
+                      "dur": (end - span.start) * 1_000_000, "args": span.args})
+
+    def event_count(self) -> int:
+        return len(self._events)
+
+    def events(self) -> list[dict]:
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        pid = os.getpid()
+        metadata = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                    for tid, name in threads.items()]
+        return metadata + events
+
+    def summary(self) -> dict[str, dict]:
+        """Зведення за назвами спанів: кількість, сумарна і максимальна тривалість (мс)."""
+        result: dict[str, dict] = {}
+        with self._lock:
+            events = [e for e in self._events if e["ph"] == "X"]
+        for event in events:
+            entry = result.setdefault(event["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            duration = event["dur"] / 1000
+            entry["count"] += 1
+            entry["total_ms"] += duration
+            entry["max_ms"] = max(entry["max_ms"], duration)
+        return result
+
+    def export_chrome_trace(self, path: str) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events(), "displayTimeUnit": "ms"}, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+
+
+TRACER = Tracer()
+
+
+def span(name: str, category: str = "app", **args):
+    return TRACER.span(name, category, **args)
+
+
+def enable_from_environment() -> None:
+    """Якщо задано KOTUN_TRACE_FILE, вмикає трасування і зберігає його у файл при виході."""
+    path = os.environ.get(TRACE_FILE_ENV)
+    if not path:
+        return
+    TRACER.enable()
+    atexit.register(TRACER.export_chrome_trace, path)